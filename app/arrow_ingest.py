@@ -0,0 +1,178 @@
+"""
+arrow_ingest.py
+
+Description:
+Arrow-native ingest path for neo_arrow_app.py. Transfers and purchases are parsed with the multithreaded pyarrow CSV
+reader, normalized with Arrow compute kernels (dash stripping, merchant names, epoch conversion), and the node and
+relationship tables are kept as Arrow tables all the way to the Arrow Flight upload, without pandas object columns.
+
+Date: 17-10-2026
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as csv
+
+from ingest import LABEL_VALUE_PAIRS_CARD_ISSUERS, LABEL_VALUE_PAIRS_CUSTOMER, LABEL_VALUE_PAIRS_MERCHANT, LABEL_VALUE_PAIRS_PURCHASE, customer_frames
+from metrics import span
+from node_table import NodeTable
+
+
+def read_csv_table(file_path, column_types):
+    return csv.read_csv(
+        file_path,
+        read_options=csv.ReadOptions(use_threads=True),
+        convert_options=csv.ConvertOptions(column_types=column_types)
+    )
+
+
+def strip_dashes(array):
+    return pc.cast(pc.replace_substring(array, '-', ''), pa.int64())
+
+
+def to_epoch_seconds(timestamps):
+    # Millisecond timestamps are truncated to whole seconds, as in the pandas path
+    return pc.divide(pc.cast(timestamps, pa.int64()), 1000)
+
+
+def read_transfers(file_path):
+    table = read_csv_table(file_path, {
+        'TransactionID': pa.int64(),
+        'SenderAccountNumber': pa.string(),
+        'ReceiverAccountNumber': pa.string(),
+        'Amount': pa.float64(),
+        'TransferDatetime': pa.timestamp('ms', tz='UTC')
+    })
+    return pa.table({
+        'TransactionID': table['TransactionID'],
+        'SenderAccountNumber': strip_dashes(table['SenderAccountNumber']),
+        'ReceiverAccountNumber': strip_dashes(table['ReceiverAccountNumber']),
+        'Amount': table['Amount'],
+        'TransferEpoch': to_epoch_seconds(table['TransferDatetime'])
+    })
+
+
+def read_purchases(file_path):
+    table = read_csv_table(file_path, {
+        'TransactionID': pa.int64(),
+        'CardNumber': pa.string(),
+        'Merchant': pa.string(),
+        'Amount': pa.float64(),
+        'PurchaseDatetime': pa.timestamp('ms', tz='UTC'),
+        'CardIssuer': pa.string()
+    })
+    return pa.table({
+        'TransactionID': table['TransactionID'],
+        'CardNumber': strip_dashes(table['CardNumber']),
+        'Merchant': pc.replace_substring(table['Merchant'], ' ', '_'),
+        'Amount': table['Amount'],
+        'PurchaseEpoch': to_epoch_seconds(table['PurchaseDatetime']),
+        'CardIssuer': table['CardIssuer']
+    })
+
+
+def distinct_in_order(table, columns):
+    """
+    Distinct rows over columns in order of first occurrence, like DataFrame.drop_duplicates.
+    """
+    first_rows = table.select(columns).append_column('_row', pa.array(np.arange(table.num_rows))) \
+        .group_by(columns).aggregate([('_row', 'min')]) \
+        .sort_by('_row_min')
+    return first_rows.select(columns)
+
+
+def constant(value, length):
+    return pa.array([value]).take(pa.array(np.zeros(length, dtype=np.int32)))
+
+
+def map_node_ids(nodes: NodeTable, label, values):
+    """
+    Hash-join values against the label's value -> node ID index inside Arrow.
+    """
+    lookup = nodes.lookup(label)
+    positions = pc.index_in(values, value_set=pa.array(lookup.index.to_numpy()))
+    return pc.take(pa.array(lookup.to_numpy(), type=pa.int64()), positions)
+
+
+def add_nodes(nodes: NodeTable, table, label_value_pairs):
+    columns = [column for column in label_value_pairs.values() if column in table.column_names]
+    return nodes.add_nodes(pd.DataFrame({column: table[column].to_numpy() for column in columns}), label_value_pairs)
+
+
+def build_graph_tables(customer_df, transfers, purchases):
+    """
+    Arrow counterpart of ingest.build_graph_frames, assigning the same node ids. Customers stay a pandas DataFrame
+    because of geocoding; their frames are small next to the transfer and purchase tables.
+    """
+    distinct_merchants = distinct_in_order(purchases, ['Merchant'])
+    distinct_card_issuers = distinct_in_order(purchases, ['CardIssuer'])
+    distinct_card_issuer_to_card = distinct_in_order(purchases, ['CardNumber', 'CardIssuer'])
+
+    with span('node_ids') as stage:
+        nodes = NodeTable(starting_index=1)
+        nodes.add_nodes(customer_df, LABEL_VALUE_PAIRS_CUSTOMER)
+        add_nodes(nodes, purchases, LABEL_VALUE_PAIRS_PURCHASE)
+        add_nodes(nodes, distinct_merchants, LABEL_VALUE_PAIRS_MERCHANT)
+        add_nodes(nodes, distinct_card_issuers, LABEL_VALUE_PAIRS_CARD_ISSUERS)
+        placeholder_merchant_node_id = nodes.add_node('Merchant', 'Merchant')
+        stage.add_rows(len(nodes))
+
+    with span('frame_assembly') as stage:
+        customer_node_frames, R1, R3 = customer_frames(customer_df, nodes)
+
+        merchant_node_ids = map_node_ids(nodes, 'Merchant', distinct_merchants['Merchant'])
+        merchant_properties = pa.table({
+            'nodeId': pa.concat_arrays([merchant_node_ids.combine_chunks(), pa.array([placeholder_merchant_node_id], type=pa.int64())]),
+            'labels': pa.concat_arrays([distinct_merchants['Merchant'].combine_chunks(), pa.array(['Merchant'])])
+        })
+        card_issuer_properties = pa.table({
+            'nodeId': map_node_ids(nodes, 'CardIssuer', distinct_card_issuers['CardIssuer']),
+            'labels': distinct_card_issuers['CardIssuer']
+        })
+
+        purchase_ids = map_node_ids(nodes, 'Purchase', purchases['TransactionID'])
+        purchase_merchant_ids = map_node_ids(nodes, 'Merchant', purchases['Merchant'])
+        purchase_properties = pa.table({
+            'nodeId': purchase_ids,
+            'labels': constant("Purchase", purchases.num_rows),
+            'Merchant': purchase_merchant_ids
+        })
+
+        R2 = pa.table({
+            'sourceNodeId': map_node_ids(nodes, 'Account', transfers['SenderAccountNumber']),
+            'targetNodeId': map_node_ids(nodes, 'Account', transfers['ReceiverAccountNumber']),
+            'relationshipType': constant("TRANSFER", transfers.num_rows),
+            'transactionId': transfers['TransactionID'],
+            'transactionAmount': transfers['Amount'],
+            'transferEpoch': transfers['TransferEpoch']
+        })
+        R4 = pa.table({
+            'sourceNodeId': merchant_node_ids,
+            'targetNodeId': pa.array(np.full(len(merchant_node_ids), placeholder_merchant_node_id, dtype=np.int64)),
+            'relationshipType': constant("HAS_TYPE", len(merchant_node_ids))
+        })
+        R5 = pa.table({
+            'sourceNodeId': map_node_ids(nodes, 'Card', purchases['CardNumber']),
+            'targetNodeId': purchase_ids,
+            'relationshipType': constant("PURCHASE", purchases.num_rows),
+            'purchaseId': purchases['TransactionID'],
+            'purchaseAmount': purchases['Amount'],
+            'purchaseEpoch': purchases['PurchaseEpoch']
+        })
+        R6 = pa.table({
+            'sourceNodeId': purchase_ids,
+            'targetNodeId': purchase_merchant_ids,
+            'relationshipType': constant("HAS_MERCHANT", purchases.num_rows)
+        })
+        R7 = pa.table({
+            'sourceNodeId': map_node_ids(nodes, 'Card', distinct_card_issuer_to_card['CardNumber']),
+            'targetNodeId': map_node_ids(nodes, 'CardIssuer', distinct_card_issuer_to_card['CardIssuer']),
+            'relationshipType': constant("HAS_CARD_ISSUER", distinct_card_issuer_to_card.num_rows)
+        })
+
+        node_tables = customer_node_frames + [purchase_properties, merchant_properties, card_issuer_properties]
+        relationship_tables = [R1, R2, R3, R4, R5, R6, R7]
+        stage.add_rows(sum(len(table) for table in node_tables + relationship_tables))
+    return nodes, node_tables, relationship_tables
@@ -0,0 +1,101 @@
+"""
+batch_runner.py
+
+Description:
+Non-interactive runner for the analytics queries. Queries run concurrently on a thread pool, each in its own session
+of a pooled Bolt driver. Every result set is streamed page by page into its own file through a result sink, and a
+summary of the run goes to summary.json.
+
+Every Cypher query is sent with a transaction timeout, so the server cancels it when it runs too long, and a query
+past its timeout stops being written at the next page. Jobs computing their results in-process are given a cancelled
+callable, which turns True past the timeout: the exact Q7 distance stops at its next block and the Q5 cycle search
+terminates its worker processes. Other in-process computations (the local engine, the spatial index) cannot be
+interrupted; past the timeout their result is abandoned and not written, but the batch waits for them on exit.
+
+Date: 17-10-2026
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from metrics import span
+from result_sinks import as_pages, open_sink, stream_cypher, write_pages
+
+log = logging.getLogger('batch')
+
+
+class BatchRunner:
+    def __init__(self, driver, database, timeout=None, workers=None, output_format='jsonl', page_size=10_000, limit=None):
+        self.driver = driver
+        self.database = database
+        self.timeout = timeout
+        self.workers = workers
+        self.output_format = output_format
+        self.page_size = page_size
+        self.limit = limit
+
+    def stream_cypher(self, cypher, params=None):
+        # A session per query, so that concurrent queries borrow separate connections from the driver's pool
+        return stream_cypher(self.driver, self.database, cypher, params, self.page_size, self.timeout)
+
+    def _run_job(self, name, job, out_dir, started, abandoned):
+        started[name] = time.monotonic()
+        with span(name, kind='query') as query_span:
+            result = job(self.stream_cypher, abandoned.is_set)
+            with open_sink(out_dir, name, self.output_format) as sink:
+                complete = write_pages(as_pages(result, self.page_size), sink, self.limit, cancelled=abandoned.is_set)
+            query_span.add_rows(sink.rows)
+        if not complete:
+            os.remove(sink.path)
+            return None
+        return sink.path, sink.rows
+
+    def run(self, jobs, out_dir):
+        """
+        Run every job, a name -> callable(stream_cypher, cancelled) returning a DataFrame or DataFrame pages, and
+        return the summary rows. cancelled returns True once the job is past the timeout.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        started = {}
+        abandoned = {name: threading.Event() for name in jobs}
+        summary = {}
+
+        batch_start = time.monotonic()
+        executor = ThreadPoolExecutor(self.workers or len(jobs) or 1)
+        try:
+            pending = {executor.submit(self._run_job, name, job, out_dir, started, abandoned[name]): name for name, job in jobs.items()}
+            while pending:
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    seconds = time.monotonic() - started.get(name, batch_start)
+                    try:
+                        path, rows = future.result()
+                        summary[name] = {'query': name, 'status': 'ok', 'rows': rows, 'seconds': seconds, 'file': path}
+                        log.info(f"[{name}] {rows} rows in {seconds:.2f}s -> {path}")
+                    except Exception as e:
+                        summary[name] = {'query': name, 'status': 'failed', 'seconds': seconds, 'error': str(e)}
+                        log.error(f"[{name}] failed after {seconds:.2f}s: {e}")
+
+                if self.timeout is None:
+                    continue
+                now = time.monotonic()
+                for future, name in list(pending.items()):
+                    if name in started and now - started[name] > self.timeout:
+                        abandoned[name].set()
+                        future.cancel()
+                        pending.pop(future)
+                        summary[name] = {'query': name, 'status': 'timeout', 'seconds': now - started[name]}
+                        log.error(f"[{name}] cancelled after {self.timeout}s")
+        finally:
+            executor.shutdown(wait=False)
+
+        summary = [summary[name] for name in jobs]
+        with open(os.path.join(out_dir, 'summary.json'), 'w') as f:
+            json.dump({'seconds': time.monotonic() - batch_start, 'queries': summary}, f, indent=2)
+        log.info(f"Batch of {len(jobs)} queries finished in {time.monotonic() - batch_start:.2f}s")
+        return summary
@@ -0,0 +1,262 @@
+"""
+benchmark.py
+
+Description:
+Scaling benchmark of the ingest pipeline and the queries over the synthetic data of generate_data.py. At every scale,
+each ingest stage (CSV parsing, node and relationship assembly, transfer statistics, PageRank and Louvain) and each
+query answered in-process (local engine Q1-Q3, CSR cycle search Q5, distance engine Q7, spatial index Q8, transfer
+scorer Q9) is timed, with the rows it produced and its peak resident memory above the level at which it started.
+With --cypher, the Cypher queries Q1-Q9 are timed as well against the database as currently loaded
+(see neo_arrow_app.py --data-dir).
+
+The report is written as JSON. For every stage measured at two scales it includes the scaling exponent, the slope of
+log(time) over log(scale), so a stage that goes quadratic shows up with an exponent close to 2. A stage whose time,
+extrapolated from the smaller scales, would exceed --stage-budget seconds is skipped at the larger ones.
+
+Date: 17-10-2026
+"""
+
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import platform
+import psutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from arrow_ingest import build_graph_tables, read_purchases, read_transfers
+from communities import community_summary
+from connections import open_driver
+from cycle_engine import CycleConstraints, TransferGraph, find_cycles
+from generate_data import Sample, generate, scale_dir
+from geo_engine import CustomerSpatialIndex, average_distance
+from graph_algorithms import account_scores
+from ingest import CategoryEncoder, build_graph_frames, normalize_purchases, normalize_transfers
+from local_engine import LocalEngine
+from merchant_rollups import MerchantRollupBuilder
+from metrics import PeakMemory
+from queries import QUERIES
+from result_sinks import stream_cypher
+from transfer_scorer import AccountFeatureStore, TransferScorer
+from transfer_stats import TransferStatsBuilder
+
+log = logging.getLogger('benchmark')
+
+# Exponent above which a stage is reported as superlinear
+SUPERLINEAR = 1.3
+
+
+def row_count(result):
+    for attribute in ('num_rows', 'shape'):
+        if hasattr(result, attribute):
+            value = getattr(result, attribute)
+            return int(value[0] if isinstance(value, tuple) else value)
+    return len(result) if hasattr(result, '__len__') else None
+
+
+def graph_rows(graph):
+    # Nodes and relationships of a (nodes, node frames or tables, relationship frames or tables) graph
+    nodes, _, relationships = graph
+    return len(nodes) + sum(row_count(relationship) for relationship in relationships)
+
+
+def read_customers(data_dir):
+    customers = pd.read_csv(os.path.join(data_dir, 'customers.csv'))
+    customers['AccountNumber'] = customers['AccountNumber'].astype(str).str.replace('-', '').astype(int)
+    customers['CardNumber'] = customers['CardNumber'].astype(str).str.replace('-', '').astype(int)
+    customers['Gender_Encoded'] = CategoryEncoder().fit_transform(customers['Gender'])
+    return customers
+
+
+def stages(data_dir, workers=None):
+    """
+    (kind, name, shared, callable(context)) of every stage, in order. Each stage may read the results stored in the
+    context by the stages before it; shared stages store such results, so they run even when they are not measured.
+    """
+    transfers_path = os.path.join(data_dir, 'transfers.csv')
+    purchases_path = os.path.join(data_dir, 'purchases.csv')
+    q5 = QUERIES[5].bind()
+    q9 = QUERIES[9].bind()
+    q3 = QUERIES[3].bind()
+
+    def put(context, key, value):
+        context[key] = value
+        return value
+
+    return [
+        ('ingest', 'read_customers', True, lambda c: put(c, 'customers', read_customers(data_dir))),
+        ('ingest', 'arrow_read_transfers', True, lambda c: put(c, 'transfer_table', read_transfers(transfers_path))),
+        ('ingest', 'arrow_read_purchases', True, lambda c: put(c, 'purchase_table', read_purchases(purchases_path))),
+        ('ingest', 'arrow_build_graph_tables', False, lambda c: graph_rows(build_graph_tables(c['customers'], c['transfer_table'], c['purchase_table']))),
+        ('ingest', 'pandas_normalize_transfers', True, lambda c: put(c, 'transfers', normalize_transfers(pd.read_csv(transfers_path)))),
+        ('ingest', 'pandas_normalize_purchases', True, lambda c: put(c, 'purchases', normalize_purchases(pd.read_csv(purchases_path)))),
+        ('ingest', 'pandas_build_graph_frames', False, lambda c: graph_rows(build_graph_frames(c['customers'], c['transfers'], c['purchases']))),
+        ('ingest', 'transfer_stats', False, lambda c: list(TransferStatsBuilder().add(c['transfers']).senders)),
+        ('ingest', 'merchant_rollups', False, lambda c: list(MerchantRollupBuilder(c['customers']).add(c['purchases']).rollups)),
+        ('ingest', 'pagerank_louvain', True, lambda c: put(c, 'scores', account_scores(
+            pd.concat([c['customers']['AccountNumber'], c['transfers']['SenderAccountNumber'], c['transfers']['ReceiverAccountNumber']]),
+            c['transfers']['SenderAccountNumber'], c['transfers']['ReceiverAccountNumber']))),
+        ('ingest', 'community_summary', False, lambda c: community_summary(
+            c['scores'], c['transfers']['SenderAccountNumber'], c['transfers']['ReceiverAccountNumber'], c['transfers']['Amount'])),
+        ('query', 'Q1_local', True, lambda c: put(c, 'local', LocalEngine(c['customers'], c['purchase_table'].to_pandas())).total_expenditure()),
+        ('query', 'Q2_local', False, lambda c: c['local'].merchant_expenditure()),
+        ('query', 'Q3_local', False, lambda c: c['local'].monthly_merchant_customers(q3['merchant'], q3['year'])),
+        ('query', 'Q5_csr_cycles', False, lambda c: find_cycles(
+            TransferGraph.from_frame(c['transfers']), c['scores'].nlargest(q5['topAccounts'], 'pagerank')['AccountNumber'],
+            CycleConstraints(max_depth=q5['maxDepth']), workers=workers)),
+        ('query', 'Q7_exact', False, lambda c: average_distance(c['customers'], 'exact')),
+        ('query', 'Q7_sampled', False, lambda c: average_distance(c['customers'], 'sampled')),
+        ('query', 'Q8_spatial_index', False, lambda c: CustomerSpatialIndex(c['customers'][['CIF', 'AccountNumber', 'Latitude', 'Longitude']]).closest_pairs(QUERIES[8].bind()['pairs'])),
+        ('query', 'Q9_transfer_scorer', False, lambda c: TransferScorer(
+            AccountFeatureStore.from_frames(c['customers'], c['scores']), q9['minCommunityDifference'], q9['minDistanceKm']).suspicious(c['transfers']))
+    ]
+
+
+def cypher_stages():
+    driver = open_driver()
+
+    def run(query):
+        return sum(len(page) for page in stream_cypher(driver, "customernexus360", query.cypher, query.bind()))
+    return driver, [('cypher', f'Q{number}_cypher', False, lambda c, query=query: run(query)) for number, query in QUERIES.items()]
+
+
+def measure(kind, name, stage, context):
+    gc.collect()
+    start = time.perf_counter()
+    with PeakMemory(interval=0.005) as memory:
+        try:
+            result = stage(context)
+            status, error = 'ok', None
+        except Exception as e:
+            result, status, error = None, 'failed', str(e)
+    seconds = time.perf_counter() - start
+    rows = result if isinstance(result, int) else (row_count(result) if result is not None else None)
+    entry = {'kind': kind, 'stage': name, 'status': status, 'seconds': seconds, 'rows': rows, 'peakRssDeltaBytes': memory.delta}
+    if error:
+        entry['error'] = error
+        log.error(f"  {name} failed after {seconds:.2f}s: {error}")
+    else:
+        log.info(f"  {name:<28} {seconds:>9.3f}s {memory.delta / 1024 ** 2:>9.1f} MiB  {rows} rows")
+    return entry
+
+
+def exponent(small, large):
+    if small['seconds'] <= 0 or large['seconds'] <= 0 or small['scale'] == large['scale']:
+        return None
+    return math.log(large['seconds'] / small['seconds']) / math.log(large['scale'] / small['scale'])
+
+
+def scaling(results):
+    """
+    Scaling exponent of every stage between each pair of consecutive scales it was measured at.
+    """
+    rows = []
+    measured = [r for r in results if r['status'] == 'ok']
+    for name in dict.fromkeys(r['stage'] for r in measured):
+        runs = sorted((r for r in measured if r['stage'] == name), key=lambda r: r['scale'])
+        for small, large in zip(runs, runs[1:]):
+            value = exponent(small, large)
+            if value is not None:
+                rows.append({'stage': name, 'fromScale': small['scale'], 'toScale': large['scale'], 'exponent': value, 'superlinear': value > SUPERLINEAR})
+    return rows
+
+
+def predicted_seconds(history, scale):
+    """
+    Time of a stage at the given scale extrapolated from its last runs, assuming at least linear growth.
+    """
+    if not history:
+        return 0.0
+    last = history[-1]
+    growth = max(exponent(history[-2], last) or 1.0, 1.0) if len(history) > 1 else 1.0
+    return last['seconds'] * (scale / last['scale']) ** growth
+
+
+def run(args):
+    sample = Sample(args.base_dir)
+    results, datasets = [], []
+    history = {}
+    driver, cypher = cypher_stages() if args.cypher else (None, [])
+
+    try:
+        for scale in args.scales:
+            data_dir = args.base_dir if scale == 1 else scale_dir(args.data_dir, scale)
+            if not os.path.exists(os.path.join(data_dir, 'transfers.csv')):
+                if not args.generate:
+                    raise SystemExit(f"No data for scale {scale:g}x in {data_dir}, run generate_data.py or pass --generate")
+                generate(data_dir, scale, sample, args.seed)
+            datasets.append({'scale': scale, 'dataDir': data_dir, 'bytes': {name: os.path.getsize(os.path.join(data_dir, f'{name}.csv')) for name in ('customers', 'purchases', 'transfers')}})
+
+            log.info(f"Scale {scale:g}x ({data_dir})")
+            context = {}
+            for kind, name, shared, stage in stages(data_dir, args.workers):
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    if shared:
+                        stage(context)
+                    continue
+                estimate = predicted_seconds(history.get(name, []), scale)
+                if estimate > args.stage_budget:
+                    log.info(f"  {name:<28} skipped, expected to take {estimate:.0f}s")
+                    results.append({'scale': scale, 'kind': kind, 'stage': name, 'status': 'skipped', 'expectedSeconds': estimate})
+                    continue
+                entry = {'scale': scale, **measure(kind, name, stage, context)}
+                results.append(entry)
+                if entry['status'] == 'ok':
+                    history.setdefault(name, []).append(entry)
+
+        # The database holds a single dataset, so the Cypher queries are measured once
+        for kind, name, _, stage in cypher:
+            results.append({'scale': args.cypher_scale, **measure(kind, name, stage, {})})
+    finally:
+        if driver is not None:
+            driver.close()
+
+    report = {
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'memoryBytes': psutil.virtual_memory().total,
+            'numpy': np.__version__,
+            'pandas': pd.__version__
+        },
+        'datasets': datasets,
+        'results': results,
+        'scaling': scaling(results)
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for row in report['scaling']:
+        if row['superlinear']:
+            log.warning(f"{row['stage']} grows as scale^{row['exponent']:.2f} from {row['fromScale']:g}x to {row['toScale']:g}x")
+    log.info(f"Report written to {args.report}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Time and memory-profile the ingest stages and queries at several data scales")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100], help="Scales to benchmark; 1 is the sample data in --base-dir")
+    parser.add_argument('--base-dir', default='../data', help="Directory holding the sample CSV files")
+    parser.add_argument('--data-dir', default='../data/synthetic', help="Directory holding the x<scale> directories of generate_data.py")
+    parser.add_argument('--generate', action='store_true', help="Generate the data of missing scales")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the data generated with --generate")
+    parser.add_argument('--only', nargs='+', default=None, metavar='PREFIX', help="Only run the stages whose names start with one of these prefixes, e.g. Q7 arrow_")
+    parser.add_argument('--stage-budget', type=float, default=300, help="Skip a stage at a scale where it is expected to take longer than this many seconds")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes of the Q5 cycle search")
+    parser.add_argument('--cypher', action='store_true', help="Also time the Cypher queries Q1-Q9 against the loaded database")
+    parser.add_argument('--cypher-scale', type=float, default=1, help="Scale of the data loaded in the database, recorded with the Cypher timings")
+    parser.add_argument('--report', default='../data/benchmark/report.json', help="Path of the JSON report")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run(parse_args())
@@ -0,0 +1,104 @@
+"""
+communities.py
+
+Description:
+Summary of the Louvain communities for Q6 and community drill-downs, written whenever communityId is. Every community
+of more than one account is stored on a Community node with its size, its members and the internal high-value
+transfers (both accounts in the community, amount of at least HIGH_VALUE_AMOUNT).
+
+Members are listed in decreasing order of the largest transfer they sent or received, accounts without transfers last.
+The accounts of a community on a transfer of at least any amount are then a prefix of the list, so Q6 reads them from
+the summary for whatever minAmount it is given, instead of scanning and regrouping the TRANSFER relationships.
+
+Date: 17-10-2026
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+
+from post_load import write_batches
+
+log = logging.getLogger('communities')
+
+# Default minAmount of Q6, and the amount from which transfers count as high-value in the summary
+HIGH_VALUE_AMOUNT = 5000.0
+
+
+def community_summary(scores: pd.DataFrame, senders, receivers, amounts, min_amount=HIGH_VALUE_AMOUNT):
+    """
+    One row per community of more than one account, largest first, from the AccountNumber and communityId of every
+    account and the sender, receiver and amount of every transfer.
+    """
+    community = pd.Series(scores['communityId'].to_numpy(), index=scores['AccountNumber'].to_numpy())
+    transfers = pd.DataFrame({'sender': np.asarray(senders), 'receiver': np.asarray(receivers), 'amount': np.asarray(amounts, dtype=np.float64)})
+
+    # Largest transfer on either side of every account
+    largest = pd.concat([transfers.groupby('sender')['amount'].max(), transfers.groupby('receiver')['amount'].max()]).groupby(level=0).max()
+    members = pd.DataFrame({
+        'communityId': community.to_numpy(),
+        'account': community.index.to_numpy(),
+        'largest': largest.reindex(community.index).to_numpy()
+    })
+    members['size'] = members.groupby('communityId')['account'].transform('size')
+    members = members[members['size'] > 1].sort_values(['communityId', 'largest', 'account'], ascending=[True, False, True], na_position='last')
+
+    grouped = members.groupby('communityId', sort=False)
+    summary = pd.DataFrame({
+        'size': grouped.size(),
+        'members': grouped['account'].agg(lambda values: values.tolist()),
+        'memberMaxAmounts': grouped['largest'].agg(lambda values: values.dropna().tolist()),
+        'maxTransferAmount': grouped['largest'].max()
+    })
+    summary['transferMembers'] = summary['memberMaxAmounts'].str.len()
+
+    # Transfers between two accounts of the same community, from the high-value threshold
+    high_value = transfers[transfers['amount'] >= min_amount]
+    sender_community = high_value['sender'].map(community)
+    internal = high_value[sender_community.to_numpy() == high_value['receiver'].map(community).to_numpy()]
+    internal_totals = internal.groupby(sender_community[internal.index])['amount'].agg(['size', 'sum'])
+    summary['highValueTransferCount'] = internal_totals['size'].reindex(summary.index, fill_value=0).astype(np.int64)
+    summary['highValueAmount'] = internal_totals['sum'].reindex(summary.index, fill_value=0.0)
+    summary['highValueThreshold'] = float(min_amount)
+
+    summary = summary.rename_axis('communityId').reset_index()
+    summary['maxTransferAmount'] = summary['maxTransferAmount'].fillna(0.0)
+    return summary.sort_values(['size', 'communityId'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+
+def write_community_summary(gds, database, summary: pd.DataFrame):
+    # Community ids change with every Louvain run, so the previous summary is replaced as a whole
+    gds.run_cypher("""
+        MATCH (c:Community)
+        CALL {
+            WITH c
+            DELETE c
+        } IN TRANSACTIONS OF 10000 ROWS
+    """, database=database)
+    gds.run_cypher("CREATE INDEX community_id IF NOT EXISTS FOR (c:Community) ON (c.communityId)", database=database)
+    gds.run_cypher("CREATE INDEX community_max_transfer IF NOT EXISTS FOR (c:Community) ON (c.maxTransferAmount)", database=database)
+    write_batches(gds, """
+        UNWIND $rows AS row
+        CREATE (c:Community)
+        SET c = row
+    """, summary, database)
+    log.info(f"Wrote the summary of {len(summary)} communities")
+
+
+def summarize_communities(gds, database, min_amount=HIGH_VALUE_AMOUNT):
+    """
+    Summarize the communityId already written to the accounts, such as by gds.louvain.write, from a single pass over
+    the TRANSFER relationships.
+    """
+    scores = gds.run_cypher("""
+        MATCH (a:Account)
+        WHERE a.communityId IS NOT NULL
+        RETURN a.AccountNumber AS AccountNumber, a.communityId AS communityId
+    """, database=database)
+    transfers = gds.run_cypher("""
+        MATCH (a:Account)-[r:TRANSFER]->(b:Account)
+        RETURN a.AccountNumber AS sender, b.AccountNumber AS receiver, r.transactionAmount AS amount
+    """, database=database)
+    summary = community_summary(scores, transfers['sender'], transfers['receiver'], transfers['amount'], min_amount)
+    write_community_summary(gds, database, summary)
+    return summary
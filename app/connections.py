@@ -0,0 +1,62 @@
+"""
+connections.py
+
+Description:
+Neo4j connections shared by the apps and created on first use. The graphdatascience and neo4j packages, and the
+pydantic and pyarrow they import, are only loaded when a connection is first needed. Importing an app, running the
+local engine or printing --help then pays neither for them nor for a handshake with the server. Every caller asking
+for the same database gets the same client, and the clients are closed at exit.
+
+Date: 17-10-2026
+"""
+
+import atexit
+import os
+import threading
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def credentials():
+    return "bolt://" + os.environ["NEO4J_URI"], (os.environ["NEO4J_USERNAME"], os.environ["NEO4J_PASSWORD"])
+
+
+def gds_client(database=None, arrow=True):
+    """
+    GraphDataScience client of database, created by the first call and shared by the later ones.
+    """
+    key = ('gds', database, arrow)
+    with _lock:
+        if key not in _clients:
+            from graphdatascience import GraphDataScience
+            uri, auth = credentials()
+            _clients[key] = GraphDataScience(uri, auth=auth, database=database, arrow=arrow)
+        return _clients[key]
+
+
+def open_driver(pool_size=10):
+    """
+    A Bolt driver of its own, closed by the caller, e.g. with a pool sized for the workers of a batch.
+    """
+    from neo4j import GraphDatabase
+    uri, auth = credentials()
+    return GraphDatabase.driver(uri, auth=auth, max_connection_pool_size=pool_size)
+
+
+def bolt_driver():
+    """
+    Shared Bolt driver, created by the first call.
+    """
+    with _lock:
+        if 'driver' not in _clients:
+            _clients['driver'] = open_driver()
+        return _clients['driver']
+
+
+@atexit.register
+def close():
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
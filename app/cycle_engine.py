@@ -0,0 +1,199 @@
+"""
+cycle_engine.py
+
+Description:
+In-process money-loop search for Q5. TRANSFER edges are held in a compact CSR adjacency, and closed loops through a set
+of seed accounts are enumerated depth-first with a depth bound. The search only enters accounts that can still get back
+to the seed within the remaining depth, which is known from a reverse breadth-first search. As in Johnson's algorithm,
+a loop through several seeds is reported once, from the first of them. The number of loops per seed is capped, loops can
+be constrained in time and amount, and seeds are searched in parallel.
+
+Date: 17-10-2026
+"""
+
+import multiprocessing
+import numpy as np
+import pandas as pd
+import time
+
+from concurrent.futures import CancelledError
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class CycleConstraints:
+    max_depth: int = 10
+    # Cap on the loops reported per seed, and on the search time spent per seed
+    max_cycles_per_seed: int = 1000
+    max_seconds_per_seed: Optional[float] = None
+    # Transfers along the loop must happen in chronological order, all within max_window_seconds of the first one
+    chronological: bool = False
+    max_window_seconds: Optional[int] = None
+    # Every transfer must be at least min_amount, and at least min_amount_ratio times the previous transfer
+    min_amount: Optional[float] = None
+    min_amount_ratio: Optional[float] = None
+
+
+class TransferGraph:
+    """
+    CSR adjacency of the TRANSFER edges: the outgoing edges of account position v are edges indptr[v]:indptr[v + 1],
+    with their receivers, transaction ids, amounts and epochs in parallel arrays.
+    """
+
+    def __init__(self, senders, receivers, transaction_ids, amounts, epochs):
+        senders, receivers = np.asarray(senders), np.asarray(receivers)
+        self.accounts = np.unique(np.concatenate([senders, receivers]))
+        source = np.searchsorted(self.accounts, senders)
+        target = np.searchsorted(self.accounts, receivers)
+
+        order = np.argsort(source, kind='stable')
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(source, minlength=len(self.accounts)))])
+        self.targets = target[order]
+        self.transaction_ids = np.asarray(transaction_ids)[order]
+        self.amounts = np.asarray(amounts, dtype=np.float64)[order]
+        self.epochs = np.asarray(epochs, dtype=np.int64)[order]
+
+        # Reverse adjacency, used to find how far each account is from getting back to a seed
+        reverse_order = np.argsort(target, kind='stable')
+        self.reverse_indptr = np.concatenate([[0], np.cumsum(np.bincount(target, minlength=len(self.accounts)))])
+        self.reverse_sources = source[reverse_order]
+
+    @classmethod
+    def from_frame(cls, transfers: pd.DataFrame):
+        """
+        From normalized transfers, with SenderAccountNumber, ReceiverAccountNumber, TransactionID, Amount, TransferEpoch.
+        """
+        return cls(transfers['SenderAccountNumber'], transfers['ReceiverAccountNumber'], transfers['TransactionID'],
+                   transfers['Amount'], transfers['TransferEpoch'])
+
+    def positions(self, account_numbers):
+        account_numbers = np.asarray(account_numbers)
+        positions = np.searchsorted(self.accounts, account_numbers)
+        found = (positions < len(self.accounts)) & (self.accounts[np.minimum(positions, len(self.accounts) - 1)] == account_numbers)
+        return positions[found]
+
+    def distances_to(self, seed, max_depth, excluded):
+        """
+        Number of transfers needed to get from every account back to seed, or max_depth + 1 when it cannot be done
+        within max_depth without going through an excluded account.
+        """
+        distances = np.full(len(self.accounts), max_depth + 1, dtype=np.int32)
+        distances[seed] = 0
+        frontier = [seed]
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for v in frontier:
+                for u in self.reverse_sources[self.reverse_indptr[v]:self.reverse_indptr[v + 1]]:
+                    if distances[u] > depth and not excluded[u]:
+                        distances[u] = depth
+                        next_frontier.append(u)
+            frontier = next_frontier
+        return distances
+
+
+def _search(graph: TransferGraph, seed, excluded, constraints: CycleConstraints):
+    distances = graph.distances_to(seed, constraints.max_depth, excluded)
+    deadline = time.monotonic() + constraints.max_seconds_per_seed if constraints.max_seconds_per_seed else None
+
+    cycles = []
+    on_path = np.zeros(len(graph.accounts), dtype=bool)
+    path_edges = []
+
+    def admissible(edge):
+        amount, epoch = graph.amounts[edge], graph.epochs[edge]
+        if constraints.min_amount is not None and amount < constraints.min_amount:
+            return False
+        if path_edges:
+            previous = path_edges[-1]
+            if constraints.min_amount_ratio is not None and amount < constraints.min_amount_ratio * graph.amounts[previous]:
+                return False
+            if constraints.chronological and epoch < graph.epochs[previous]:
+                return False
+            if constraints.max_window_seconds is not None and abs(epoch - graph.epochs[path_edges[0]]) > constraints.max_window_seconds:
+                return False
+        return True
+
+    def extend(v, depth):
+        if len(cycles) >= constraints.max_cycles_per_seed or (deadline is not None and time.monotonic() > deadline):
+            return
+        for edge in range(graph.indptr[v], graph.indptr[v + 1]):
+            w = graph.targets[edge]
+            # Only enter accounts from which the seed is still reachable within the remaining depth
+            if depth + 1 + distances[w] > constraints.max_depth or not admissible(edge):
+                continue
+            if w == seed:
+                cycles.append(path_edges + [edge])
+            elif not on_path[w]:
+                on_path[w] = True
+                path_edges.append(edge)
+                extend(w, depth + 1)
+                path_edges.pop()
+                on_path[w] = False
+            if len(cycles) >= constraints.max_cycles_per_seed:
+                return
+
+    on_path[seed] = True
+    extend(seed, 0)
+    return cycles
+
+
+def _cycle_rows(graph: TransferGraph, seed, cycles):
+    rows = []
+    for edges in cycles:
+        edges = np.asarray(edges)
+        rows.append({
+            'SeedAccountNumber': graph.accounts[seed].item(),
+            'Cycle': [graph.accounts[seed].item()] + graph.accounts[graph.targets[edges]].tolist(),
+            'CycleLength': len(edges),
+            'TransactionIds': graph.transaction_ids[edges].tolist(),
+            'TotalAmount': float(graph.amounts[edges].sum()),
+            'StartEpoch': int(graph.epochs[edges].min()),
+            'EndEpoch': int(graph.epochs[edges].max())
+        })
+    return rows
+
+
+# Graph shared with the worker processes through the pool initializer rather than pickled for every seed
+_worker_graph = None
+
+def _init_worker(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+def _search_seed(args):
+    seed, excluded_seeds, constraints = args
+    excluded = np.zeros(len(_worker_graph.accounts), dtype=bool)
+    excluded[excluded_seeds] = True
+    return _cycle_rows(_worker_graph, seed, _search(_worker_graph, seed, excluded, constraints))
+
+
+def find_cycles(graph: TransferGraph, seed_accounts, constraints: Optional[CycleConstraints] = None, workers=None, cancelled=None):
+    """
+    Enumerate the closed TRANSFER loops through the seed accounts, longest first. A loop is a sequence of transfers
+    that starts and ends at a seed and visits every other account at most once.
+
+    cancelled, if given, is polled while the search runs; once it returns True the worker processes are terminated and
+    CancelledError is raised. The search then always runs in worker processes, so that it can be stopped mid-seed.
+    """
+    constraints = constraints or CycleConstraints()
+    seeds = list(dict.fromkeys(graph.positions(seed_accounts)))
+    # Loops through an earlier seed were already reported from that seed
+    tasks = [(seed, seeds[:k], constraints) for k, seed in enumerate(seeds)]
+
+    if cancelled is None and (workers == 1 or len(tasks) <= 1):
+        _init_worker(graph)
+        results = [_search_seed(task) for task in tasks]
+    else:
+        # Leaving the pool terminates its workers, including when the search is cancelled
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(graph,)) as pool:
+            pending = pool.map_async(_search_seed, tasks)
+            while not pending.ready():
+                pending.wait(0.2)
+                if cancelled is not None and cancelled():
+                    raise CancelledError("Cycle search cancelled")
+            results = pending.get()
+
+    cycles = pd.DataFrame([row for rows in results for row in rows],
+                          columns=['SeedAccountNumber', 'Cycle', 'CycleLength', 'TransactionIds', 'TotalAmount', 'StartEpoch', 'EndEpoch'])
+    return cycles.sort_values('CycleLength', ascending=False, kind='stable').reset_index(drop=True)
@@ -8,56 +8,247 @@ Author: Benjamin Chu
 Date: 11-09-2023
 """
 
+import argparse
+import atexit
 import logging
-import os
-import pandas as pd
+import time
 
+from connections import bolt_driver, gds_client, open_driver
 from dotenv import load_dotenv
-from graphdatascience import GraphDataScience
+from graph_state import GraphState, MemoryBudgetExceeded, graph_fingerprint, parse_bytes
+from lazy_imports import lazy_import
+from metrics import span, tracer
+from queries import QUERIES, parse_overrides, warm_up
+
+# The engines, and the pandas, pyarrow, SciPy and neo4j imports behind them, are loaded by the first run that uses them
+pd = lazy_import('pandas')
+batch_runner = lazy_import('batch_runner')
+communities = lazy_import('communities')
+cycle_engine = lazy_import('cycle_engine')
+geo_engine = lazy_import('geo_engine')
+graph_algorithms = lazy_import('graph_algorithms')
+ingest = lazy_import('ingest')
+local_engine = lazy_import('local_engine')
+query_cache_module = lazy_import('query_cache')
+result_sinks = lazy_import('result_sinks')
+stream_ingest = lazy_import('stream_ingest')
+transfer_scorer = lazy_import('transfer_scorer')
 
 load_dotenv()
 
-NEO4J_URI = os.environ["NEO4J_URI"]
-NEO4J_USERNAME = os.environ["NEO4J_USERNAME"]
-NEO4J_PASSWORD = os.environ["NEO4J_PASSWORD"]
 CATALOG = "AccountGraph"
 
-gds = GraphDataScience("bolt://"+NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD), database="customernexus360")
+# Connected in connect(), so that the local engine can run without a database
+gds = None
+
+# Results of fetch and stream, created in main unless --no-cache
+query_cache = None
 
 log = logging.getLogger('cypher')
 logging.basicConfig(level=logging.INFO)
 
-def init_graph():
-    g1_node_projection = ['Account']
-    g1_relationship_projection = {"TRANSFER": {"orientation": "NATURAL"}}
+def connect():
+    global gds
+    gds = gds_client("customernexus360")
+
+# Projection and algorithm parameters; changing any of them invalidates the recorded graph state
+GRAPH_PARAMS = {
+    'nodeProjection': ['Account'],
+    'relationshipProjection': {"TRANSFER": {"orientation": "NATURAL"}},
+    'pageRank': {'writeProperty': 'pagerank'},
+    'louvain': {'writeProperty': 'communityId'}
+}
+
+def init_graph(memory_budget=None, force=False, engine='gds'):
+    """
+    Project the account graph and write pagerank, communityId and the community summary, unless the TRANSFER edges and
+    parameters still match the fingerprint recorded by the last run. The customers' Coordinate points are written by the loader. With the
+    local engine the algorithms run in-process instead, and their results may already have been written by the loader.
+    """
+    params = GRAPH_PARAMS if engine == 'gds' else graph_algorithms.ALGORITHM_PARAMS
+    state = GraphState.read(gds, CATALOG)
+    fingerprint = graph_fingerprint(gds, params)
+    if fingerprint == state.fingerprint and not force:
+        if engine == 'local':
+            log.info(f" Graph unchanged since version {state.version}, keeping the in-process algorithm results")
+            return state
+        projection = "reusing the existing projection" if gds.graph.exists(CATALOG)['exists'] else "no projection needed"
+        log.info(f" Graph unchanged since version {state.version}, {projection}")
+        return state
+
+    if engine == 'local':
+        scores, edges = local_scores()
+        graph_algorithms.write_account_scores(gds, None, scores)
+        communities.write_community_summary(gds, None, communities.community_summary(scores, edges['SenderAccountNumber'], edges['ReceiverAccountNumber'], edges['Amount']))
+        state.record(gds, fingerprint, params)
+        log.info(f" Graph state recorded as version {state.version}")
+        return state
 
     # Before actually going through with the projection, check how much memory is required
-    results = gds.graph.project.estimate(g1_node_projection, g1_relationship_projection)
+    results = gds.graph.project.estimate(GRAPH_PARAMS['nodeProjection'], GRAPH_PARAMS['relationshipProjection'])
 
     log.info(" Required memory for native loading >> " + str(results['requiredMemory']))
+    if memory_budget is not None and results['bytesMax'] > memory_budget:
+        raise MemoryBudgetExceeded(f"Projecting {CATALOG} may need {results['requiredMemory']}, over the budget of {memory_budget} bytes")
 
     if gds.graph.exists(CATALOG)['exists']:
         gds.graph.get(CATALOG).drop()
-    else:
-        G1, _ = gds.graph.project(CATALOG, g1_node_projection, g1_relationship_projection)
+    G1, _ = gds.graph.project(CATALOG, GRAPH_PARAMS['nodeProjection'], GRAPH_PARAMS['relationshipProjection'])
 
-        pagerank_metadata = gds.pageRank.write(G1, writeProperty='pagerank')
-        log.info(pagerank_metadata)
+    pagerank_metadata = gds.pageRank.write(G1, **GRAPH_PARAMS['pageRank'])
+    log.info(pagerank_metadata)
 
-        louvain_metadata = gds.louvain.write(G1, writeProperty='communityId')
-        log.info(louvain_metadata)
-    
-    gds.run_cypher("""
-        MATCH (c:Customer)
-        SET c.Coordinate = point({latitude: toFloat(c.Latitude), longitude: toFloat(c.Longitude)})
-        RETURN DISTINCT COUNT(c)
+    louvain_metadata = gds.louvain.write(G1, **GRAPH_PARAMS['louvain'])
+    log.info(louvain_metadata)
+    communities.summarize_communities(gds, None)
+
+    state.record(gds, fingerprint, GRAPH_PARAMS)
+    log.info(f" Graph state recorded as version {state.version}")
+    return state
+
+# PageRank and Louvain computed in-process from the accounts and TRANSFER edges of the database, with the edges
+def local_scores():
+    accounts = gds.run_cypher("MATCH (a:Account) RETURN a.AccountNumber AS AccountNumber")['AccountNumber']
+    edges = gds.run_cypher("""
+        MATCH (a:Account)-[r:TRANSFER]->(b:Account)
+        RETURN a.AccountNumber AS SenderAccountNumber, b.AccountNumber AS ReceiverAccountNumber, r.transactionAmount AS Amount
     """)
+    return graph_algorithms.account_scores(accounts, edges['SenderAccountNumber'], edges['ReceiverAccountNumber']), edges
 
-# Run and log the Cypher query with description and results
-def run_query(cypher_query, query_name, query_description):
-    # Run the Cypher query and get the results as a DataFrame
-    results_df = gds.run_cypher(cypher_query)
+# Customer coordinates, from the local engine or with a single linear scan of the Customer nodes
+def customer_locations(local=None):
+    if local is not None:
+        return local.customers[['CIF', 'AccountNumber', 'Latitude', 'Longitude']]
+    return gds.run_cypher("""
+        MATCH (c:Customer)
+        OPTIONAL MATCH (c)-[:HAS_ACCOUNT]->(a:Account)
+        RETURN c.CIF AS CIF, a.AccountNumber AS AccountNumber, c.Latitude AS Latitude, c.Longitude AS Longitude
+        ORDER BY id(c)
+    """)
 
+# Spatial index over the customer coordinates, built on first use
+_spatial_index = None
+
+def spatial_index(local=None):
+    global _spatial_index
+    if _spatial_index is None:
+        _spatial_index = geo_engine.CustomerSpatialIndex(customer_locations(local))
+    return _spatial_index
+
+# TRANSFER edges held in a CSR adjacency, fetched with a single scan of the relationships on first use
+_transfer_graph = None
+
+def transfer_graph():
+    global _transfer_graph
+    if _transfer_graph is None:
+        _transfer_graph = cycle_engine.TransferGraph.from_frame(gds.run_cypher("""
+            MATCH (a:Account)-[r:TRANSFER]->(b:Account)
+            RETURN a.AccountNumber AS SenderAccountNumber, b.AccountNumber AS ReceiverAccountNumber, r.transactionId AS TransactionID,
+                r.transactionAmount AS Amount, r.transferEpoch AS TransferEpoch
+        """))
+    return _transfer_graph
+
+# Q5 with the in-process cycle search, seeded with the top accounts by PageRank
+def money_loops(args, params, cancelled=None):
+    seeds = gds.run_cypher("""
+        MATCH (a:Account)
+        RETURN a.AccountNumber AS AccountNumber
+        ORDER BY a.pagerank DESC
+        LIMIT $topAccounts
+    """, {'topAccounts': params['topAccounts']})['AccountNumber']
+    constraints = cycle_engine.CycleConstraints(
+        max_depth=params['maxDepth'],
+        max_cycles_per_seed=args.cycles_per_seed,
+        chronological=args.cycle_chronological,
+        max_window_seconds=int(args.cycle_window_hours * 3600) if args.cycle_window_hours else None,
+        min_amount=args.cycle_min_amount
+    )
+    return cycle_engine.find_cycles(transfer_graph(), seeds, constraints, workers=args.cycle_workers, cancelled=cancelled)
+
+# Run the Cypher query, through the result cache when there is one
+def fetch(cypher_query, params=None):
+    if query_cache is None:
+        return gds.run_cypher(cypher_query, params)
+    # Cached results are only served for the current version of the graph
+    query_cache.set_stamp(GraphState.read(gds, CATALOG).stamp)
+    return query_cache.get_or_run(cypher_query, params, gds.run_cypher)
+
+# Pages of the Cypher query result, streamed from the driver or from the result cache
+def stream(cypher_query, params=None, page_size=10_000):
+    def from_driver(cypher_query, params):
+        return result_sinks.stream_cypher(bolt_driver(), "customernexus360", cypher_query, params, page_size)
+    if query_cache is None:
+        return from_driver(cypher_query, params)
+    query_cache.set_stamp(GraphState.read(gds, CATALOG).stamp)
+    return query_cache.get_or_stream(cypher_query, params, from_driver, page_size)
+
+# Members of a community from its summary, largest transfer first
+def community_members(community_id, run=fetch):
+    return run("""
+        MATCH (c:Community {communityId: $communityId})
+        UNWIND range(0, c.size - 1) AS i
+        RETURN c.members[i] AS AccountNumber, c.memberMaxAmounts[i] AS LargestTransferAmount
+    """, {'communityId': community_id})
+
+# Queries that need the algorithm results or transfers of the database
+NEO4J_ONLY = (4, 5, 6, 9)
+
+# Results of the selected query from the engines chosen on the command line; run executes the Cypher queries,
+# overrides replace the default values of the query parameters and cancelled stops the in-process Q5 and exact Q7
+def answer(selected_query, args, local=None, run=fetch, overrides=None, cancelled=None):
+    query = QUERIES[selected_query]
+    params = query.bind(overrides)
+    if local is not None:
+        if selected_query == 1:
+            return local.total_expenditure()
+        if selected_query == 2:
+            return local.merchant_expenditure()
+        if selected_query == 3:
+            return local.monthly_merchant_customers(params['merchant'], params['year'])
+    if selected_query == 5 and args.cycle_engine == 'csr':
+        return money_loops(args, params, cancelled)
+    if selected_query == 7 and (local is not None or args.distance_engine != 'cypher'):
+        mode = 'sampled' if args.distance_engine == 'sampled' else 'exact'
+        return geo_engine.average_distance(customer_locations(local).drop_duplicates(subset='CIF'), mode, samples=args.distance_samples, cancelled=cancelled)
+    if selected_query == 8 and (local is not None or args.pairs_engine == 'index'):
+        return spatial_index(local).closest_pairs(params['pairs'])
+    return run(query.cypher, params)
+
+# Run the selected queries concurrently and write each result set to its own file
+def run_batch(selected_queries, args, local=None):
+    skipped = [n for n in selected_queries if local is not None and n in NEO4J_ONLY]
+    for n in skipped:
+        log.info(f"{QUERIES[n].name} is only available with --engine neo4j, skipped.")
+    jobs = {QUERIES[n].name: (lambda run, cancelled, n=n: answer(n, args, local, run, args.param, cancelled)) for n in selected_queries if n not in skipped}
+
+    batch_driver = open_driver(args.batch_workers or len(jobs)) if local is None else None
+    try:
+        output_format = 'jsonl' if args.output_format == 'log' else args.output_format
+        return batch_runner.BatchRunner(batch_driver, "customernexus360", args.query_timeout, args.batch_workers, output_format, args.page_size, args.limit).run(jobs, args.batch_dir)
+    finally:
+        if batch_driver is not None:
+            batch_driver.close()
+
+# Score the transfers of a CSV file with the Q9 rules as they are read, and write the suspicious ones
+def score_transfers(args):
+    params = QUERIES[9].bind(args.param)
+    scorer = transfer_scorer.TransferScorer(transfer_scorer.AccountFeatureStore.from_graph(gds), params['minCommunityDifference'], params['minDistanceKm'])
+    log.info(f" Loaded the features of {len(scorer.store)} accounts")
+    transfers = stream_ingest.iter_csv_chunks(args.score_transfers, args.score_batch_size, ingest.normalize_transfers)
+    report(scorer.stream(transfers, args.score_batch_size), "SCORED-TRANSFERS", "Transfers flagged by the Q9 rules as they are read.", args)
+    log.info(f"Transfer scorer -> {scorer.stats()}")
+
+def parse_query_numbers(value):
+    if value == 'all':
+        return list(QUERIES)
+    numbers = [int(n) for n in value.split(',')]
+    unknown = [n for n in numbers if n not in QUERIES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown queries: {unknown}")
+    return numbers
+
+# Log the query results with name and description
+def log_results(results_df, query_name, query_description):
     # Log the query name
     log.info(f"[{query_name}]")
     # Log the query description
@@ -70,8 +261,89 @@ def run_query(cypher_query, query_name, query_description):
     log.info("\nResults -> \n" + json_result)
     log.info("\n\n")
 
+# Write the results page by page to the output file and log a summary, or log them whole with --output-format log
+def report(result, query_name, query_description, args):
+    if args.output_format == 'log':
+        with span(query_name, kind='query') as query_span:
+            results_df = result if isinstance(result, pd.DataFrame) else pd.concat(list(result), ignore_index=True)
+            query_span.add_rows(len(results_df))
+        log_results(results_df, query_name, query_description)
+        return
+
+    start = time.monotonic()
+    with span(query_name, kind='query') as query_span, result_sinks.open_sink(args.output_dir, query_name, args.output_format) as sink:
+        result_sinks.write_pages(result_sinks.as_pages(result, args.page_size), sink, args.limit)
+        query_span.add_rows(sink.rows)
+    log.info(f"[{query_name}]")
+    log.info("\nDescription -> " + query_description)
+    log.info(f"\nResults -> {sink.rows} rows in {sink.pages} pages written to {sink.path} ({time.monotonic() - start:.2f}s)\n\n")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the CustomerNexus360 analytics queries")
+    parser.add_argument('--engine', choices=['neo4j', 'local'], default='neo4j', help="Answer Q1-Q3 from Neo4j or from an in-process columnar store over the CSV files")
+    parser.add_argument('--data-dir', default='../data', help="Directory holding customers.csv and purchases.csv for the local engine")
+    parser.add_argument('--snapshot-dir', default=None, help="Parquet snapshot used (and written if missing) by the local engine")
+    parser.add_argument('--distance-engine', choices=['cypher', 'exact', 'sampled'], default='cypher', help="Compute Q7 in Cypher, exactly with blocked NumPy haversine, or as a sampled estimate")
+    parser.add_argument('--pairs-engine', choices=['cypher', 'index'], default='cypher', help="Compute Q8 in Cypher or from a spatial index over the customer coordinates")
+    parser.add_argument('--distance-samples', type=int, default=100_000, help="Number of sampled customer pairs for --distance-engine sampled")
+    parser.add_argument('--memory-budget', type=parse_bytes, default=None, help="Refuse to project the account graph if its estimated size exceeds this budget, e.g. 2G")
+    parser.add_argument('--recompute', action='store_true', help="Rewrite pagerank and communityId even if the graph is unchanged")
+    parser.add_argument('--algorithm-engine', choices=['gds', 'local'], default='gds', help="Compute pagerank and communityId with a GDS projection or in-process with SciPy")
+    parser.add_argument('--cache-size', type=parse_bytes, default='256M', help="Memory budget of the query result cache, e.g. 512M")
+    parser.add_argument('--cache-dir', default=None, help="Directory of the on-disk Parquet tier of the query result cache")
+    parser.add_argument('--no-cache', action='store_true', help="Run every query against the database")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE', help="Query parameter overriding its default, e.g. --param year=2022 (repeatable)")
+    parser.add_argument('--no-warm-up', action='store_true', help="Skip planning the queries with EXPLAIN at startup")
+    parser.add_argument('--output-format', choices=['jsonl', 'csv', 'parquet', 'arrow', 'log'], default='jsonl', help="Stream the results to a file in this format, or log them whole with 'log'")
+    parser.add_argument('--output-dir', default='../data/results', help="Directory receiving one result file per query")
+    parser.add_argument('--page-size', type=int, default=10_000, help="Number of records fetched from the database and written at a time")
+    parser.add_argument('--limit', type=int, default=None, help="Write at most this many rows of each result")
+    parser.add_argument('--batch', type=parse_query_numbers, default=None, help="Run these queries (e.g. 1,2,4 or all) concurrently without the menu, and exit")
+    parser.add_argument('--batch-dir', default='../data/batch', help="Directory receiving one result file per query and summary.json in batch mode")
+    parser.add_argument('--batch-workers', type=int, default=None, help="Number of queries run at the same time in batch mode (default: all of them)")
+    parser.add_argument('--query-timeout', type=float, default=None, help="Cancel a query in batch mode after this many seconds: on the server for Cypher, at the next check for the in-process Q5 and exact Q7")
+    parser.add_argument('--cycle-engine', choices=['apoc', 'csr'], default='apoc', help="Find the Q5 money loops with apoc.nodes.cycles or with the in-process CSR cycle search")
+    parser.add_argument('--cycles-per-seed', type=int, default=1000, help="Maximum number of Q5 loops reported per seed account for --cycle-engine csr")
+    parser.add_argument('--cycle-chronological', action='store_true', help="Only report Q5 loops whose transfers happen in chronological order")
+    parser.add_argument('--cycle-window-hours', type=float, default=None, help="Only report Q5 loops whose transfers all happen within this many hours")
+    parser.add_argument('--cycle-min-amount', type=float, default=None, help="Only report Q5 loops whose transfers are all at least this amount")
+    parser.add_argument('--cycle-workers', type=int, default=None, help="Number of processes searching the Q5 seed accounts in parallel")
+    parser.add_argument('--metrics-dir', default='../data/metrics', help="Directory receiving queries.prom and queries_trace.json with the latency of the queries run, on exit")
+    parser.add_argument('--score-transfers', default=None, metavar='CSV', help="Score the transfers of this CSV file with the Q9 rules from an in-memory account feature store, and exit")
+    parser.add_argument('--score-batch-size', type=int, default=1000, help="Number of transfers scored at a time by --score-transfers")
+    args = parser.parse_args()
+    try:
+        args.param = parse_overrides(args.param)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
 if __name__ == "__main__":
-    init_graph()
+    args = parse_args()
+    # Export the query spans however the app exits
+    atexit.register(tracer.export, args.metrics_dir, 'queries')
+
+    local = None
+    if args.engine == 'local':
+        local = local_engine.LocalEngine.open(args.data_dir, args.snapshot_dir)
+    else:
+        connect()
+        init_graph(args.memory_budget, args.recompute, args.algorithm_engine)
+        if not args.no_cache:
+            query_cache = query_cache_module.QueryCache(args.cache_size, args.cache_dir)
+        if not args.no_warm_up:
+            warm_up(gds.run_cypher)
+            log.info(f" Planned {len(QUERIES)} queries")
+
+    if args.batch:
+        run_batch(args.batch, args, local)
+        raise SystemExit(0)
+
+    if args.score_transfers:
+        if local is not None:
+            raise SystemExit("--score-transfers needs the pagerank and communityId of the database, use --engine neo4j")
+        score_transfers(args)
+        raise SystemExit(0)
 
     while True:
         log.info("  Select a query to run from 1-6 or type 'Q' to exit:")
@@ -84,245 +356,64 @@ if __name__ == "__main__":
         log.info("  [Q7] This query calculates the average distance between pairs of customer locations based on latitude and longitude.")
         log.info("  [Q8] This query calculates the pairwise distances in kilometers between customers' locations based on their associated accounts, aiming to understand the geographic proximity between customers.")
         log.info("  [Q9] This query identifies potential account fraud based on community difference, PageRank, and geographic proximity.")
+        log.info("  [R] List all customers within a given distance (km) of a customer.")
+        log.info("  [M] List the members of a Louvain community, largest transfer first.")
+        log.info("  [C] Show the query result cache statistics.")
 
-        user_input = input("\nEnter the query number or 'Q' to exit: ")
+        user_input = input("\nEnter the query number, optionally followed by NAME=VALUE parameters, or 'Q' to exit: ")
 
         if user_input == 'Q':
             log.info("  Exit")
             break  # Exit when the user types 'exit'
 
+        if user_input == 'C':
+            log.info(f"Query cache -> {query_cache.stats() if query_cache is not None else 'disabled'}")
+            continue
+
+        if user_input == 'R':
+            try:
+                cif = int(input("Enter the customer CIF: "))
+                radius_km = float(input("Enter the radius in km: "))
+                r_description = f"Customers within {radius_km} km of customer {cif}, closest first."
+                report(spatial_index(local).within(cif, radius_km), "RADIUS", r_description, args)
+            except ValueError as e:
+                log.error(f"Invalid input: {e}")
+            continue
+
+        if user_input == 'M':
+            if local is not None:
+                log.info("Community members are only available with --engine neo4j.")
+                continue
+            try:
+                community_id = int(input("Enter the communityId: "))
+            except ValueError as e:
+                log.error(f"Invalid input: {e}")
+                continue
+            run = fetch if args.output_format == 'log' else (lambda cypher_query, params=None: stream(cypher_query, params, args.page_size))
+            report(community_members(community_id, run), "COMMUNITY-MEMBERS", f"Members of community {community_id}, largest transfer first.", args)
+            continue
+
         try:
-            selected_query = int(user_input)
-
-            if selected_query == 1:
-                '''
-                    QUERY-1: 
-                '''
-                q1_description = (
-                "The query calculates the total expenditure of each customer, based on their purchase history."
-                "It offers a quick overview of customer spending patterns."
-                )
-                q1_cypher = """
-                    MATCH (c:Customer)-[:HAS_CARD]->(:Card)-[p:PURCHASE]->(:Purchase)
-                    RETURN c.CIF AS CIF, ROUND(SUM(p.purchaseAmount), 2) AS TotalExpenditure
-                """
-                run_query(q1_cypher, "QUERY-1", q1_description)
-
-            elif selected_query == 2:
-                '''
-                    QUERY-2: 
-                '''
-                q2_description = (
-                "The query calculates the total expenditure of each customer, based on their purchase history."
-                "It offers a quick overview of customer spending patterns."
-                )
-                q2_cypher = """
-                    MATCH (c:Customer)-[:HAS_CARD]->(card)-[r:PURCHASE]->(purchase)-[:HAS_MERCHANT]->(merchant)
-                    WITH c.CIF AS CustomerID, COLLECT(labels(merchant)) AS MerchantNames, ROUND(SUM(r.purchaseAmount), 2) AS Total_Expenditure
-                    WITH CustomerID, apoc.coll.flatten(MerchantNames) AS MerchantNames, Total_Expenditure
-                    WITH CustomerID, apoc.coll.frequencies(MerchantNames) AS MerchantFrequencies, Total_Expenditure
-                    UNWIND MerchantFrequencies AS output 
-                    WITH CustomerID, output.item + ':' + output.count AS MerchantCountConcatenated, Total_Expenditure
-                    RETURN CustomerID, COLLECT(MerchantCountConcatenated) AS Merchant_Counts, Total_Expenditure
-                    ORDER BY Total_Expenditure DESC
-                """
-                run_query(q2_cypher, "QUERY-2", q2_description)
-            
-            elif selected_query == 3:
-                '''
-                    QUERY-3: 
-                '''
-                q3_description = (
-                "The query filters purchases made at the specified merchant in the year 2021, then groups them by month."
-                "It provides a monthly count of unique customers who made purchases at this specified merchant providing quick insights into customer engagement over time."
-                )
-                q3_cypher = """
-                    MATCH (n)<-[:HAS_MERCHANT]-(p:Purchase)-[r:PURCHASE]-(x)
-                    WHERE 'Facebook' IN labels(n)
-                    WITH p, r, datetime({ epochMillis: toInteger(r.purchaseEpoch) * 1000 }) AS purchaseDateTime
-                    WHERE purchaseDateTime.year = 2021
-                    WITH p, purchaseDateTime.month AS purchaseMonth
-                    MATCH (p)-[:PURCHASE]-(:Card)-[:HAS_CARD]-(c:Customer)
-                    RETURN purchaseMonth AS Month, COUNT(DISTINCT c) AS TotalCount
-                    ORDER BY purchaseMonth
-                """
-                run_query(q3_cypher, "QUERY-3", q3_description)
-
-            elif selected_query == 4:
-                '''
-                    QUERY-4: 
-                '''
-                q4_description = (
-                "The query calculates the stats and assign anomaly flags for transactions conducted by sender accounts at the first level hop in the network."
-                "It provides the view on transaction patterns and identifies sender accounts with potentially unusual transaction behaviour based on mean, median, and standard deviation metrics."
-                "Based on all the flagged anomalies based on mean, median, and standard deviation, it will finally assign the final anomaly flag based on the union of all these values."
-                )
-                q4_cypher = """
-                    //Calculate overall stats for all transactions
-                    MATCH ()-[r:TRANSFER]->()
-                    WITH r.transactionAmount AS allAmounts
-
-                    WITH AVG(allAmounts) AS OverallMeanTransactionAmount,
-                    percentileCont(allAmounts, 0.5) AS OverallMedianTransactionAmount,
-                    STDEV(allAmounts) AS OverallStandardDeviationTransactionAmount
-
-                    // Calculate the stats for transaction amounts for each sender account
-                    MATCH (sender:Account)-[r:TRANSFER]->(receiver:Account)
-                    WITH sender, r.transactionAmount AS amounts, OverallMeanTransactionAmount, OverallMedianTransactionAmount, OverallStandardDeviationTransactionAmount
-
-                    WITH sender,
-                    amounts,
-                    OverallMeanTransactionAmount,
-                    OverallMedianTransactionAmount,
-                    OverallStandardDeviationTransactionAmount,
-                    // Calculate anomaly scores
-                    CASE
-                    WHEN ABS(AVG(amounts) - OverallMeanTransactionAmount) > 1000 THEN 1
-                    ELSE 0
-                    END AS MeanAnomalyScore,
-                    CASE
-                    WHEN ABS(percentileCont(amounts, 0.5) - OverallMedianTransactionAmount) > 1000 THEN 1
-                    ELSE 0
-                    END AS MedianAnomalyScore,
-                    CASE
-                    WHEN ABS(STDEV(amounts) - OverallMeanTransactionAmount) > 1000 THEN 1
-                    ELSE 0
-                    END AS StdDevAnomalyScore
-
-                    RETURN sender.AccountNumber AS SenderAccountNumber,
-                    COUNT(amounts) AS TransactionCount,
-                    AVG(amounts) AS MeanTransactionAmount,
-                    percentileCont(amounts, 0.5) AS MedianTransactionAmount,
-                    STDEV(amounts) AS StandardDeviationTransactionAmount,
-                    OverallMeanTransactionAmount, // Include overall statistics in the result
-                    OverallMedianTransactionAmount,
-                    OverallStandardDeviationTransactionAmount,
-                    MeanAnomalyScore,
-                    MedianAnomalyScore,
-                    StdDevAnomalyScore,
-                    // Calculate the combined Anomaly field
-                    CASE
-                    WHEN MeanAnomalyScore = 1 AND MedianAnomalyScore = 1 AND StdDevAnomalyScore = 1 THEN 1
-                    ELSE 0
-                    END AS Anomaly
-                    ORDER BY Anomaly DESC;
-                """
-                run_query(q4_cypher, "QUERY-4", q4_description)
-
-            elif selected_query == 5:
-                '''
-                    QUERY-5: 
-                '''
-                #note: the results produced is better suited for visualization or viewing in NeoDash
-                q5_description = (
-                "The query selects the top 10 accounts based on their PageRank, finds cycles of up to maximum depth of 10 involving these `influential` accounts through 'TRANSFER' relationships, and returns those cycles in the graph."
-                "It specifically aims to identify closed-loop transaction patterns, where the start and end accounts are the same."
-                "This is crucial in detecting potential money laundering or fraud activities, as closed-loop transactions may indicate attempts to obscure the flow of funds within a network."
-                )
-                q5_cypher = """
-                    MATCH (a:Account)
-                    WITH a
-                    ORDER BY a.PageRank DESC
-                    LIMIT 10
-                    WITH collect(a) AS topAccounts
-                    CALL apoc.nodes.cycles(topAccounts, {relTypes: ["TRANSFER"], maxDepth: 10}) 
-                    YIELD path 
-                    WITH path, length(path) AS pathLength
-                    ORDER BY pathLength DESC
-                    RETURN path
-                """
-                run_query(q5_cypher, "QUERY-5", q5_description)
-
-            elif selected_query == 6:
-                '''
-                    QUERY-6: 
-                '''
-                #note: the results produced is better suited for visualization or viewing in NeoDash
-                q6_description = (
-                "The query leverages Louvain community detection to uncover potential colluding accounts, surfacing concealed associations within account transfers."
-                "This will be useful in identifying abnormal cluster sizes, flagging potentially fraudulent activities involving numerous accounts for further investigation."
-                )
-                q6_cypher = """
-                    MATCH (a1:Account)-[r:TRANSFER]->(a2:Account)
-                    WHERE r.transactionAmount >= 5000
-
-                    WITH COLLECT(DISTINCT a1) + COLLECT(DISTINCT a2) AS nodes
-
-                    UNWIND nodes AS node
-                    WITH DISTINCT node.communityId AS communityId, COLLECT(DISTINCT node.AccountNumber) AS accountsInCommunity
-                    WITH communityId, accountsInCommunity, size(accountsInCommunity) AS communitySize
-                    WHERE communitySize > 1
-                    RETURN communityId, accountsInCommunity
-                    ORDER BY communitySize DESC
-                """
-                run_query(q6_cypher, "QUERY-6", q6_description)
-
-            elif selected_query == 7:
-                '''
-                    QUERY-7: 
-                '''
-                q7_description = (
-                "This query calculates the average distance between pairs of customer locations based on latitude and longitude."
-                "This is essential for understanding the spatial distribution of customers and can help in identifying clustering patterns based on proximity."
-                )
-                q7_cypher = """
-                MATCH (c1:Customer), (c2:Customer)
-                WHERE id(c1) < id(c2)  // To avoid duplicate pairs
-                WITH ROUND(toFloat(point.distance(point({latitude: c1.Latitude, longitude: c1.Longitude}), point({latitude: c2.Latitude, longitude: c2.Longitude}))/1000), 2) AS dist
-                RETURN AVG(dist) AS AverageDistanceInKM
-                """
-                run_query(q7_cypher, "QUERY-7", q7_description)
-                
-            elif selected_query == 8:
-                '''
-                    QUERY-8: 
-                '''
-                q8_description = (
-                "This query calculates the pairwise distances in kilometers between customers' locations based on their associated accounts, aiming to understand the geographic proximity between customers."
-                "This is useful to establish expected patterns of behavior on customers; when customers typically conduct account transfers within a certain geographic region, sudden transfers from distant locations may raise suspicion and signal potential fraudulent activities."
-                )
-                q8_cypher = """
-                MATCH (c1:Customer)-[:HAS_ACCOUNT]->(a:Account)
-                WITH c1, a, point({latitude: c1.Latitude, longitude: c1.Longitude}) AS customerLocationA
-                MATCH (c2:Customer)-[:HAS_ACCOUNT]->(b:Account)
-                WHERE id(c1) < id(c2) // To avoid duplicate pairs
-                WITH c1, a, b, customerLocationA, c2, point({latitude: c2.Latitude, longitude: c2.Longitude}) AS customerLocationB
-                WITH c1, a, b, customerLocationA, c2, customerLocationB, ROUND(toFloat(point.distance(customerLocationA, customerLocationB)/1000), 2) AS DistanceInKM
-                RETURN c1.CIF AS C1, a.AccountNumber AS C1_AccountNumber, c2.CIF AS C2, b.AccountNumber AS C2_AccountNumber, DistanceInKM
-                ORDER BY DistanceInKM
-                LIMIT 100
-                """
-                run_query(q8_cypher, "QUERY-8", q8_description)
-
-            elif selected_query == 9:
-                '''
-                    QUERY-9: 
-                '''
-                q9_description = (
-                "This query identifies pairs of accounts involved in transfers that exhibit suspicious behavior based on community differences, PageRank, and geographic distance."
-                "Calculate the difference in community IDs, compare PageRank values, and measure the distances between customers and accounts."
-                "Thresholds can be set for community difference, PageRank, and geographic distance to define suspicious account transfers."
-                "Suspicious account transfers can include transfers to accounts with higher PageRank, significant community ID differences, and geographic distances exceeding the specified thresholds."
-                )
-                q9_cypher = """
-                MATCH (c1:Customer)-[:HAS_ACCOUNT]->(a:Account)-[:TRANSFER]->(b:Account)<-[:HAS_ACCOUNT]-(c2:Customer)
-                WHERE id(c1) < id(c2)  // To avoid duplicate pairs
-                WITH a, b, c1, c2,
-                    abs(a.communityId - b.communityId) AS communityDifference, // Calculate community ID difference
-                    a.pagerank AS sourcePageRank, b.pagerank AS targetPageRank // Get PageRank for source and target accounts
-                WITH a, b, c1, c2, communityDifference, sourcePageRank, targetPageRank,
-                    point({latitude: c1.Latitude, longitude: c1.Longitude}) AS customerLocationC1,
-                    point({latitude: c2.Latitude, longitude: c2.Longitude}) AS customerLocationC2
-                WITH a, b, c1, c2, communityDifference, sourcePageRank, targetPageRank, customerLocationC1, customerLocationC2,
-                    point.distance(customerLocationC1, customerLocationC2)/1000 AS distanceBetweenCustomersInKM
-                WHERE communityDifference > 1 // Define a threshold for community ID difference
-                AND sourcePageRank < targetPageRank // Consider only transfers to higher PageRank accounts
-                AND distanceBetweenCustomersInKM > 5000
-                RETURN a.AccountNumber AS C1_AccountNumber, b.AccountNumber AS C2_AccountNumber, c1.CIF AS C1_CIF, c2.CIF AS C2_CIF, communityDifference, sourcePageRank, targetPageRank, distanceBetweenCustomersInKM
-                """
-                run_query(q9_cypher, "QUERY-9", q9_description)
-
-            else:
-                log.info("Invalid query number. Please select a number from 1 to 9.")
+            selected_query, *assignments = user_input.split()
+            selected_query = int(selected_query)
+            overrides = {**args.param, **parse_overrides(assignments)}
         except ValueError:
-            log.error("Invalid input. Please enter a valid number.")
\ No newline at end of file
+            log.error("Invalid input. Please enter a valid number.")
+            continue
+
+        if selected_query not in QUERIES:
+            log.info("Invalid query number. Please select a number from 1 to 9.")
+            continue
+
+        if local is not None and selected_query in NEO4J_ONLY:
+            log.info(f"QUERY-{selected_query} is only available with --engine neo4j.")
+            continue
+
+        query = QUERIES[selected_query]
+        run = fetch if args.output_format == 'log' else (lambda cypher_query, params=None: stream(cypher_query, params, args.page_size))
+        try:
+            result = answer(selected_query, args, local, run, overrides)
+        except ValueError as e:
+            log.error(f"Invalid parameter: {e}")
+            continue
+        report(result, query.name, query.description, args)
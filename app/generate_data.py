@@ -0,0 +1,200 @@
+"""
+generate_data.py
+
+Description:
+Generates synthetic customers.csv, purchases.csv and transfers.csv with the columns and formats of the files in data/,
+at a scale factor of the number of customers in data/customers.csv (e.g. 10x, 100x, 1000x).
+
+Every value is resampled from the sample files: names, job titles, address streets, countries with their coordinates
+(jittered), merchants with their popularity, card issuers and amounts. Each customer has a card and an account, as in
+the sample. The number of purchases per card and of transfers per account follows a long-tailed distribution with the
+sample's mean. Transfers mostly stay within groups of accounts, with a few popular receivers in each group, which gives
+PageRank and Louvain some structure to find.
+
+Customers are generated in chunks and appended to the files, so memory is bounded by the chunk size at any scale.
+
+Date: 17-10-2026
+"""
+
+import argparse
+import logging
+import numpy as np
+import os
+import pandas as pd
+
+log = logging.getLogger('generate_data')
+
+# Transfers leaving the sender's group of accounts, and the size of a group
+CROSS_GROUP_TRANSFERS = 0.2
+GROUP_SIZE = 50
+
+
+class Sample:
+    """
+    Value pools and distributions taken from the sample files.
+    """
+
+    def __init__(self, base_dir='../data'):
+        customers = pd.read_csv(os.path.join(base_dir, 'customers.csv'))
+        purchases = pd.read_csv(os.path.join(base_dir, 'purchases.csv'))
+        transfers = pd.read_csv(os.path.join(base_dir, 'transfers.csv'))
+
+        self.customers = len(customers)
+        self.people = customers[['FirstName', 'LastName', 'Gender']].to_numpy()
+        self.job_titles = customers['JobTitle'].to_numpy()
+        self.streets = customers['Address'].str.rsplit(',', n=1).str[0].to_numpy()
+        self.domains = customers['EmailAddress'].str.split('@').str[1].to_numpy()
+        self.places = customers[['Country', 'Latitude', 'Longitude']].dropna().to_numpy()
+
+        merchants = purchases['Merchant'].value_counts()
+        self.merchants, self.merchant_weights = merchants.index.to_numpy(), (merchants / merchants.sum()).to_numpy()
+        self.card_issuers = purchases['CardIssuer'].unique()
+        self.purchase_amounts = purchases['Amount'].to_numpy()
+        self.transfer_amounts = transfers['Amount'].to_numpy()
+        self.purchases_per_card = len(purchases) / customers['CardNumber'].nunique()
+        self.transfers_per_account = len(transfers) / customers['AccountNumber'].nunique()
+
+        epochs = pd.to_datetime(pd.concat([purchases['PurchaseDatetime'], transfers['TransferDatetime']])).astype('int64') // 10 ** 9
+        self.first_epoch, self.last_epoch = int(epochs.min()), int(epochs.max())
+
+
+def hyphenated(numbers):
+    # 9-digit numbers in the ddd-dd-dddd form of purchases.csv and transfers.csv
+    digits = pd.Series(numbers).astype(str).str.zfill(9)
+    return (digits.str[:3] + '-' + digits.str[3:5] + '-' + digits.str[5:]).to_numpy()
+
+
+def datetimes(rng, sample: Sample, count):
+    epochs = rng.integers(sample.first_epoch, sample.last_epoch + 1, count)
+    return pd.to_datetime(epochs, unit='s').strftime('%Y-%m-%d %H:%M:%SZ')
+
+
+def long_tailed_counts(rng, mean, count):
+    # Lognormal counts with the given mean, at least 1; a few customers are far more active than the rest
+    sigma = 0.75
+    return np.maximum(1, np.round(rng.lognormal(np.log(mean) - sigma ** 2 / 2, sigma, count))).astype(np.int64)
+
+
+def unique_numbers(rng, count):
+    """
+    Distinct random 9-digit numbers.
+    """
+    numbers = np.empty(0, dtype=np.int64)
+    while len(numbers) < count:
+        numbers = np.unique(np.concatenate([numbers, rng.integers(100_000_000, 1_000_000_000, count - len(numbers) + 16)]))
+    return rng.permutation(numbers)[:count]
+
+
+def customer_chunk(rng, sample: Sample, first_cif, card_numbers, account_numbers):
+    count = len(card_numbers)
+    people = sample.people[rng.integers(len(sample.people), size=count)]
+    places = sample.places[rng.integers(len(sample.places), size=count)]
+    first_names, last_names = people[:, 0].astype(str), people[:, 1].astype(str)
+    suffixes = rng.integers(1000, 10000, count).astype(str)
+    domains = sample.domains[rng.integers(len(sample.domains), size=count)].astype(str)
+    phones = pd.Series(rng.integers(1, 10, count)).astype(str) + '-' + pd.Series(rng.integers(100, 1000, count)).astype(str) + '-' \
+        + pd.Series(rng.integers(100, 1000, count)).astype(str) + '-' + pd.Series(rng.integers(1000, 10000, count)).astype(str)
+    streets = sample.streets[rng.integers(len(sample.streets), size=count)].astype(str)
+
+    return pd.DataFrame({
+        'CIF': np.arange(first_cif, first_cif + count),
+        'Age': rng.integers(18, 80, count),
+        'EmailAddress': np.char.add(np.char.add(np.char.add(np.char.add(first_names, '_'), last_names), suffixes), np.char.add('@', domains)),
+        'FirstName': first_names,
+        'LastName': last_names,
+        'PhoneNumber': phones.to_numpy(),
+        'Gender': people[:, 2],
+        'Address': np.char.add(np.char.add(streets, ', '), rng.integers(1, 10000, count).astype(str)),
+        'Country': places[:, 0],
+        'JobTitle': sample.job_titles[rng.integers(len(sample.job_titles), size=count)],
+        'CardNumber': card_numbers,
+        'AccountNumber': account_numbers,
+        'FullName': np.char.add(np.char.add(first_names, ' '), last_names),
+        'Latitude': np.clip(places[:, 1].astype(float) + rng.normal(0, 0.5, count), -90, 90),
+        'Longitude': (places[:, 2].astype(float) + rng.normal(0, 0.5, count) + 180) % 360 - 180
+    })
+
+
+def purchase_chunk(rng, sample: Sample, card_numbers, first_id):
+    cards = np.repeat(card_numbers, long_tailed_counts(rng, sample.purchases_per_card, len(card_numbers)))
+    count = len(cards)
+    return pd.DataFrame({
+        'TransactionID': first_id + rng.permutation(count),
+        'CardNumber': hyphenated(cards),
+        'Merchant': rng.choice(sample.merchants, size=count, p=sample.merchant_weights),
+        'Amount': rng.choice(sample.purchase_amounts, size=count) * rng.uniform(0.9, 1.1, count),
+        'PurchaseDatetime': datetimes(rng, sample, count),
+        'CardIssuer': sample.card_issuers[rng.integers(len(sample.card_issuers), size=count)]
+    })
+
+
+def transfer_chunk(rng, sample: Sample, sender_positions, account_numbers, first_id):
+    """
+    Transfers of the accounts at sender_positions of account_numbers. Receivers are drawn from the sender's group
+    with Zipf-like weights, or from all accounts for a fraction of the transfers.
+    """
+    senders = np.repeat(sender_positions, long_tailed_counts(rng, sample.transfers_per_account, len(sender_positions)))
+    count = len(senders)
+    group_start = senders // GROUP_SIZE * GROUP_SIZE
+    group_length = np.minimum(GROUP_SIZE, len(account_numbers) - group_start)
+    # Rank r in the group is drawn with a probability close to 1 / (r + 1)
+    ranks = np.floor(np.expm1(rng.uniform(0, np.log1p(group_length)))).astype(np.int64)
+    receivers = np.where(rng.random(count) < CROSS_GROUP_TRANSFERS, rng.integers(len(account_numbers), size=count), group_start + np.minimum(ranks, group_length - 1))
+    # No transfers from an account to itself
+    receivers = np.where(receivers == senders, (receivers + 1) % len(account_numbers), receivers)
+
+    return pd.DataFrame({
+        'TransactionID': first_id + rng.permutation(count),
+        'SenderAccountNumber': hyphenated(account_numbers[senders]),
+        'ReceiverAccountNumber': hyphenated(account_numbers[receivers]),
+        'Amount': rng.choice(sample.transfer_amounts, size=count) * rng.uniform(0.9, 1.1, count),
+        'TransferDatetime': datetimes(rng, sample, count)
+    })
+
+
+def generate(out_dir, scale, sample: Sample, seed=0, chunk_customers=10_000):
+    """
+    Write the three files for scale times the sample's customers into out_dir, and return their row counts.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    customers = int(sample.customers * scale)
+    card_numbers = unique_numbers(rng, customers)
+    account_numbers = unique_numbers(rng, customers)
+
+    rows = {'customers': 0, 'purchases': 0, 'transfers': 0}
+    paths = {name: os.path.join(out_dir, f'{name}.csv') for name in rows}
+    for start in range(0, customers, chunk_customers):
+        stop = min(start + chunk_customers, customers)
+        frames = {
+            'customers': customer_chunk(rng, sample, start + 1, card_numbers[start:stop], account_numbers[start:stop]),
+            'purchases': purchase_chunk(rng, sample, card_numbers[start:stop], rows['purchases'] + 1),
+            'transfers': transfer_chunk(rng, sample, np.arange(start, stop), account_numbers, rows['transfers'] + 1)
+        }
+        for name, frame in frames.items():
+            frame.to_csv(paths[name], mode='w' if start == 0 else 'a', header=start == 0, index=False)
+            rows[name] += len(frame)
+    log.info(f"Scale {scale}x: {rows['customers']} customers, {rows['purchases']} purchases, {rows['transfers']} transfers in {out_dir}")
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic CustomerNexus360 CSV files at a multiple of the sample's size")
+    parser.add_argument('--scales', type=float, nargs='+', default=[10, 100, 1000], help="Multiples of the number of sample customers to generate")
+    parser.add_argument('--base-dir', default='../data', help="Directory holding the sample CSV files")
+    parser.add_argument('--out-dir', default='../data/synthetic', help="Directory receiving one x<scale> directory per scale")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator")
+    parser.add_argument('--chunk-customers', type=int, default=10_000, help="Number of customers generated and written at a time")
+    return parser.parse_args()
+
+
+def scale_dir(out_dir, scale):
+    return os.path.join(out_dir, f'x{scale:g}')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    sample = Sample(args.base_dir)
+    for scale in args.scales:
+        generate(scale_dir(args.out_dir, scale), scale, sample, args.seed, args.chunk_customers)
@@ -0,0 +1,219 @@
+"""
+geo_engine.py
+
+Description:
+Distance engine over the customer Latitude/Longitude columns. Computes the mean pairwise great-circle distance (Q7)
+exactly with blocked NumPy haversine, spreading the blocks over a thread pool, or estimates it from a random sample of
+pairs with a confidence interval.
+
+The spatial index answers the k closest customer pairs (Q8) and radius queries around a customer from a KD-tree over the
+customers' unit-sphere coordinates, in close to n log n time.
+
+Distances use the same spherical model as Cypher's point.distance for WGS-84 points, so the results are comparable with
+the Cypher queries.
+
+Date: 17-10-2026
+"""
+
+import numpy as np
+import os
+import pandas as pd
+
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from scipy.spatial import cKDTree
+from statistics import NormalDist
+
+# Earth radius used by Neo4j for WGS-84 distances
+EARTH_RADIUS_KM = 6378.14
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers between points given in radians; the arguments broadcast against each other.
+    """
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def round_half_up(values, digits):
+    scale = 10.0 ** digits
+    return np.floor(values * scale + 0.5) / scale
+
+
+def to_radians(latitudes, longitudes):
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    # Customers without coordinates have no distance to anyone, as with a null point in Cypher
+    valid = ~(np.isnan(latitudes) | np.isnan(longitudes))
+    return np.radians(latitudes[valid]), np.radians(longitudes[valid])
+
+
+def _block_sum(lat, lon, start, block_size, round_digits, cancelled=None):
+    """
+    Sum and count of the distances between rows [start, start + block_size) and every later row.
+    """
+    stop = min(start + block_size, len(lat))
+    total, count = 0.0, 0
+    for other in range(start, len(lat), block_size):
+        if cancelled is not None and cancelled():
+            raise CancelledError("Distance computation cancelled")
+        other_stop = min(other + block_size, len(lat))
+        distances = haversine_km(lat[start:stop, None], lon[start:stop, None], lat[None, other:other_stop], lon[None, other:other_stop])
+        if round_digits is not None:
+            distances = round_half_up(distances, round_digits)
+        if other == start:
+            # Diagonal block: only the pairs i < j
+            distances = distances[np.triu_indices(stop - start, k=1)]
+        total += float(distances.sum())
+        count += distances.size
+    return total, count
+
+
+def mean_pairwise_distance(latitudes, longitudes, block_size=2048, workers=None, round_digits=2, cancelled=None):
+    """
+    Exact mean of the distances over all pairs i < j. Memory is bounded by block_size x block_size distances per worker.
+    Each pair distance is rounded to round_digits first, like ROUND(..., 2) in Q7; pass None to skip the rounding.
+    cancelled, if given, is polled before every block, and CancelledError is raised once it returns True.
+    """
+    lat, lon = to_radians(latitudes, longitudes)
+    if len(lat) < 2:
+        return float('nan')
+
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(workers) as executor:
+        results = list(executor.map(lambda start: _block_sum(lat, lon, start, block_size, round_digits, cancelled), range(0, len(lat), block_size)))
+    total = sum(block_total for block_total, _ in results)
+    count = sum(block_count for _, block_count in results)
+    return total / count
+
+
+def sample_mean_pairwise_distance(latitudes, longitudes, samples=100_000, confidence=0.95, seed=None):
+    """
+    Estimate the mean pairwise distance from uniformly sampled pairs of distinct customers.
+    Returns the estimate with the lower and upper bounds of its normal-approximation confidence interval.
+    """
+    lat, lon = to_radians(latitudes, longitudes)
+    n = len(lat)
+    if n < 2:
+        return float('nan'), float('nan'), float('nan')
+
+    rng = np.random.default_rng(seed)
+    i = rng.integers(0, n, samples)
+    # Shifting by 1..n-1 draws j uniformly among the other customers
+    j = (i + rng.integers(1, n, samples)) % n
+    distances = haversine_km(lat[i], lon[i], lat[j], lon[j])
+
+    estimate = float(distances.mean())
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * float(distances.std(ddof=1)) / np.sqrt(samples)
+    return estimate, estimate - margin, estimate + margin
+
+
+def average_distance(customers: pd.DataFrame, mode='exact', samples=100_000, confidence=0.95, cancelled=None):
+    """
+    Q7 result from a frame with Latitude and Longitude columns, in 'exact' or 'sampled' mode.
+    """
+    if mode == 'sampled':
+        estimate, lower, upper = sample_mean_pairwise_distance(customers['Latitude'], customers['Longitude'], samples, confidence)
+        return pd.DataFrame([{
+            'AverageDistanceInKM': estimate,
+            'ConfidenceLowerKM': lower,
+            'ConfidenceUpperKM': upper,
+            'Confidence': confidence,
+            'SampledPairs': samples
+        }])
+    return pd.DataFrame([{'AverageDistanceInKM': mean_pairwise_distance(customers['Latitude'], customers['Longitude'], cancelled=cancelled)}])
+
+
+class CustomerSpatialIndex:
+    """
+    KD-tree over the unit-sphere (x, y, z) positions of (customer, account) rows. The chord length between two points
+    grows with their great-circle distance, so nearest neighbours in the tree are nearest on the sphere. Distances
+    returned are recomputed with haversine_km.
+
+    Rows are expected in node id order (as in Q8, C1 is the customer that comes first); rows without coordinates are
+    left out.
+    """
+
+    def __init__(self, customers: pd.DataFrame):
+        customers = customers.dropna(subset=['Latitude', 'Longitude']).reset_index(drop=True)
+        self.customers = customers
+        self._lat = np.radians(customers['Latitude'].to_numpy(dtype=np.float64))
+        self._lon = np.radians(customers['Longitude'].to_numpy(dtype=np.float64))
+        self._cif = customers['CIF'].to_numpy()
+        self._tree = cKDTree(np.column_stack([
+            np.cos(self._lat) * np.cos(self._lon),
+            np.cos(self._lat) * np.sin(self._lon),
+            np.sin(self._lat)
+        ]))
+
+    def _pairs_frame(self, i, j, distances, round_digits):
+        if round_digits is not None:
+            distances = round_half_up(distances, round_digits)
+        return pd.DataFrame({
+            'C1': self._cif[i],
+            'C1_AccountNumber': self.customers['AccountNumber'].to_numpy()[i],
+            'C2': self._cif[j],
+            'C2_AccountNumber': self.customers['AccountNumber'].to_numpy()[j],
+            'DistanceInKM': distances
+        })
+
+    def closest_pairs(self, k=100, round_digits=2, block_size=4096):
+        """
+        The k closest pairs of rows belonging to different customers, closest first.
+
+        A pair among the k closest overall is among the k nearest neighbours of both its rows, so querying each row for
+        its k nearest neighbours (plus the rows of its own customer, which are skipped) finds every candidate. Rows are
+        queried block_size at a time and only the k closest pairs so far are kept, so memory is bounded by block_size x
+        (k + own rows) neighbours. Once k pairs are known, later queries stop at the distance of the k-th.
+        """
+        n = len(self.customers)
+        if n < 2:
+            return self._pairs_frame(np.array([], dtype=int), np.array([], dtype=int), np.array([]), round_digits)
+
+        own_rows = int(pd.Series(self._cif).value_counts().max())
+        neighbours = min(n, k + own_rows)
+        best_i, best_j, best_distances = np.array([], dtype=int), np.array([], dtype=int), np.array([])
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            bound = np.inf
+            if len(best_distances) == k:
+                # Chord length on the unit sphere of the k-th closest distance so far
+                bound = 2 * np.sin(min(best_distances[-1] / EARTH_RADIUS_KM, np.pi) / 2) + 1e-12
+            _, index = self._tree.query(self._tree.data[start:stop], k=neighbours, distance_upper_bound=bound)
+            index = index.reshape(stop - start, -1)
+
+            i = np.repeat(np.arange(start, stop), index.shape[1])
+            j = index.ravel()
+            # Keep each pair once, ordered by row, and drop pairs of the same customer and neighbours past the bound
+            keep = (j < n) & (i < j)
+            keep[keep] = self._cif[i[keep]] != self._cif[j[keep]]
+            i, j = i[keep], j[keep]
+            distances = haversine_km(self._lat[i], self._lon[i], self._lat[j], self._lon[j])
+
+            # Running top k, ties ordered by row pair
+            i, j, distances = np.concatenate([best_i, i]), np.concatenate([best_j, j]), np.concatenate([best_distances, distances])
+            order = np.lexsort((j, i, distances))[:k]
+            best_i, best_j, best_distances = i[order], j[order], distances[order]
+        return self._pairs_frame(best_i, best_j, best_distances, round_digits)
+
+    def within(self, cif, radius_km, round_digits=2):
+        """
+        Every other customer row within radius_km of customer cif, closest first.
+        """
+        origins = np.flatnonzero(self._cif == cif)
+        if len(origins) == 0:
+            raise ValueError(f"Customer {cif} has no coordinates in the index.")
+
+        # Chord length on the unit sphere for the radius, capped at the antipode
+        chord = 2 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2)
+        origin = origins[0]
+        candidates = np.array(sorted(set(self._tree.query_ball_point(self._tree.data[origin], chord + 1e-12))), dtype=int)
+        candidates = candidates[self._cif[candidates] != cif]
+
+        distances = haversine_km(self._lat[origin], self._lon[origin], self._lat[candidates], self._lon[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+
+        within = self._pairs_frame(np.full(len(order), origin), candidates[order], distances[order], round_digits)
+        return within.rename(columns={'C2': 'CIF', 'C2_AccountNumber': 'AccountNumber'})[['CIF', 'AccountNumber', 'DistanceInKM']]
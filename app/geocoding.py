@@ -0,0 +1,195 @@
+"""
+geocoding.py
+
+Description:
+Geocoding layer used when customers.csv comes without coordinates. Lookups are deduplicated per batch, served from an
+on-disk SQLite cache keyed by normalized address or country, and the misses are fanned out concurrently to a pluggable
+backend under a configurable rate limit.
+
+Date: 17-10-2026
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+log = logging.getLogger('geocoding')
+
+Coordinates = Optional[Tuple[float, float]]
+
+# Returned by Geocoder._lookup when the backend raised, as opposed to None when it answered with no match
+FAILED = object()
+
+
+def normalize_key(text):
+    return ' '.join(str(text).lower().split())
+
+
+class GeocodeCache:
+    """
+    SQLite-backed cache of (kind, normalized key) -> coordinates. Keys the backend answered with no match are cached
+    as NULL coordinates so they are not sent to the backend again; failed lookups are not cached at all.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocodes (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                latitude REAL,
+                longitude REAL,
+                PRIMARY KEY (kind, key)
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, kind, keys) -> Dict[str, Coordinates]:
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            # Stay below SQLite's default limit on host parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, latitude, longitude FROM geocodes WHERE kind = ? AND key IN ({placeholders})",
+                    [kind] + batch
+                )
+                for key, latitude, longitude in rows:
+                    found[key] = None if latitude is None else (latitude, longitude)
+        return found
+
+    def put_many(self, kind, items: Dict[str, Coordinates]):
+        rows = [(kind, key, *(coordinates or (None, None))) for key, coordinates in items.items()]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class NominatimBackend:
+    def __init__(self, user_agent="geolocator", timeout=10):
+        from geopy.geocoders import Nominatim
+
+        # A single client is shared by all worker threads
+        self._geolocator = Nominatim(timeout=timeout, user_agent=user_agent)
+
+    def geocode(self, query) -> Coordinates:
+        location = self._geolocator.geocode(query)
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+class OfflineBackend:
+    """
+    Stand-in geocoder resolving queries from a fixed table, for tests and air-gapped runs.
+    """
+
+    def __init__(self, coordinates: Dict[str, Tuple[float, float]]):
+        self._coordinates = {normalize_key(query): value for query, value in coordinates.items()}
+
+    @classmethod
+    def from_csv(cls, file_path, columns=('Address', 'Country')):
+        # Any CSV with Latitude/Longitude next to the query columns will do, e.g. a previously geocoded customers.csv
+        df = pd.read_csv(file_path)
+        missing = [column for column in ('Latitude', 'Longitude') if column not in df.columns]
+        if missing:
+            raise ValueError(f"Geocoder reference {file_path} has no {'/'.join(missing)} column, "
+                             f"pass a previously geocoded CSV with --geocoder-reference")
+        coordinates = {}
+        for column in columns:
+            if column in df.columns:
+                first = df.dropna(subset=['Latitude', 'Longitude']).drop_duplicates(subset=column)
+                coordinates.update(zip(first[column], zip(first['Latitude'], first['Longitude'])))
+        return cls(coordinates)
+
+    def geocode(self, query) -> Coordinates:
+        return self._coordinates.get(normalize_key(query))
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        self._interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Geocoder:
+    def __init__(self, backend, cache: Optional[GeocodeCache] = None, max_workers=4, requests_per_second=1.0):
+        self.backend = backend
+        self.cache = cache
+        self.max_workers = max_workers
+        self._limiter = RateLimiter(requests_per_second)
+
+    def _lookup(self, query):
+        self._limiter.acquire()
+        try:
+            return self.backend.geocode(query)
+        except Exception as e:
+            log.warning(f"Geocoding failed for '{query}': {e}")
+            return FAILED
+
+    def geocode_many(self, kind, queries: Iterable[str]) -> Dict[str, Coordinates]:
+        """
+        Resolve a batch of queries, returning coordinates keyed by normalized query. Each distinct key is resolved
+        at most once: from the cache if present, otherwise by the backend. Keys whose lookup failed, e.g. on a timeout
+        or a rate limit, resolve to None for this batch but are left out of the cache, so the next run retries them.
+        """
+        distinct = {}
+        for query in queries:
+            distinct.setdefault(normalize_key(query), query)
+
+        resolved = self.cache.get_many(kind, distinct) if self.cache is not None else {}
+        misses = [key for key in distinct if key not in resolved]
+        log.info(f"Geocoding {len(distinct)} distinct {kind} values, {len(misses)} not cached")
+
+        if misses:
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                fetched = dict(zip(misses, executor.map(lambda key: self._lookup(distinct[key]), misses)))
+            failed = [key for key, coordinates in fetched.items() if coordinates is FAILED]
+            answered = {key: coordinates for key, coordinates in fetched.items() if coordinates is not FAILED}
+            if failed:
+                log.warning(f"{len(failed)} {kind} lookups failed and will be retried on the next run")
+            if self.cache is not None:
+                self.cache.put_many(kind, answered)
+            resolved.update(answered)
+            resolved.update(dict.fromkeys(failed))
+        return resolved
+
+    def geocode_frame(self, df, address_column='Address', country_column='Country'):
+        """
+        Geocode each row by address, falling back to its country when the address cannot be resolved.
+        Returns a DataFrame with 'Latitude' and 'Longitude' aligned to df.
+        """
+        address_keys = df[address_column].map(normalize_key)
+        by_address = self.geocode_many('address', df[address_column])
+        coordinates = address_keys.map(by_address)
+
+        unresolved = coordinates.isna()
+        if unresolved.any():
+            by_country = self.geocode_many('country', df.loc[unresolved, country_column])
+            coordinates[unresolved] = df.loc[unresolved, country_column].map(normalize_key).map(by_country)
+
+        return pd.DataFrame({
+            'Latitude': coordinates.map(lambda c: c[0] if isinstance(c, tuple) else float('nan')),
+            'Longitude': coordinates.map(lambda c: c[1] if isinstance(c, tuple) else float('nan'))
+        }, index=df.index)
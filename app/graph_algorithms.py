@@ -0,0 +1,229 @@
+"""
+graph_algorithms.py
+
+Description:
+In-process PageRank and Louvain over the TRANSFER edges, held in a SciPy sparse matrix. They produce the pagerank and
+communityId properties otherwise written by the GDS projection in cypher_app.init_graph, so the loader can write them
+in bulk at load time and the analytics can be run without a GDS projection.
+
+Both follow the GDS definitions and defaults, so the results are comparable:
+- PageRank is unnormalized. Every score starts at 1 - dampingFactor, an account's score is split over its outgoing
+  transfers (parallel transfers count separately), and the mass of accounts without transfers is not redistributed.
+  The iterations stop once no score changes by more than the tolerance.
+- Louvain treats the transfers as undirected edges of weight one and moves accounts between communities while the
+  modularity improves by more than the tolerance, then aggregates the communities and repeats for up to maxLevels.
+  The accounts are moved in batches rather than one at a time, which reaches partitions of the same modularity.
+  Community ids are arbitrary in both, so they compare through the partition and its modularity, not by value.
+
+Date: 17-10-2026
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from communities import community_summary, write_community_summary
+from graph_state import GraphState, graph_fingerprint
+from post_load import write_batches
+
+log = logging.getLogger('graph_algorithms')
+
+# Parameters of the in-process algorithms, recorded in the graph state like the GDS ones
+ALGORITHM_PARAMS = {
+    'engine': 'local',
+    'pageRank': {'writeProperty': 'pagerank', 'dampingFactor': 0.85, 'maxIterations': 20, 'tolerance': 1e-7},
+    'louvain': {'writeProperty': 'communityId', 'maxLevels': 10, 'maxIterations': 10, 'tolerance': 1e-4}
+}
+
+
+def transfer_matrix(accounts, senders, receivers):
+    """
+    Square matrix of transfer counts, from sender row to receiver column, in the order of accounts. Transfers between
+    accounts missing from accounts are dropped.
+    """
+    accounts = np.asarray(accounts, dtype=np.int64)
+    order = np.argsort(accounts)
+    sorted_accounts = accounts[order]
+
+    def positions(values):
+        values = np.asarray(values, dtype=np.int64)
+        found = np.searchsorted(sorted_accounts, values)
+        found[found == len(sorted_accounts)] = 0
+        valid = sorted_accounts[found] == values if len(sorted_accounts) else np.zeros(len(values), dtype=bool)
+        return order[found], valid
+
+    rows, valid_senders = positions(senders)
+    cols, valid_receivers = positions(receivers)
+    valid = valid_senders & valid_receivers
+    if not valid.all():
+        log.warning(f"Dropping {int((~valid).sum())} transfers between unknown accounts")
+    n = len(accounts)
+    # Duplicate entries are summed, so parallel transfers add up to their count
+    return sp.csr_matrix((np.ones(int(valid.sum())), (rows[valid], cols[valid])), shape=(n, n))
+
+
+def pagerank(matrix, damping_factor=0.85, max_iterations=20, tolerance=1e-7):
+    """
+    Scores and the number of iterations run.
+    """
+    out_degree = np.asarray(matrix.sum(axis=1)).ravel()
+    inverse_degree = np.divide(1.0, out_degree, out=np.zeros_like(out_degree), where=out_degree > 0)
+    transposed = matrix.T.tocsr()
+
+    scores = np.full(matrix.shape[0], 1 - damping_factor)
+    for iteration in range(1, max_iterations + 1):
+        updated = (1 - damping_factor) + damping_factor * (transposed @ (scores * inverse_degree))
+        converged = np.abs(updated - scores).max(initial=0.0) <= tolerance
+        scores = updated
+        if converged:
+            break
+    return scores, iteration
+
+
+def modularity(adjacency, communities):
+    """
+    Modularity of a partition of a symmetric weighted adjacency matrix.
+    """
+    total = adjacency.sum()
+    if total == 0:
+        return 0.0
+    coo = adjacency.tocoo()
+    internal = np.bincount(communities[coo.row], weights=coo.data * (communities[coo.row] == communities[coo.col]), minlength=communities.max() + 1)
+    degree = np.bincount(communities, weights=np.asarray(adjacency.sum(axis=1)).ravel(), minlength=communities.max() + 1)
+    return float((internal / total - (degree / total) ** 2).sum())
+
+
+def _best_moves(adjacency, nodes, communities, strength, community_strength, total):
+    """
+    Best community for each of the nodes given the current communities of all the others, and whether it improves on
+    staying. The weight of every node towards each neighbouring community comes from a single sparse aggregation: the
+    rows of the nodes with their column indices mapped to communities, duplicates summed.
+    """
+    rows = adjacency[nodes]
+    links = sp.csr_matrix((rows.data, communities[rows.indices], rows.indptr), shape=(len(nodes), adjacency.shape[0]))
+    links.sum_duplicates()
+
+    node_strength = strength[nodes]
+    own = communities[nodes]
+    counts = np.diff(links.indptr)
+    row = np.repeat(np.arange(len(nodes)), counts)
+    candidate = links.indices
+    # Strength of each candidate community without the node, which leaves its own community to join any of them
+    candidate_strength = community_strength[candidate] - np.where(candidate == own[row], node_strength[row], 0.0)
+    gain = links.data - candidate_strength * node_strength[row] / total
+
+    own_links = np.bincount(row, weights=links.data * (candidate == own[row]), minlength=len(nodes))
+    stay = own_links - (community_strength[own] - node_strength) * node_strength / total
+    best = own.copy()
+    linked = np.flatnonzero(counts)
+    if len(linked):
+        # Highest gain per row; the column indices are sorted, so the first of equal gains has the lowest community id
+        row_best = np.maximum.reduceat(gain, links.indptr[linked])
+        top = np.flatnonzero(gain == np.repeat(row_best, counts[linked]))
+        first = top[np.r_[True, row[top][1:] != row[top][:-1]]]
+        better = gain[first] > stay[row[first]]
+        best[row[first[better]]] = candidate[first[better]]
+    return best, best != own
+
+
+def _move_nodes(adjacency, max_iterations, tolerance, batches=16, seed=0):
+    """
+    Local moving phase: move every node into the neighbouring community with the best modularity gain, sweeping over
+    the nodes until the modularity stops improving by more than the tolerance.
+
+    Each sweep visits the nodes in a fixed random order, split into batches whose nodes move together against the
+    communities left by the previous batches, so a sweep is a few sparse aggregations rather than a Python loop over
+    every node and edge. A node alone in its community only joins another single-node community with a lower id, so
+    that two such neighbours in the same batch cannot swap into each other's community.
+    """
+    n = adjacency.shape[0]
+    # Self-loops hold the weight inside an aggregated node and never count towards a move
+    off_diagonal = (adjacency - sp.diags(adjacency.diagonal())).tocsr()
+    off_diagonal.eliminate_zeros()
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    total = float(adjacency.sum())
+    communities = np.arange(n)
+    order = np.random.default_rng(seed).permutation(n)
+
+    current = modularity(adjacency, communities)
+    moved = False
+    for _ in range(max_iterations):
+        previous = communities.copy()
+        for nodes in np.array_split(order, min(batches, n)):
+            community_strength = np.bincount(communities, weights=strength, minlength=n)
+            size = np.bincount(communities, minlength=n)
+            best, improves = _best_moves(off_diagonal, nodes, communities, strength, community_strength, total)
+            improves &= ~((size[communities[nodes]] == 1) & (size[best] == 1) & (best > communities[nodes]))
+            communities[nodes[improves]] = best[improves]
+
+        updated = modularity(adjacency, np.unique(communities, return_inverse=True)[1])
+        if updated < current:
+            # Simultaneous moves within a batch can undo each other's gains; keep the previous partition then
+            communities = previous
+            break
+        if updated - current <= tolerance:
+            moved = moved or updated > current
+            break
+        current, moved = updated, True
+    return np.unique(communities, return_inverse=True)[1], moved
+
+
+def louvain(matrix, max_levels=10, max_iterations=10, tolerance=1e-4):
+    """
+    Community of every node, numbered from 0, and the modularity of the partition.
+    """
+    adjacency = (matrix + matrix.T).tocsr()
+    membership = np.arange(adjacency.shape[0])
+    if adjacency.sum() == 0:
+        return membership, 0.0
+
+    level_graph = adjacency
+    for _ in range(max_levels):
+        communities, moved = _move_nodes(level_graph, max_iterations, tolerance)
+        if not moved:
+            break
+        membership = communities[membership]
+        # Collapse every community into a single node, its internal edges becoming a self-loop
+        indicator = sp.csr_matrix((np.ones(len(communities)), (np.arange(len(communities)), communities)))
+        level_graph = (indicator.T @ level_graph @ indicator).tocsr()
+    return membership, modularity(adjacency, membership)
+
+
+def account_scores(accounts, senders, receivers, params=ALGORITHM_PARAMS):
+    """
+    AccountNumber, pagerank and communityId of every account.
+    """
+    accounts = pd.unique(np.asarray(accounts, dtype=np.int64))
+    matrix = transfer_matrix(accounts, senders, receivers)
+
+    page_rank = params['pageRank']
+    scores, iterations = pagerank(matrix, page_rank['dampingFactor'], page_rank['maxIterations'], page_rank['tolerance'])
+    log.info(f"PageRank of {len(accounts)} accounts {'converged' if iterations < page_rank['maxIterations'] else 'stopped'} after {iterations} iterations")
+
+    communities, score = louvain(matrix, params['louvain']['maxLevels'], params['louvain']['maxIterations'], params['louvain']['tolerance'])
+    log.info(f"Louvain found {communities.max() + 1 if len(communities) else 0} communities with modularity {score:.4f}")
+
+    return pd.DataFrame({'AccountNumber': accounts, 'pagerank': scores, 'communityId': communities})
+
+
+def write_account_scores(gds, database, scores: pd.DataFrame, params=ALGORITHM_PARAMS):
+    write_batches(gds, f"""
+        UNWIND $rows AS row
+        MATCH (a:Account {{AccountNumber: row.AccountNumber}})
+        SET a.{params['pageRank']['writeProperty']} = row.pagerank, a.{params['louvain']['writeProperty']} = row.communityId
+    """, scores, database)
+    log.info(f"Wrote the pagerank and communityId of {len(scores)} accounts")
+
+
+def precompute_scores(gds, database, accounts, senders, receivers, amounts, name='AccountGraph'):
+    """
+    Write the scores of the loaded transfers and the summary of their communities, and record them in the graph state,
+    so that cypher_app --algorithm-engine local finds them up to date and does not recompute them.
+    """
+    scores = account_scores(accounts, senders, receivers)
+    write_account_scores(gds, database, scores)
+    write_community_summary(gds, database, community_summary(scores, senders, receivers, amounts))
+    state = GraphState.read(gds, name, database)
+    state.record(gds, graph_fingerprint(gds, ALGORITHM_PARAMS, database), ALGORITHM_PARAMS, database)
+    log.info(f"Graph state recorded as version {state.version}")
@@ -0,0 +1,101 @@
+"""
+graph_state.py
+
+Description:
+Versioned state of the algorithm results written by cypher_app.init_graph. A content fingerprint of the TRANSFER
+edges and the projection/algorithm parameters is recorded on a GraphState node together with a version number, so
+that a later start with the same fingerprint can reuse the projection and skip rewriting the pagerank and communityId
+properties. Loads that write into the database replace the node's loadId, and the
+loadId and version together stamp the data the query results were computed from.
+
+The fingerprint is built from order-independent integer aggregates computed in a single scan on the server, so it
+does not depend on the order the relationships are stored in and never ships the edges to the client.
+
+Date: 17-10-2026
+"""
+
+import hashlib
+import json
+import re
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    pass
+
+
+UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def parse_bytes(size):
+    """
+    '512M', '2G', '1.5 GiB' or a plain number of bytes.
+    """
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)(?:i?B)?\s*', str(size), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid memory size: {size}")
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def graph_fingerprint(gds, params, database=None):
+    # Sums are exact integer aggregates; the product term ties each transfer's sender to its receiver
+    transfers = gds.run_cypher("""
+        MATCH (a:Account)-[r:TRANSFER]->(b:Account)
+        RETURN count(r) AS transfers,
+            sum(r.transactionId) AS transactionIds,
+            sum(r.transferEpoch) AS transferEpochs,
+            sum(toInteger(round(r.transactionAmount * 100))) AS transferCents,
+            sum(a.AccountNumber % 1000003) AS senders,
+            sum(b.AccountNumber % 1000003) AS receivers,
+            sum((a.AccountNumber % 1000003) * (b.AccountNumber % 1000003) % 1000003) AS pairs
+    """, database=database).iloc[0].to_dict()
+
+    content = json.dumps({'transfers': transfers, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class GraphState:
+    def __init__(self, name, fingerprint=None, params=None, version=0, load_id=None):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.params = params or {}
+        self.version = version
+        self.load_id = load_id
+
+    @property
+    def stamp(self):
+        return f"{self.load_id}/{self.version}"
+
+    @classmethod
+    def read(cls, gds, name, database=None):
+        state = gds.run_cypher("""
+            MATCH (s:GraphState {name: $name})
+            RETURN s.fingerprint AS fingerprint, s.params AS params, s.version AS version, s.loadId AS loadId
+        """, params={'name': name}, database=database)
+        if state.empty:
+            return cls(name)
+        row = state.iloc[0]
+        params = json.loads(row['params']) if row['params'] else {}
+        return cls(name, row['fingerprint'], params, int(row['version'] or 0), row['loadId'])
+
+    def record(self, gds, fingerprint, params, database=None):
+        """
+        Store a new fingerprint and bump the version, once the algorithm results for it have been written.
+        """
+        self.fingerprint, self.params, self.version = fingerprint, params, self.version + 1
+        self.load_id = gds.run_cypher("""
+            MERGE (s:GraphState {name: $name})
+            SET s.fingerprint = $fingerprint, s.params = $params, s.version = $version, s.updatedAt = datetime(),
+                s.loadId = coalesce(s.loadId, randomUUID())
+            RETURN s.loadId AS loadId
+        """, params={'name': self.name, 'fingerprint': fingerprint, 'params': json.dumps(params, sort_keys=True), 'version': self.version},
+            database=database)['loadId'][0]
+
+
+def mark_loaded(gds, database, name='AccountGraph'):
+    """
+    Give the graph state a new loadId after a load wrote into the database, so that results cached for the previous
+    data are no longer served.
+    """
+    gds.run_cypher("""
+        MERGE (s:GraphState {name: $name})
+        SET s.loadId = randomUUID(), s.loadedAt = datetime()
+    """, params={'name': name}, database=database)
@@ -0,0 +1,108 @@
+"""
+import_benchmark.py
+
+Description:
+Cold-start benchmark of the apps. Every run imports an app in a fresh interpreter, so nothing is already in
+sys.modules, and times:
+- the import of the app itself, which is what a test, a batch job or --help pays before doing any work;
+- the import of the app followed by the modules it defers with lazy_import, plus graphdatascience (imported by the
+  first connection) and sklearn (whose LabelEncoder the loader used to import for Gender). This is the cold start of
+  the previous, eager layout, not counting the Bolt/Arrow handshake it also made at import time.
+The report gives the median of each over --repeat runs, the heavy packages the import alone loads, and the slowest
+imports of the app from python -X importtime.
+
+Date: 17-10-2026
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+log = logging.getLogger('import_benchmark')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Packages worth seconds of startup, checked in sys.modules after importing an app
+HEAVY_PACKAGES = ['pandas', 'numpy', 'pyarrow', 'scipy', 'sklearn', 'neo4j', 'graphdatascience', 'pydantic', 'geopy']
+
+# Imported at module level by the eager layout but not deferred through lazy_import
+EAGER_EXTRAS = {
+    'cypher_app': ['graphdatascience'],
+    'neo_arrow_app': ['graphdatascience', 'sklearn.preprocessing']
+}
+
+MEASURE = """
+import importlib, json, sys, time
+from lazy_imports import LazyModule
+start = time.perf_counter()
+app = importlib.import_module({app!r})
+lazy = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+deferred = sorted(value.__name__ for value in vars(app).values() if isinstance(value, LazyModule))
+for name in deferred + {extras!r}:
+    importlib.import_module(name)
+eager = time.perf_counter() - start
+print(json.dumps({{'lazy': lazy, 'eager': eager, 'loaded': loaded, 'deferred': deferred}}))
+"""
+
+
+def run_python(args):
+    env = {**os.environ, 'PYTHONPATH': APP_DIR + os.pathsep + os.environ.get('PYTHONPATH', '')}
+    return subprocess.run([sys.executable, *args], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def slowest_imports(app, top):
+    """
+    Modules with the largest cumulative import time (seconds) when importing the app, from python -X importtime.
+    """
+    stderr = run_python(['-X', 'importtime', '-c', f'import {app}']).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        imports.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(imports, key=lambda entry: entry[1], reverse=True)[:top]
+
+
+def measure(app, repeat, top):
+    runs = [json.loads(run_python(['-c', MEASURE.format(app=app, heavy=HEAVY_PACKAGES, extras=EAGER_EXTRAS.get(app, []))]).stdout)
+            for _ in range(repeat)]
+    lazy = statistics.median(run['lazy'] for run in runs)
+    eager = statistics.median(run['eager'] for run in runs)
+    result = {
+        'app': app,
+        'lazySeconds': lazy,
+        'eagerSeconds': eager,
+        'savedSeconds': eager - lazy,
+        'speedup': eager / lazy if lazy > 0 else None,
+        'heavyPackagesLoaded': runs[0]['loaded'],
+        'deferredModules': runs[0]['deferred'],
+        'slowestImports': [{'module': name, 'seconds': seconds} for name, seconds in slowest_imports(app, top)]
+    }
+    log.info(f"{app}: import {lazy * 1000:.0f} ms, eager layout {eager * 1000:.0f} ms ({result['speedup']:.1f}x), "
+             f"heavy packages loaded: {', '.join(result['heavyPackagesLoaded']) or 'none'}")
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the cold-start import time of the apps against their eager layout")
+    parser.add_argument('--apps', nargs='+', default=['cypher_app', 'neo_arrow_app'], help="App modules to import")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per app; the median is reported")
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest imports listed per app")
+    parser.add_argument('--report', default='../data/benchmark/startup.json', help="JSON report file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    report = {'python': sys.version.split()[0], 'repeat': args.repeat, 'apps': [measure(app, args.repeat, args.top) for app in args.apps]}
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    log.info(f"Report written to {args.report}")
@@ -0,0 +1,247 @@
+"""
+incremental.py
+
+Description:
+Incremental delta loading for neo_arrow_app.py. A load state (high-water marks on TransferEpoch/PurchaseEpoch and the
+value -> node ID maps) is persisted after every load, so that later runs only write the new customers, transfers and
+purchases into the existing database instead of rebuilding and exporting the whole graph.
+
+Writes MERGE on CIF, transactionId and purchaseId, and the state is saved after the transfers and again after the
+purchases, so a load that fails part way can simply be rerun. Purchases sharing a TransactionID share one Purchase node,
+as in the full load, which indexes purchaseId on the Purchase nodes for this. Rows whose sender, receiver or card is
+not a known node are skipped and counted in the log.
+
+Date: 17-10-2026
+"""
+
+import json
+import logging
+import numpy as np
+import os
+import pandas as pd
+
+from graph_state import mark_loaded
+from ingest import LABEL_VALUE_PAIRS_CARD_ISSUERS, LABEL_VALUE_PAIRS_CUSTOMER, LABEL_VALUE_PAIRS_MERCHANT, LABEL_VALUE_PAIRS_PURCHASE
+from merchant_rollups import update_merchant_rollups
+from metrics import traced
+from node_table import NodeTable
+from post_load import create_indexes, write_batches
+from transfer_stats import update_transfer_stats
+
+log = logging.getLogger('incremental')
+
+
+class HighWaterMark:
+    """
+    Latest epoch loaded so far, together with the TransactionIDs seen at exactly that epoch. A row is new when it is
+    later than the mark, or at the mark with an unseen TransactionID. Rows that arrive late with an older epoch are
+    not picked up.
+    """
+
+    def __init__(self, epoch=None, ids_at_epoch=()):
+        self.epoch = epoch
+        self.ids_at_epoch = set(ids_at_epoch)
+
+    def is_new(self, epochs, transaction_ids):
+        epochs = pd.Series(np.asarray(epochs))
+        if self.epoch is None:
+            return np.ones(len(epochs), dtype=bool)
+        transaction_ids = pd.Series(np.asarray(transaction_ids))
+        return ((epochs > self.epoch) | ((epochs == self.epoch) & ~transaction_ids.isin(self.ids_at_epoch))).to_numpy()
+
+    def observe(self, epochs, transaction_ids):
+        epochs = np.asarray(epochs)
+        if len(epochs) == 0:
+            return
+        latest = int(epochs.max())
+        at_latest = {int(i) for i in np.asarray(transaction_ids)[epochs == latest]}
+        if self.epoch is None or latest > self.epoch:
+            self.epoch, self.ids_at_epoch = latest, at_latest
+        elif latest == self.epoch:
+            self.ids_at_epoch |= at_latest
+
+    def to_dict(self):
+        return {'epoch': self.epoch, 'ids_at_epoch': sorted(self.ids_at_epoch)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['epoch'], data['ids_at_epoch'])
+
+
+class LoadState:
+    """
+    High-water marks and node table of the loads so far. A streamed (--chunk-size) load does not keep its purchase ids
+    in the node table, so its state is marked as streamed and cannot be loaded incrementally.
+    """
+
+    def __init__(self, state_dir, nodes: NodeTable, transfers: HighWaterMark, purchases: HighWaterMark, streamed=False):
+        self.state_dir = state_dir
+        self.nodes = nodes
+        self.transfers = transfers
+        self.purchases = purchases
+        self.streamed = streamed
+
+    @classmethod
+    def load(cls, state_dir):
+        path = os.path.join(state_dir, 'high_water_marks.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            marks = json.load(f)
+        return cls(state_dir, NodeTable.load(state_dir), HighWaterMark.from_dict(marks['transfers']), HighWaterMark.from_dict(marks['purchases']),
+                   marks.get('streamed', False))
+
+    def save(self):
+        self.nodes.save(self.state_dir)
+        with open(os.path.join(self.state_dir, 'high_water_marks.json'), 'w') as f:
+            json.dump({'transfers': self.transfers.to_dict(), 'purchases': self.purchases.to_dict(), 'streamed': self.streamed}, f)
+        log.info(f"Saved load state to {self.state_dir} (transfers up to {self.transfers.epoch}, purchases up to {self.purchases.epoch})")
+
+
+def quote_label(label):
+    return '`' + str(label).replace('`', '``') + '`'
+
+
+@traced(rows=lambda count: count)
+def load_new_customers(gds, state: LoadState, customer_df, database):
+    new_customers = customer_df[~customer_df['CIF'].isin(state.nodes.lookup('Customer').index)]
+    if new_customers.empty:
+        return 0
+    state.nodes.add_nodes(new_customers, LABEL_VALUE_PAIRS_CUSTOMER)
+
+    rows = pd.DataFrame({
+        'cif': new_customers['CIF'].to_numpy(),
+        'age': new_customers['Age'].to_numpy(),
+        'gender': new_customers['Gender_Encoded'].to_numpy(),
+        'latitude': new_customers['Latitude'].to_numpy(),
+        'longitude': new_customers['Longitude'].to_numpy(),
+        'account': new_customers['AccountNumber'].to_numpy(),
+        'card': new_customers['CardNumber'].to_numpy()
+    })
+    write_batches(gds, """
+        UNWIND $rows AS row
+        MERGE (c:Customer {CIF: row.cif})
+        ON CREATE SET c.Age = row.age, c.Gender = row.gender, c.Latitude = row.latitude, c.Longitude = row.longitude,
+            c.Coordinate = point({latitude: toFloat(row.latitude), longitude: toFloat(row.longitude)})
+        MERGE (a:Account {AccountNumber: row.account})
+        MERGE (card:Card {CardNumber: row.card})
+        MERGE (c)-[:HAS_ACCOUNT]->(a)
+        MERGE (c)-[:HAS_CARD]->(card)
+    """, rows, database)
+    return len(new_customers)
+
+
+def known_rows(new_rows, state: LoadState, kind, label_columns):
+    """
+    Mask of the rows whose values of the given label -> column pairs are all known nodes. The others are logged, as the
+    MATCH of their write would find nothing.
+    """
+    known = np.ones(len(new_rows), dtype=bool)
+    for label, column in label_columns:
+        known &= new_rows[column].isin(state.nodes.lookup(label).index).to_numpy()
+    if not known.all():
+        log.warning(f"Skipped {int((~known).sum())} new {kind} with an unknown {' or '.join(column for _, column in label_columns)}")
+    return known
+
+
+@traced(rows=len)
+def load_new_transfers(gds, state: LoadState, transaction_df, database):
+    new_rows = transaction_df[state.transfers.is_new(transaction_df['TransferEpoch'], transaction_df['TransactionID'])]
+    new_transfers = new_rows[known_rows(new_rows, state, 'transfers', [('Account', 'SenderAccountNumber'), ('Account', 'ReceiverAccountNumber')])]
+    rows = pd.DataFrame({
+        'sender': new_transfers['SenderAccountNumber'].to_numpy(),
+        'receiver': new_transfers['ReceiverAccountNumber'].to_numpy(),
+        'transactionId': new_transfers['TransactionID'].to_numpy(),
+        'transactionAmount': new_transfers['Amount'].to_numpy(),
+        'transferEpoch': new_transfers['TransferEpoch'].to_numpy()
+    })
+    write_batches(gds, """
+        UNWIND $rows AS row
+        MATCH (a:Account {AccountNumber: row.sender})
+        MATCH (b:Account {AccountNumber: row.receiver})
+        MERGE (a)-[t:TRANSFER {transactionId: row.transactionId}]->(b)
+        ON CREATE SET t.transactionAmount = row.transactionAmount, t.transferEpoch = row.transferEpoch
+    """, rows, database)
+    # Skipped rows advance the mark too, they would be skipped again on every later load
+    state.transfers.observe(new_rows['TransferEpoch'], new_rows['TransactionID'])
+    return new_transfers
+
+
+@traced(rows=len)
+def load_new_purchases(gds, state: LoadState, purchase_df, database):
+    new_rows = purchase_df[state.purchases.is_new(purchase_df['PurchaseEpoch'], purchase_df['TransactionID'])]
+    new_purchases = new_rows[known_rows(new_rows, state, 'purchases', [('Card', 'CardNumber')])]
+    if new_purchases.empty:
+        state.purchases.observe(new_rows['PurchaseEpoch'], new_rows['TransactionID'])
+        return new_purchases
+
+    # Merchants and card issuers are nodes labelled by their name; only names never loaded before are created
+    new_merchants = new_purchases.drop_duplicates(subset='Merchant')
+    new_merchants = new_merchants[~new_merchants['Merchant'].isin(state.nodes.lookup('Merchant').index)]
+    new_card_issuers = new_purchases.drop_duplicates(subset='CardIssuer')
+    new_card_issuers = new_card_issuers[~new_card_issuers['CardIssuer'].isin(state.nodes.lookup('CardIssuer').index)]
+    state.nodes.add_nodes(new_merchants, LABEL_VALUE_PAIRS_MERCHANT)
+    state.nodes.add_nodes(new_card_issuers, LABEL_VALUE_PAIRS_CARD_ISSUERS)
+    new_purchase_ids = new_purchases.drop_duplicates(subset='TransactionID')
+    state.nodes.add_nodes(new_purchase_ids[~new_purchase_ids['TransactionID'].isin(state.nodes.lookup('Purchase').index)], LABEL_VALUE_PAIRS_PURCHASE)
+
+    for merchant in new_merchants['Merchant']:
+        gds.run_cypher(f"""
+            MATCH (t:Merchant) WHERE size(labels(t)) = 1
+            CREATE (:{quote_label(merchant)}:Business {{name: $name}})-[:HAS_TYPE]->(t)
+        """, params={'name': merchant}, database=database)
+    for card_issuer in new_card_issuers['CardIssuer']:
+        gds.run_cypher(f"CREATE (:{quote_label(card_issuer)})", database=database)
+
+    rows = pd.DataFrame({
+        'card': new_purchases['CardNumber'].to_numpy(),
+        'merchant': new_purchases['Merchant'].to_numpy(),
+        'merchantNodeId': state.nodes.map('Merchant', new_purchases['Merchant']).to_numpy(),
+        'purchaseId': new_purchases['TransactionID'].to_numpy(),
+        'purchaseAmount': new_purchases['Amount'].to_numpy(),
+        'purchaseEpoch': new_purchases['PurchaseEpoch'].to_numpy()
+    })
+    # Purchases are written one merchant at a time, found through the name index. Rows sharing a TransactionID, here
+    # or with a purchase loaded before, share the Purchase node
+    for merchant, merchant_rows in rows.groupby('merchant', sort=False):
+        write_batches(gds, """
+            MATCH (m:Business {name: $merchant})
+            WITH m LIMIT 1
+            UNWIND $rows AS row
+            MATCH (c:Card {CardNumber: row.card})
+            MERGE (p:Purchase {purchaseId: row.purchaseId})
+            ON CREATE SET p.Merchant = row.merchantNodeId
+            MERGE (c)-[r:PURCHASE {purchaseId: row.purchaseId, purchaseAmount: row.purchaseAmount, purchaseEpoch: row.purchaseEpoch}]->(p)
+            MERGE (p)-[:HAS_MERCHANT]->(m)
+        """, merchant_rows.drop(columns='merchant'), database, merchant=merchant)
+
+    card_issuer_pairs = new_purchases.drop_duplicates(subset=['CardNumber', 'CardIssuer'])
+    for card_issuer, pairs in card_issuer_pairs.groupby('CardIssuer', sort=False):
+        write_batches(gds, f"""
+            MATCH (i:{quote_label(card_issuer)})
+            WITH i LIMIT 1
+            UNWIND $rows AS row
+            MATCH (c:Card {{CardNumber: row.card}})
+            MERGE (c)-[:HAS_CARD_ISSUER]->(i)
+        """, pd.DataFrame({'card': pairs['CardNumber'].to_numpy()}), database)
+
+    state.purchases.observe(new_rows['PurchaseEpoch'], new_rows['TransactionID'])
+    return new_purchases
+
+
+def load_delta(gds, state: LoadState, customer_df, transaction_df, purchase_df, database):
+    """
+    Write only the customers, transfers and purchases that are not yet in the database. The state is persisted as soon
+    as the transfers and their statistics are written, then again after the purchases and their rollups.
+    """
+    create_indexes(gds, database)
+    customer_count = load_new_customers(gds, state, customer_df, database)
+    new_transfers = load_new_transfers(gds, state, transaction_df, database)
+    update_transfer_stats(gds, database, new_transfers)
+    state.save()
+    new_purchases = load_new_purchases(gds, state, purchase_df, database)
+    update_merchant_rollups(gds, database, new_purchases, customer_df)
+    state.save()
+    log.info(f"Incremental load wrote {customer_count} customers, {len(new_transfers)} transfers and {len(new_purchases)} purchases")
+    mark_loaded(gds, database)
+    return new_transfers, new_purchases
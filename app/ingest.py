@@ -0,0 +1,217 @@
+"""
+ingest.py
+
+Description:
+Normalization of the transfers and purchases CSV data and assembly of the node and relationship frames passed to
+gds.graph.construct. Shared by the full load and the chunked streaming load in neo_arrow_app.py.
+
+Date: 17-10-2026
+"""
+
+import numpy as np
+import pandas as pd
+
+from metrics import span
+from node_table import NodeTable
+
+LABEL_VALUE_PAIRS_CUSTOMER = {'Customer': 'CIF', 'Account': 'AccountNumber', 'Card': 'CardNumber'}
+LABEL_VALUE_PAIRS_PURCHASE = {'Purchase': 'TransactionID'}
+LABEL_VALUE_PAIRS_MERCHANT = {'Merchant': 'Merchant'}
+LABEL_VALUE_PAIRS_CARD_ISSUERS = {'CardIssuer': 'CardIssuer'}
+
+UNIX_EPOCH = pd.Timestamp('1970-01-01 00:00:00+00:00', tz='UTC')
+
+
+def to_epoch_seconds(datetimes):
+    return (pd.to_datetime(datetimes).dt.tz_convert('UTC') - UNIX_EPOCH).dt.total_seconds().astype(int)
+
+
+class CategoryEncoder:
+    """
+    Numbers the sorted distinct values of a column from start, like sklearn's LabelEncoder (which numbers them from 0)
+    without importing sklearn. Gender is encoded from 1: 1 for Female, 2 for Male.
+    """
+
+    def __init__(self, start=1):
+        self.start = start
+        self.categories = None
+
+    def fit(self, values):
+        self.categories = np.unique(np.asarray(values))
+        return self
+
+    def transform(self, values):
+        values = np.asarray(values)
+        unseen = ~np.isin(values, self.categories)
+        if unseen.any():
+            raise ValueError(f"Values not seen when fitting: {sorted(set(values[unseen].tolist()))}")
+        return np.searchsorted(self.categories, values) + self.start
+
+    def fit_transform(self, values):
+        return self.fit(values).transform(values)
+
+
+def normalize_transfers(transaction_df):
+    transaction_df['TransactionID'] = transaction_df['TransactionID'].astype(int)
+    transaction_df['SenderAccountNumber'] = transaction_df['SenderAccountNumber'].str.replace('-', '').astype(int)
+    transaction_df['ReceiverAccountNumber'] = transaction_df['ReceiverAccountNumber'].str.replace('-', '').astype(int)
+    transaction_df['Amount'] = transaction_df['Amount'].astype(float)
+    transaction_df['TransferEpoch'] = to_epoch_seconds(transaction_df['TransferDatetime'])
+    return transaction_df
+
+
+def normalize_purchases(purchase_df):
+    purchase_df['CardNumber'] = purchase_df['CardNumber'].str.replace('-', '').astype(int)
+    purchase_df['Merchant'] = purchase_df['Merchant'].str.replace(' ', '_')
+    if 'PurchaseDatetime' in purchase_df.columns:
+        purchase_df['PurchaseEpoch'] = to_epoch_seconds(purchase_df['PurchaseDatetime'])
+    return purchase_df
+
+
+def customer_frames(customer_df, nodes: NodeTable):
+    """
+    Customer, Account and Card node frames together with the HAS_ACCOUNT (R1) and HAS_CARD (R3) relationships.
+    """
+    customer_ids = nodes.map('Customer', customer_df['CIF'])
+    account_ids = nodes.map('Account', customer_df['AccountNumber'])
+    card_ids = nodes.map('Card', customer_df['CardNumber'])
+
+    # Create customer_properties dataframe
+    customer_properties = pd.DataFrame({
+        'nodeId': customer_ids,
+        'CIF': customer_df['CIF'].to_numpy(),
+        'labels': "Customer",
+        'Age': customer_df['Age'].to_numpy(),
+        'Gender': customer_df['Gender_Encoded'].to_numpy(),
+        'Latitude': customer_df['Latitude'].to_numpy(),
+        'Longitude': customer_df['Longitude'].to_numpy()
+    })
+
+    # Create account_properties dataframe
+    account_properties = pd.DataFrame({
+        'nodeId': account_ids,
+        'labels': "Account",
+        'AccountNumber': customer_df['AccountNumber'].to_numpy()
+    })
+
+    # Create card_properties dataframe
+    card_properties = pd.DataFrame({
+        'nodeId': card_ids,
+        'labels': "Card",
+        'CardNumber': customer_df['CardNumber'].to_numpy()
+    })
+
+    R1 = pd.DataFrame({'sourceNodeId': customer_ids, 'targetNodeId': account_ids, 'relationshipType': "HAS_ACCOUNT"})
+    R3 = pd.DataFrame({'sourceNodeId': customer_ids, 'targetNodeId': card_ids, 'relationshipType': "HAS_CARD"})
+    return [customer_properties, account_properties, card_properties], R1, R3
+
+
+def merchant_frames(distinct_merchants, nodes: NodeTable, placeholder_merchant_node_id):
+    """
+    Merchant node frame, including the placeholder 'Merchant' node, and the HAS_TYPE (R4) relationships.
+    """
+    merchant_ids = nodes.map('Merchant', distinct_merchants).to_numpy()
+
+    # Create merchant_properties dataframe
+    merchant_properties = pd.DataFrame({
+        'nodeId': np.append(merchant_ids, placeholder_merchant_node_id),
+        'labels': np.append(np.asarray(distinct_merchants, dtype=object), 'Merchant')
+    })
+
+    R4 = pd.DataFrame({'sourceNodeId': merchant_ids, 'targetNodeId': placeholder_merchant_node_id, 'relationshipType': "HAS_TYPE"})
+    return merchant_properties, R4
+
+
+def card_issuer_frames(distinct_card_issuers, distinct_card_issuer_to_card, nodes: NodeTable):
+    """
+    CardIssuer node frame and the HAS_CARD_ISSUER (R7) relationships.
+    """
+    # Create card_issuer_properties dataframe
+    card_issuer_properties = pd.DataFrame({
+        'nodeId': nodes.map('CardIssuer', distinct_card_issuers),
+        'labels': np.asarray(distinct_card_issuers, dtype=object)
+    })
+
+    R7 = pd.DataFrame({
+        'sourceNodeId': nodes.map('Card', distinct_card_issuer_to_card['CardNumber']),
+        'targetNodeId': nodes.map('CardIssuer', distinct_card_issuer_to_card['CardIssuer']),
+        'relationshipType': "HAS_CARD_ISSUER"
+    })
+    return card_issuer_properties, R7
+
+
+def purchase_frames(purchase_df, nodes: NodeTable, purchase_ids):
+    """
+    Purchase node frame with the PURCHASE (R5) and HAS_MERCHANT (R6) relationships for the given purchase node ids.
+    """
+    purchase_ids = pd.Series(np.asarray(purchase_ids))
+    purchase_merchant_ids = nodes.map('Merchant', purchase_df['Merchant'])
+
+    # Create purchase_properties dataframe
+    purchase_properties = pd.DataFrame({
+        'nodeId': purchase_ids,
+        'labels': "Purchase",
+        'Merchant': purchase_merchant_ids
+    })
+
+    R5 = pd.DataFrame({
+        'sourceNodeId': nodes.map('Card', purchase_df['CardNumber']),
+        'targetNodeId': purchase_ids,
+        'relationshipType': "PURCHASE",
+        'purchaseId': purchase_df['TransactionID'].to_numpy(),
+        'purchaseAmount': purchase_df['Amount'].to_numpy(),
+        'purchaseEpoch': purchase_df['PurchaseEpoch'].to_numpy()
+    })
+    R6 = pd.DataFrame({'sourceNodeId': purchase_ids, 'targetNodeId': purchase_merchant_ids, 'relationshipType': "HAS_MERCHANT"})
+    return purchase_properties, R5, R6
+
+
+def transfer_frame(transaction_df, nodes: NodeTable):
+    """
+    TRANSFER (R2) relationships between accounts.
+    """
+    return pd.DataFrame({
+        'sourceNodeId': nodes.map('Account', transaction_df['SenderAccountNumber']),
+        'targetNodeId': nodes.map('Account', transaction_df['ReceiverAccountNumber']),
+        'relationshipType': "TRANSFER",
+        'transactionId': transaction_df['TransactionID'].to_numpy(),
+        'transactionAmount': transaction_df['Amount'].to_numpy(),
+        'transferEpoch': transaction_df['TransferEpoch'].to_numpy()
+    })
+
+
+def build_graph_frames(customer_df, transaction_df, purchase_df):
+    """
+    Assign node ids and build every node and relationship frame for gds.graph.construct from the normalized data.
+    Returns the NodeTable together with the node frames and the relationship frames R1-R7.
+    """
+    # Filter out duplicate merchant values in the purchase_df dataFrame
+    distinct_merchant_df = purchase_df.drop_duplicates(subset='Merchant')
+
+    # Filter out duplicate card issuer values in the purchase_df DataFrame
+    distinct_card_issuer_df = purchase_df.drop_duplicates(subset='CardIssuer')
+
+    # Remove duplicates based on pairs of 'CardNumber' and 'CardIssuer'
+    distinct_card_issuer_to_card = purchase_df.drop_duplicates(subset=['CardNumber', 'CardIssuer'])
+
+    # Assign node ids as vectorized ranges per label, in the same order as the rows are read
+    with span('node_ids') as stage:
+        nodes = NodeTable(starting_index=1)
+        nodes.add_nodes(customer_df, LABEL_VALUE_PAIRS_CUSTOMER)
+        nodes.add_nodes(purchase_df, LABEL_VALUE_PAIRS_PURCHASE)
+        nodes.add_nodes(distinct_merchant_df, LABEL_VALUE_PAIRS_MERCHANT)
+        nodes.add_nodes(distinct_card_issuer_df, LABEL_VALUE_PAIRS_CARD_ISSUERS)
+        placeholder_merchant_node_id = nodes.add_node('Merchant', 'Merchant')
+        stage.add_rows(len(nodes))
+
+    with span('frame_assembly') as stage:
+        customer_node_frames, R1, R3 = customer_frames(customer_df, nodes)
+        merchant_properties, R4 = merchant_frames(distinct_merchant_df['Merchant'].to_numpy(), nodes, placeholder_merchant_node_id)
+        card_issuer_properties, R7 = card_issuer_frames(distinct_card_issuer_df['CardIssuer'].to_numpy(), distinct_card_issuer_to_card, nodes)
+        purchase_properties, R5, R6 = purchase_frames(purchase_df, nodes, nodes.map('Purchase', purchase_df['TransactionID']))
+        R2 = transfer_frame(transaction_df, nodes)
+
+        node_frames = customer_node_frames + [purchase_properties, merchant_properties, card_issuer_properties]
+        relationship_frames = [R1, R2, R3, R4, R5, R6, R7]
+        stage.add_rows(sum(len(frame) for frame in node_frames + relationship_frames))
+    return nodes, node_frames, relationship_frames
@@ -0,0 +1,49 @@
+"""
+lazy_imports.py
+
+Description:
+Deferred module loading for the apps. lazy_import returns a stand-in for a module that imports it when one of its
+attributes is first used, so the engines and the heavy packages behind them (pandas, pyarrow, SciPy, neo4j,
+graphdatascience) are only paid for by the runs that use them, not by importing the app or printing its --help.
+
+The import happens under a lock, so that the threads of a batch can use the same stand-in safely.
+
+Date: 17-10-2026
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        self._module = None
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self.__name__)
+            return self._module
+
+    def __getattr__(self, attribute):
+        # Only called for attributes the stand-in does not have itself, i.e. those of the module
+        return getattr(self._module or self._load(), attribute)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """
+    The module name, imported on first attribute access. A module that is already imported is returned as is.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return LazyModule(name)
@@ -0,0 +1,110 @@
+"""
+local_engine.py
+
+Description:
+In-process columnar engine answering the purchase aggregations Q1-Q3 of cypher_app.py directly from purchases.csv and
+customers.csv (or a Parquet snapshot of them) with hash joins and group-bys, without a round trip to Neo4j.
+
+The joins follow the graph built by neo_arrow_app.py: a Purchase node is identified by its TransactionID, so purchases
+sharing a TransactionID share a node, together with its PURCHASE and HAS_MERCHANT relationships.
+
+Date: 17-10-2026
+"""
+
+import os
+import pandas as pd
+
+from arrow_ingest import read_purchases
+from decimal import Decimal, ROUND_HALF_UP
+from merchant_rollups import count_customers
+
+
+def round_half_up(values, digits=2):
+    # Same rounding as Cypher's ROUND(x, 2), which rounds half away from zero on the shortest decimal repr
+    quantum = Decimal(1).scaleb(-digits)
+    return [float(Decimal(repr(float(value))).quantize(quantum, rounding=ROUND_HALF_UP)) for value in values]
+
+
+class LocalEngine:
+    def __init__(self, customers: pd.DataFrame, purchases: pd.DataFrame):
+        self.customers = customers
+        self.purchases = purchases
+
+        # (CIF, card) pairs of the HAS_CARD relationships and the PURCHASE relationships joined to them
+        self._customer_cards = customers[['CIF', 'CardNumber']].drop_duplicates()
+        self._customer_purchases = purchases.merge(self._customer_cards, on='CardNumber', how='inner')
+
+        # HAS_MERCHANT relationships of each Purchase node
+        self._purchase_merchants = purchases[['TransactionID', 'Merchant']]
+
+    @classmethod
+    def from_csv(cls, data_dir='../data'):
+        customers = pd.read_csv(os.path.join(data_dir, 'customers.csv'), usecols=['CIF', 'CardNumber', 'AccountNumber', 'Latitude', 'Longitude'])
+        customers['CardNumber'] = customers['CardNumber'].astype(str).str.replace('-', '').astype(int)
+        customers['AccountNumber'] = customers['AccountNumber'].astype(str).str.replace('-', '').astype(int)
+        purchases = read_purchases(os.path.join(data_dir, 'purchases.csv')).to_pandas()
+        return cls(customers, purchases)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_dir):
+        return cls(pd.read_parquet(os.path.join(snapshot_dir, 'customers.parquet')), pd.read_parquet(os.path.join(snapshot_dir, 'purchases.parquet')))
+
+    @classmethod
+    def open(cls, data_dir='../data', snapshot_dir=None):
+        """
+        Load from the Parquet snapshot when there is one, otherwise from the CSV files, writing the snapshot if asked.
+        """
+        if snapshot_dir and os.path.exists(os.path.join(snapshot_dir, 'purchases.parquet')):
+            return cls.from_snapshot(snapshot_dir)
+        engine = cls.from_csv(data_dir)
+        if snapshot_dir:
+            engine.write_snapshot(snapshot_dir)
+        return engine
+
+    def write_snapshot(self, snapshot_dir):
+        os.makedirs(snapshot_dir, exist_ok=True)
+        self.customers.to_parquet(os.path.join(snapshot_dir, 'customers.parquet'), index=False)
+        self.purchases.to_parquet(os.path.join(snapshot_dir, 'purchases.parquet'), index=False)
+
+    def total_expenditure(self):
+        """
+        Q1: total purchase amount per customer, ordered by CIF.
+        """
+        totals = self._customer_purchases.groupby('CIF', sort=True)['Amount'].sum()
+        return pd.DataFrame({'CIF': totals.index.to_numpy(), 'TotalExpenditure': round_half_up(totals.to_numpy())})
+
+    def merchant_expenditure(self):
+        """
+        Q2: merchant frequencies ('Merchant:count', in order of first purchase) and total purchase amount per customer,
+        ordered by total expenditure descending.
+        """
+        paths = self._customer_purchases[['CIF', 'TransactionID', 'Amount']].merge(self._purchase_merchants, on='TransactionID', how='inner')
+        if paths.empty:
+            return pd.DataFrame(columns=['CustomerID', 'Merchant_Counts', 'Total_Expenditure'])
+
+        totals = paths.groupby('CIF', sort=False)['Amount'].sum()
+        frequencies = paths.groupby(['CIF', 'Merchant'], sort=False).size().reset_index(name='count')
+        frequencies['MerchantCount'] = frequencies['Merchant'] + ':' + frequencies['count'].astype(str)
+        merchant_counts = frequencies.groupby('CIF', sort=False)['MerchantCount'].agg(list)
+
+        result = pd.DataFrame({
+            'CustomerID': totals.index.to_numpy(),
+            'Merchant_Counts': merchant_counts.reindex(totals.index).to_numpy(),
+            'Total_Expenditure': round_half_up(totals.to_numpy())
+        })
+        return result.sort_values(['Total_Expenditure', 'CustomerID'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+    def monthly_merchant_customers(self, merchant='Facebook', year=2021):
+        """
+        Q3: number of distinct customers per month with purchases at merchant in year, ordered by month. Customers are
+        counted with the sketch of the MerchantMonth rollups Q3 reads, exact up to 2048 customers in a month.
+        """
+        merchant_purchase_ids = self._purchase_merchants.loc[self._purchase_merchants['Merchant'] == merchant, 'TransactionID'].unique()
+        purchases = self.purchases[self.purchases['TransactionID'].isin(merchant_purchase_ids)]
+        purchase_datetimes = pd.to_datetime(purchases['PurchaseEpoch'], unit='s', utc=True)
+        in_year = purchases.loc[purchase_datetimes.dt.year == year, ['TransactionID']].assign(Month=purchase_datetimes.dt.month)
+
+        # Customers of every card with a PURCHASE relationship to the Purchase node
+        customers = in_year.drop_duplicates().merge(self._customer_purchases[['TransactionID', 'CIF']].drop_duplicates(), on='TransactionID')
+        counts = customers.groupby('Month', sort=True)['CIF'].agg(lambda cifs: count_customers(cifs.unique()))
+        return pd.DataFrame({'Month': counts.index.to_numpy(), 'TotalCount': counts.to_numpy()})
@@ -0,0 +1,225 @@
+"""
+metrics.py
+
+Description:
+Lightweight instrumentation of the ingest stages and queries. A span, used as a context manager or a decorator, records
+the wall time of a stage, the rows it processed and its peak resident memory above the level at which it started
+(sampled on a background thread). Spans nest, so a trace shows which sub-stages a stage spent its time in.
+
+The spans collected by a Tracer are exported as a Prometheus text file, suitable for the node_exporter textfile
+collector, and as a JSON trace in the Chrome trace event format, which chrome://tracing and Perfetto display as a
+timeline. The Prometheus file holds cumulative per-span totals and a duration histogram, so ingest throughput
+(rows over seconds) and query latency can be graphed across runs.
+
+Date: 17-10-2026
+"""
+
+import functools
+import json
+import logging
+import os
+import psutil
+import threading
+import time
+
+log = logging.getLogger('metrics')
+
+METRIC_PREFIX = 'nexus360'
+
+# Upper bounds of the duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    # Label values escape backslashes, double quotes and newlines in the text exposition format
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PeakMemory:
+    """
+    Samples the resident set size on a background thread, keeping the peak above the size at the start.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.start = self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    @property
+    def delta(self):
+        return self.peak - self.start
+
+
+class Span:
+    def __init__(self, name, kind, parent=None):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        self.rows = None
+        self.status = 'ok'
+        self.start = 0.0
+        self.seconds = 0.0
+        self.peak_rss_delta = 0
+        self.thread = threading.get_ident()
+
+    def add_rows(self, rows):
+        self.rows = (self.rows or 0) + int(rows)
+
+
+class Tracer:
+    def __init__(self):
+        self.spans = []
+        self.origin = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def span(self, name, kind='ingest', rows=None):
+        return _SpanContext(self, name, kind, rows)
+
+    def traced(self, name=None, kind='ingest', rows=None):
+        """
+        Decorator recording a span around every call. rows, if given, is called with the result to count its rows.
+        """
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name or function.__name__, kind) as span:
+                    result = function(*args, **kwargs)
+                    if rows is not None:
+                        span.add_rows(rows(result))
+                    return result
+            return wrapper
+        return decorate
+
+    def totals(self):
+        """
+        Count, total seconds, total rows, failures, largest peak RSS delta and duration histogram of every (kind, name).
+        """
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            entry = totals.setdefault((span.kind, span.name), {'count': 0, 'seconds': 0.0, 'rows': 0, 'failures': 0, 'peakRssDelta': 0,
+                                                               'buckets': [0] * len(DURATION_BUCKETS)})
+            entry['count'] += 1
+            entry['seconds'] += span.seconds
+            entry['rows'] += span.rows or 0
+            entry['failures'] += span.status != 'ok'
+            entry['peakRssDelta'] = max(entry['peakRssDelta'], span.peak_rss_delta)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.seconds <= bound:
+                    entry['buckets'][i] += 1
+        return totals
+
+    def prometheus(self, job):
+        def labels(kind, name, **extra):
+            pairs = {'job': job, 'kind': kind, 'span': name, **extra}
+            return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs.items()) + '}'
+
+        totals = self.totals()
+        lines = [
+            f'# HELP {METRIC_PREFIX}_span_duration_seconds Wall time of the instrumented stages and queries.',
+            f'# TYPE {METRIC_PREFIX}_span_duration_seconds histogram'
+        ]
+        for (kind, name), entry in totals.items():
+            for bound, count in zip(DURATION_BUCKETS, entry['buckets']):
+                lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{labels(kind, name, le=bound)} {count}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_bucket{labels(kind, name, le="+Inf")} {entry["count"]}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_sum{labels(kind, name)} {entry["seconds"]}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_count{labels(kind, name)} {entry["count"]}')
+
+        for metric, key, kind_of_metric, description in (
+            ('span_rows_total', 'rows', 'counter', 'Rows processed or returned by the instrumented stages and queries.'),
+            ('span_failures_total', 'failures', 'counter', 'Instrumented stages and queries that raised an exception.'),
+            ('span_peak_rss_delta_bytes', 'peakRssDelta', 'gauge', 'Largest peak resident memory above the level at the start of a span.')
+        ):
+            lines.append(f'# HELP {METRIC_PREFIX}_{metric} {description}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{metric} {kind_of_metric}')
+            for (kind, name), entry in totals.items():
+                lines.append(f'{METRIC_PREFIX}_{metric}{labels(kind, name)} {entry[key]}')
+
+        lines.append(f'# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Time the metrics were written.')
+        lines.append(f'# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge')
+        lines.append(f'{METRIC_PREFIX}_last_run_timestamp_seconds{{job="{job}"}} {time.time()}')
+        return '\n'.join(lines) + '\n'
+
+    def trace(self):
+        # Complete ("X") events in microseconds since the tracer was created, one timeline row per thread
+        with self._lock:
+            spans = list(self.spans)
+        return {'traceEvents': [{
+            'name': span.name, 'cat': span.kind, 'ph': 'X', 'pid': os.getpid(), 'tid': span.thread,
+            'ts': round((span.start - self.origin) * 1e6), 'dur': round(span.seconds * 1e6),
+            'args': {'rows': span.rows, 'status': span.status, 'peakRssDeltaBytes': span.peak_rss_delta, 'parent': span.parent}
+        } for span in spans], 'displayTimeUnit': 'ms'}
+
+    def export(self, out_dir, job):
+        """
+        Write <job>.prom and <job>_trace.json into out_dir. The Prometheus file is replaced atomically, so a collector
+        never reads it half written.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        prom_path = os.path.join(out_dir, f'{job}.prom')
+        with open(prom_path + '.tmp', 'w') as f:
+            f.write(self.prometheus(job))
+        os.replace(prom_path + '.tmp', prom_path)
+        with open(os.path.join(out_dir, f'{job}_trace.json'), 'w') as f:
+            json.dump(self.trace(), f)
+        log.info(f"Wrote {len(self.spans)} spans to {prom_path} and {job}_trace.json")
+
+
+class _SpanContext:
+    def __init__(self, tracer: Tracer, name, kind, rows):
+        self.tracer = tracer
+        stack = tracer._stack()
+        self.span = Span(name, kind, stack[-1].name if stack else None)
+        if rows is not None:
+            self.span.add_rows(rows)
+        self.memory = PeakMemory()
+
+    def __enter__(self):
+        self.tracer._stack().append(self.span)
+        self.memory.__enter__()
+        self.span.start = time.time()
+        self._started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.span.seconds = time.perf_counter() - self._started
+        self.memory.__exit__(exc_type, exc, traceback)
+        self.span.peak_rss_delta = self.memory.delta
+        if exc_type is not None:
+            self.span.status = 'failed'
+        self.tracer._stack().pop()
+        with self.tracer._lock:
+            self.tracer.spans.append(self.span)
+        log.debug(f"{self.span.kind} {self.span.name}: {self.span.seconds:.3f}s, {self.span.rows} rows")
+        return False
+
+
+# Process-wide tracer used by the apps
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
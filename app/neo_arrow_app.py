@@ -8,38 +8,32 @@ Author: Benjamin Chu
 Date: 11-09-2023
 """
 
+import argparse
 import logging
 import os
-import pandas as pd
 
+from connections import gds_client
 from dotenv import load_dotenv
-from geopy.geocoders import Nominatim
-from graphdatascience import GraphDataScience
-from pydantic import BaseModel
-from sklearn.preprocessing import LabelEncoder
-from typing import Union
+from lazy_imports import lazy_import
+from metrics import span, tracer
+
+# Loaded by the first stage that uses them, so that importing the loader or printing --help stays fast
+pd = lazy_import('pandas')
+arrow_ingest = lazy_import('arrow_ingest')
+geocoding = lazy_import('geocoding')
+graph_algorithms = lazy_import('graph_algorithms')
+incremental = lazy_import('incremental')
+ingest = lazy_import('ingest')
+merchant_rollups = lazy_import('merchant_rollups')
+post_load = lazy_import('post_load')
+stream_ingest = lazy_import('stream_ingest')
+transfer_stats = lazy_import('transfer_stats')
 
 load_dotenv()
 
-NEO4J_URI = os.environ["NEO4J_URI"]
-NEO4J_USERNAME = os.environ["NEO4J_USERNAME"]
-NEO4J_PASSWORD = os.environ["NEO4J_PASSWORD"]
-
-gds = GraphDataScience("bolt://"+NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD), arrow=True)
-# Necessary if Arrow is enabled
-gds.set_database("neo4j")
-
 log = logging.getLogger('csv_to_graph')
 logging.basicConfig(level=logging.INFO)
 
-# Create a LabelEncoder instance
-gender_encoder = LabelEncoder()
-
-class NodeItem(BaseModel):
-    node_index: int
-    value: Union[int, str]
-    label: str
-
 def read_csv(file_path):
     return pd.read_csv(file_path)
 
@@ -47,207 +41,166 @@ def convert_to_int(value):
     value = str(value)
     return int(value.replace('-', ''))
 
-def get_lat_long(row):
-    address = row['Address']
-    country = row['Country']
-    
-    geolocator = Nominatim(timeout=10, user_agent="geolocator")
-    location = geolocator.geocode(address)
-    
-    if location is not None:
-        return pd.Series({'Latitude': location.latitude, 'Longitude': location.longitude})
+def create_geocoder(args):
+    if args.geocoder == 'offline':
+        backend = geocoding.OfflineBackend.from_csv(args.geocoder_reference)
     else:
-        location = geolocator.geocode(country)
-        return pd.Series({'Latitude': location.latitude, 'Longitude': location.longitude})
-
-def create_nodes_from_dataframe(df, label_value_pairs, starting_index):
-    nodes = []
-    index = starting_index
-
-    for _, row in df.iterrows():
-        for label, column_name in label_value_pairs.items():
-            if column_name in df.columns:
-                value = row[column_name]
-                node = NodeItem(
-                    node_index=index,
-                    value=value,
-                    label=label
-                )
-                nodes.append(node)
-                index += 1
-    return nodes
-
-def map_values_to_node_ids(nodes, label_filter=None):
-    value_to_node_id = {}
-
-    for node in nodes:
-        if label_filter is None or node.label == label_filter:
-            value_to_node_id[node.value] = node.node_index
-    return value_to_node_id
-
-
-# main execution of the app.py
-if __name__ == "__main__":
-    customer_df = read_csv('../data/customers.csv')
+        backend = geocoding.NominatimBackend()
+    return geocoding.Geocoder(backend, geocoding.GeocodeCache(args.geocode_cache), max_workers=args.geocode_workers, requests_per_second=args.geocode_rate)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest the CustomerNexus360 CSV files into Neo4j")
+    parser.add_argument('--data-dir', default='../data', help="Directory holding customers.csv, purchases.csv and transfers.csv")
+    parser.add_argument('--geocoder', choices=['nominatim', 'offline'], default='nominatim', help="Backend used when customers.csv has no coordinates")
+    parser.add_argument('--geocoder-reference', help="Previously geocoded CSV with Address/Country and Latitude/Longitude, required by the offline geocoder")
+    parser.add_argument('--geocode-cache', default='../data/geocode_cache.sqlite', help="SQLite file caching geocoding results between runs")
+    parser.add_argument('--geocode-workers', type=int, default=4, help="Number of concurrent geocoding requests")
+    parser.add_argument('--geocode-rate', type=float, default=1.0, help="Maximum geocoding requests per second")
+    parser.add_argument('--parser', choices=['arrow', 'pandas'], default='arrow', help="CSV parsing path for the full load")
+    parser.add_argument('--chunk-size', type=int, default=None, help="Stream purchases and transfers in chunks of this many rows instead of loading them whole")
+    parser.add_argument('--incremental', action='store_true', help="Only write transfers and purchases newer than the previous load into the existing database")
+    parser.add_argument('--state-dir', default='../data/load_state', help="Directory holding the high-water marks and node id maps between runs")
+    parser.add_argument('--metrics-dir', default='../data/metrics', help="Directory receiving ingest.prom and ingest_trace.json with the timings of the load stages")
+    parser.add_argument('--algorithms', choices=['local', 'none'], default=None, help="Compute pagerank and communityId in-process during a full load, or leave them to cypher_app (default: local, none with --chunk-size)")
+    args = parser.parse_args()
+    # customers.csv itself is only geocoded when it has no coordinates, so it cannot serve as the reference
+    if args.geocoder == 'offline' and args.geocoder_reference is None:
+        parser.error("--geocoder offline requires --geocoder-reference")
+    # The in-process algorithms hold every transfer in memory, which --chunk-size is meant to avoid
+    if args.chunk_size and args.algorithms == 'local':
+        parser.error("--algorithms local needs every transfer in memory and cannot be combined with --chunk-size, leave the algorithms to cypher_app")
+    if args.algorithms is None:
+        args.algorithms = 'none' if args.chunk_size else 'local'
+    return args
+
+# Full or incremental load of the CSV files, with every stage recorded as a span
+def load(args):
+    # Arrow is enabled for the Flight upload, which needs the database set
+    gds = gds_client("neo4j", arrow=True)
+    with span('read_customers') as stage:
+        customer_df = read_csv(os.path.join(args.data_dir, 'customers.csv'))
+        stage.add_rows(len(customer_df))
+    transfers_path = os.path.join(args.data_dir, 'transfers.csv')
+    purchases_path = os.path.join(args.data_dir, 'purchases.csv')
 
     # Check if 'Latitude' and 'Longitude' columns do not exist
     if 'Latitude' not in customer_df.columns or 'Longitude' not in customer_df.columns:
         log.info("Converting addresses to geo-coordinates")
-        # Apply the get_lat_long function to the "Address", "Country" columns and create new columns "Latitude" and "Longitude"
-        customer_df[['Latitude', 'Longitude']] = customer_df.apply(get_lat_long, axis=1)
+        # Geocode the distinct "Address" values, falling back to "Country", and create new columns "Latitude" and "Longitude"
+        with span('geocoding', rows=len(customer_df)):
+            customer_df[['Latitude', 'Longitude']] = create_geocoder(args).geocode_frame(customer_df)
         log.info("Coordinates conversion is completed")
-    
-    # Apply the convert_to_int function to 'AccountNumber' and 'CardNumber'
-    customer_df['AccountNumber'] = customer_df['AccountNumber'].apply(convert_to_int)
-    customer_df['CardNumber'] = customer_df['CardNumber'].apply(convert_to_int)
-
-    # Fit and transform the 'Gender' column
-    customer_df['Gender_Encoded'] = gender_encoder.fit_transform(customer_df['Gender']) + 1 
-
-    transaction_df = read_csv('../data/transfers.csv')
-    transaction_df['TransactionID'] = transaction_df['TransactionID'].astype(int)
-    transaction_df['SenderAccountNumber'] = transaction_df['SenderAccountNumber'].str.replace('-', '').astype(int)
-    transaction_df['ReceiverAccountNumber'] = transaction_df['ReceiverAccountNumber'].str.replace('-', '').astype(int)
-    transaction_df['Amount'] = transaction_df['Amount'].astype(float)
-    transaction_df['TransferDatetime'] = pd.to_datetime(transaction_df['TransferDatetime']).dt.tz_convert('UTC')
-    transaction_df['TransferEpoch'] = (transaction_df['TransferDatetime'] - pd.Timestamp('1970-01-01 00:00:00+00:00', tz='UTC')).dt.total_seconds().astype(int)
-
-    purchase_df = read_csv('../data/purchases.csv')
-    purchase_df['CardNumber'] = purchase_df['CardNumber'].str.replace('-', '').astype(int)
-    purchase_df['Merchant'] = purchase_df['Merchant'].str.replace(' ', '_')
-    purchase_df['PurchaseDatetime'] = pd.to_datetime(purchase_df['PurchaseDatetime']).dt.tz_convert('UTC')
-    purchase_df['PurchaseEpoch'] = (purchase_df['PurchaseDatetime'] - pd.Timestamp('1970-01-01 00:00:00+00:00', tz='UTC')).dt.total_seconds().astype(int)
-
-    # Filter out duplicate merchant values in the purchase_df dataFrame
-    distinct_merchant_df = purchase_df.drop_duplicates(subset='Merchant') 
-
-    # Filter out duplicate card issuer values in the purchase_df DataFrame
-    distinct_card_issuer_df = purchase_df.drop_duplicates(subset='CardIssuer')
-
-    # Remove duplicates based on pairs of 'CardNumber' and 'CardIssuer'
-    distinct_card_issuer_to_card = purchase_df.drop_duplicates(subset=['CardNumber', 'CardIssuer'])
-
-    label_value_pairs_customer = {'Customer': 'CIF', 'Account': 'AccountNumber', 'Card': 'CardNumber'}
-    label_value_pairs_purchase= {'Purchase': 'TransactionID'}
-    label_value_pairs_merchant = {'Merchant': 'Merchant'}
-    label_value_pairs_card_issuers = {'CardIssuer': 'CardIssuer'}
-
-    customer_nodes = create_nodes_from_dataframe(customer_df, label_value_pairs_customer, starting_index=1)
-    purchase_nodes = create_nodes_from_dataframe(purchase_df, label_value_pairs_purchase, starting_index=max(node.node_index for node in customer_nodes)+1)
-    merchant_nodes = create_nodes_from_dataframe(distinct_merchant_df, label_value_pairs_merchant, starting_index=max(node.node_index for node in purchase_nodes)+1)
-    card_issuer_nodes = create_nodes_from_dataframe(distinct_card_issuer_df, label_value_pairs_card_issuers, starting_index=max(node.node_index for node in merchant_nodes)+1)
-
-    nodes = customer_nodes + purchase_nodes + merchant_nodes + card_issuer_nodes
-
-    placeholder_merchant_node = NodeItem(
-        node_index=len(nodes) + 1,
-        value='Merchant',
-        label='Merchant'
-    )  
-
-    nodes.append(placeholder_merchant_node)
-    
-    # Create a dictionary to map node_index to value
-    node_index_to_value = {node.node_index: node.value for node in nodes}
-
-    cif_to_node_id = map_values_to_node_ids(nodes, 'Customer')
-    account_number_to_node_id = map_values_to_node_ids(nodes, 'Account')
-    card_number_to_node_id = map_values_to_node_ids(nodes, 'Card')
-    merchant_to_node_id = map_values_to_node_ids(nodes, 'Merchant')
-    purchase_to_node_id = {node.value: node.node_index for node in nodes if node.label == 'Purchase'}
-
-
-    # Create customer_properties dataframe
-    customer_properties = pd.DataFrame().assign(
-        nodeId=customer_df['CIF'].map(cif_to_node_id),
-        CIF=customer_df['CIF'].tolist(),
-        labels="Customer",
-        Age=customer_df['Age'].tolist(),
-        Gender=customer_df['Gender_Encoded'].tolist(),
-        Latitude=customer_df['Latitude'].tolist(),
-        Longitude=customer_df['Longitude'].tolist()
-    )
-
-    # Create transaction_properties dataframe
-    transaction_properties = pd.DataFrame().assign(
-        transactionId=transaction_df['TransactionID'],
-        senderId=transaction_df['SenderAccountNumber'].map(account_number_to_node_id),
-        receiverId=transaction_df['ReceiverAccountNumber'].map(account_number_to_node_id),
-        SenderAccountNumber=transaction_df['SenderAccountNumber'].tolist(),
-        ReceiverAccountNumber=transaction_df['ReceiverAccountNumber'].tolist(),
-        Amount=transaction_df['Amount'],
-        TransferEpoch=transaction_df['TransferEpoch']
-    )
-
-    # Create account_properties dataframe
-    account_properties = pd.DataFrame().assign(
-        nodeId=customer_df['AccountNumber'].map(account_number_to_node_id),
-        labels="Account",
-        AccountNumber=customer_df['AccountNumber'].tolist()
-    )
-
-    # Create card_properties dataframe
-    card_properties = pd.DataFrame().assign(
-        nodeId=customer_df['CardNumber'].map(card_number_to_node_id),
-        labels="Card",
-        CardNumber=customer_df['CardNumber'].tolist()
-    )
-
-    # Create purchase_properties dataframe
-    purchase_properties = pd.DataFrame().assign(
-        nodeId=purchase_df['TransactionID'].map(purchase_to_node_id),
-        labels="Purchase",
-        Merchant=purchase_df['Merchant'].map(merchant_to_node_id)
-    )
-
-    # Create merchant_properties dataframe
-    merchant_properties = pd.DataFrame().assign(
-        nodeId=distinct_merchant_df['Merchant'].map(merchant_to_node_id),
-        labels=distinct_merchant_df['Merchant'].tolist()
-    )
-    data_to_append = pd.DataFrame({'nodeId': [placeholder_merchant_node.node_index], 'labels': ['Merchant']})
-    merchant_properties = pd.concat([merchant_properties, data_to_append], ignore_index=True)
-
-    # Create a dictionary to map card_issuer to nodeId
-    card_issuer_to_node_id = {node.value: node.node_index for node in nodes if node.label == 'CardIssuer'}
-
-    # Create card_issuer_properties dataframe
-    card_issuer_properties = pd.DataFrame().assign(
-        nodeId=distinct_card_issuer_df['CardIssuer'].map(card_issuer_to_node_id),
-        labels=distinct_card_issuer_df['CardIssuer'].tolist()
-    )
-
-    all_properties = pd.concat([customer_properties[["nodeId", "labels"]], account_properties[["nodeId", "labels"]], card_properties[["nodeId", "labels"]], purchase_properties[["nodeId", "labels"]], merchant_properties[["nodeId", "labels"]], card_issuer_properties[["nodeId", "labels"]]])
-    
-    customer_ids = all_properties[all_properties['labels'] == 'Customer']['nodeId'].tolist()
-    account_ids = all_properties[all_properties['labels'] == 'Account']['nodeId'].tolist()
-    card_ids = all_properties[all_properties['labels'] == 'Card']['nodeId'].tolist()
-    purchase_ids = all_properties[all_properties['labels'] == 'Purchase']['nodeId'].tolist()
-    merchant_ids = [node_id for node_id in merchant_properties['nodeId'].tolist() if node_id != placeholder_merchant_node.node_index]
-
-    account_transaction_ids = transaction_properties['transactionId'].tolist()
-    sender_ids = transaction_properties['senderId'].tolist()
-    receiver_ids = transaction_properties['receiverId'].tolist()
-    account_amount_list = transaction_properties['Amount'].tolist()
-
-    purchase_merchant_ids = purchase_properties['Merchant'].tolist()
-    purchase_transaction_ids = purchase_df['TransactionID'].tolist()
-    purchase_amount_list = purchase_df['Amount'].tolist()
-
-    R1 = pd.DataFrame().assign(sourceNodeId=customer_ids, targetNodeId=account_ids, relationshipType="HAS_ACCOUNT")
-    R2 = pd.DataFrame().assign(sourceNodeId=sender_ids, targetNodeId=receiver_ids, relationshipType="TRANSFER", transactionId=account_transaction_ids, transactionAmount=account_amount_list, transferEpoch=transaction_properties['TransferEpoch'].tolist())
-    R3 = pd.DataFrame().assign(sourceNodeId=customer_ids, targetNodeId=card_ids, relationshipType="HAS_CARD")
-    R4 = pd.DataFrame().assign(sourceNodeId=merchant_ids, targetNodeId=placeholder_merchant_node.node_index, relationshipType="HAS_TYPE")
-    R5 = pd.DataFrame().assign(sourceNodeId=purchase_df['CardNumber'].map(card_number_to_node_id).tolist(), targetNodeId=purchase_ids, relationshipType="PURCHASE", purchaseId=purchase_transaction_ids, purchaseAmount=purchase_amount_list, purchaseEpoch=purchase_df['PurchaseEpoch'].tolist())
-    R6 = pd.DataFrame().assign(sourceNodeId=purchase_ids, targetNodeId=purchase_merchant_ids, relationshipType="HAS_MERCHANT")
-    R7 = pd.DataFrame().assign(sourceNodeId=distinct_card_issuer_to_card['CardNumber'].map(card_number_to_node_id).tolist(), targetNodeId=distinct_card_issuer_to_card['CardIssuer'].map(card_issuer_to_node_id).tolist(), relationshipType="HAS_CARD_ISSUER")
-
-    # Construct the graph
-    customer_graph = gds.graph.construct(
-        "customer-load-graph",
-        [customer_properties, account_properties, card_properties, purchase_properties, merchant_properties, card_issuer_properties],
-        [R1, R2, R3, R4, R5, R6, R7]
-    )
-
-    gds.run_cypher("""CALL gds.graph.export('customer-load-graph', { dbName: 'customernexus360' })""")
-    customer_graph.drop()
\ No newline at end of file
+
+    with span('normalize_customers', rows=len(customer_df)):
+        # Apply the convert_to_int function to 'AccountNumber' and 'CardNumber'
+        customer_df['AccountNumber'] = customer_df['AccountNumber'].apply(convert_to_int)
+        customer_df['CardNumber'] = customer_df['CardNumber'].apply(convert_to_int)
+
+        # Fit and transform the 'Gender' column
+        customer_df['Gender_Encoded'] = ingest.CategoryEncoder(start=1).fit_transform(customer_df['Gender'])
+
+    if args.incremental:
+        state = incremental.LoadState.load(args.state_dir)
+        if state is None:
+            raise SystemExit(f"No load state found in {args.state_dir}, run a full load first")
+        if state.streamed:
+            raise SystemExit(f"The load state in {args.state_dir} is from a --chunk-size load, which does not keep the purchase ids; run a full load without --chunk-size first")
+
+        # Only the rows past the high-water marks are written into the existing database
+        with span('normalize_transfers') as stage:
+            transaction_df = ingest.normalize_transfers(read_csv(transfers_path))
+            stage.add_rows(len(transaction_df))
+        with span('normalize_purchases') as stage:
+            purchase_df = ingest.normalize_purchases(read_csv(purchases_path))
+            stage.add_rows(len(purchase_df))
+        with span('incremental_load'):
+            incremental.load_delta(gds, state, customer_df, transaction_df, purchase_df, database='customernexus360')
+        return
+
+    transfer_mark, purchase_mark = incremental.HighWaterMark(), incremental.HighWaterMark()
+    stats = transfer_stats.TransferStatsBuilder()
+    rollups = merchant_rollups.MerchantRollupBuilder(customer_df)
+    # Sender, receiver and amount of every transfer, for the in-process PageRank, Louvain and community summary (not with --chunk-size)
+    transfer_edges = []
+
+    if args.chunk_size:
+        # Stream purchases and transfers in fixed-size chunks, keeping memory bounded by the chunk size
+        # The transfer statistics and merchant rollups are built from the chunks as they are uploaded. The streamed graph
+        # gives every purchase row its own Purchase node
+        with span('stream_graph'):
+            customer_graph, nodes = stream_ingest.stream_graph(gds, "customer-load-graph", customer_df, transfers_path, purchases_path, args.chunk_size,
+                                                               transfer_mark=transfer_mark, purchase_mark=purchase_mark, on_transfers=stats.add,
+                                                               on_purchases=lambda chunk: rollups.add(chunk, shared_ids=False))
+    elif args.parser == 'arrow':
+        # Parse and normalize with Arrow kernels, and hand the Arrow tables straight to the Flight upload
+        with span('normalize_transfers') as stage:
+            transfers = arrow_ingest.read_transfers(transfers_path)
+            stage.add_rows(transfers.num_rows)
+        with span('normalize_purchases') as stage:
+            purchases = arrow_ingest.read_purchases(purchases_path)
+            stage.add_rows(purchases.num_rows)
+
+        with span('build_graph'):
+            nodes, node_tables, relationship_tables = arrow_ingest.build_graph_tables(customer_df, transfers, purchases)
+        transfer_mark.observe(transfers['TransferEpoch'].to_numpy(), transfers['TransactionID'].to_numpy())
+        with span('transfer_stats', rows=transfers.num_rows):
+            stats.add(transfers.select(['SenderAccountNumber', 'Amount']).to_pandas())
+        transfer_edges.append(transfers.select(['SenderAccountNumber', 'ReceiverAccountNumber', 'Amount']).to_pandas())
+        purchase_mark.observe(purchases['PurchaseEpoch'].to_numpy(), purchases['TransactionID'].to_numpy())
+        with span('merchant_rollups', rows=purchases.num_rows):
+            rollups.add(purchases.select(['TransactionID', 'CardNumber', 'Merchant', 'Amount', 'PurchaseEpoch']).to_pandas())
+
+        with span('upload_graph', rows=sum(len(table) for table in node_tables + relationship_tables)):
+            customer_graph = stream_ingest.upload_graph(gds, "customer-load-graph", node_tables, relationship_tables)
+    else:
+        with span('normalize_transfers') as stage:
+            transaction_df = ingest.normalize_transfers(read_csv(transfers_path))
+            stage.add_rows(len(transaction_df))
+        with span('normalize_purchases') as stage:
+            purchase_df = ingest.normalize_purchases(read_csv(purchases_path))
+            stage.add_rows(len(purchase_df))
+
+        with span('build_graph'):
+            nodes, node_frames, relationship_frames = ingest.build_graph_frames(customer_df, transaction_df, purchase_df)
+        transfer_mark.observe(transaction_df['TransferEpoch'], transaction_df['TransactionID'])
+        with span('transfer_stats', rows=len(transaction_df)):
+            stats.add(transaction_df)
+        transfer_edges.append(transaction_df[['SenderAccountNumber', 'ReceiverAccountNumber', 'Amount']])
+        purchase_mark.observe(purchase_df['PurchaseEpoch'], purchase_df['TransactionID'])
+        with span('merchant_rollups', rows=len(purchase_df)):
+            rollups.add(purchase_df)
+
+        # Construct the graph
+        with span('construct_graph', rows=sum(len(frame) for frame in node_frames + relationship_frames)):
+            customer_graph = gds.graph.construct("customer-load-graph", node_frames, relationship_frames)
+
+    with span('export_graph', rows=len(nodes)):
+        gds.run_cypher("""CALL gds.graph.export('customer-load-graph', { dbName: 'customernexus360' })""")
+        customer_graph.drop()
+
+    # Properties and indexes the projection cannot carry, such as the customers' Coordinate point
+    with span('finish_load'):
+        post_load.finish_load(gds, 'customernexus360')
+    with span('write_transfer_stats', rows=len(stats.senders)):
+        transfer_stats.write_transfer_stats(gds, 'customernexus360', stats)
+    with span('write_merchant_rollups', rows=len(rollups.rollups)):
+        merchant_rollups.write_merchant_rollups(gds, 'customernexus360', rollups)
+    if args.algorithms == 'local':
+        edges = pd.concat(transfer_edges, ignore_index=True)
+        accounts = pd.concat([customer_df['AccountNumber'], edges['SenderAccountNumber'], edges['ReceiverAccountNumber']])
+        with span('graph_algorithms', rows=len(edges)):
+            graph_algorithms.precompute_scores(gds, 'customernexus360', accounts, edges['SenderAccountNumber'], edges['ReceiverAccountNumber'], edges['Amount'])
+
+    # Record what has been loaded so that the next run can be incremental
+    with span('save_load_state'):
+        incremental.LoadState(args.state_dir, nodes, transfer_mark, purchase_mark, streamed=bool(args.chunk_size)).save()
+
+# main execution of the app.py
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        with span('load'):
+            load(args)
+    finally:
+        # Written for failed loads too, which then show the stage they failed in
+        tracer.export(args.metrics_dir, 'ingest')
@@ -0,0 +1,122 @@
+"""
+node_table.py
+
+Description:
+Columnar node table used by the ingest pipeline. Node IDs are assigned per label as vectorized ranges and kept as
+(node_id, label, value) arrays, with a hashed value -> node ID lookup index per label.
+
+Date: 17-10-2026
+"""
+
+import json
+import numpy as np
+import os
+import pandas as pd
+
+from typing import Dict, List, Optional
+
+
+class NodeTable:
+    def __init__(self, starting_index=1):
+        self.starting_index = starting_index
+        self.next_id = starting_index
+        self._node_ids: List[np.ndarray] = []
+        self._labels: List[np.ndarray] = []
+        self._values: List[np.ndarray] = []
+        self._blocks: Dict[str, List[pd.Series]] = {}
+        self._index: Dict[str, pd.Series] = {}
+
+    def __len__(self):
+        return self.next_id - self.starting_index
+
+    def _append(self, label, node_ids, values):
+        self._node_ids.append(node_ids)
+        self._labels.append(np.full(len(node_ids), label, dtype=object))
+        self._values.append(values)
+        self._blocks.setdefault(label, []).append(pd.Series(node_ids, index=values))
+        self._index.pop(label, None)
+
+    def add_nodes(self, df, label_value_pairs):
+        """
+        Assign node IDs row by row across the given label -> column pairs, i.e. the row at position i gets IDs
+        next_id + i * width + k for the k-th column present in df. Returns the IDs per label, aligned to df rows.
+        """
+        columns = [(label, column) for label, column in label_value_pairs.items() if column in df.columns]
+        width = len(columns)
+        row_offsets = np.arange(len(df), dtype=np.int64) * width + self.next_id
+
+        assigned = {}
+        for k, (label, column) in enumerate(columns):
+            node_ids = row_offsets + k
+            self._append(label, node_ids, df[column].to_numpy())
+            assigned[label] = node_ids
+
+        self.next_id += len(df) * width
+        return assigned
+
+    def add_node(self, label, value):
+        node_id = self.next_id
+        self._append(label, np.array([node_id], dtype=np.int64), np.array([value], dtype=object))
+        self.next_id += 1
+        return node_id
+
+    def reserve(self, count):
+        """
+        Reserve a contiguous block of count node IDs without indexing their values, returning the first ID.
+        """
+        start = self.next_id
+        self.next_id += count
+        return start
+
+    def lookup(self, label):
+        """
+        Hashed value -> node ID index for a label. When a value occurs more than once the last assigned ID wins.
+        """
+        index = self._index.get(label)
+        if index is None:
+            blocks = self._blocks.get(label, [])
+            index = pd.concat(blocks) if blocks else pd.Series([], dtype=np.int64)
+            index = index[~index.index.duplicated(keep='last')]
+            self._index[label] = index
+        return index
+
+    def map(self, label, values):
+        # Positional result: the returned Series always has a fresh RangeIndex, whatever the index of values
+        return pd.Series(np.asarray(values)).map(self.lookup(label))
+
+    def ids(self, label):
+        blocks = self._blocks.get(label, [])
+        return np.concatenate([block.to_numpy() for block in blocks]) if blocks else np.array([], dtype=np.int64)
+
+    def to_frame(self, label: Optional[str] = None):
+        frame = pd.DataFrame({
+            'nodeId': np.concatenate(self._node_ids) if self._node_ids else np.array([], dtype=np.int64),
+            'label': np.concatenate(self._labels) if self._labels else np.array([], dtype=object),
+            'value': np.concatenate(self._values) if self._values else np.array([], dtype=object),
+        })
+        if label is not None:
+            frame = frame[frame['label'] == label].reset_index(drop=True)
+        return frame
+
+    def save(self, directory):
+        """
+        Persist the value -> node ID maps of every label, so that a later run can continue the same id sequence.
+        """
+        os.makedirs(directory, exist_ok=True)
+        labels = list(self._blocks)
+        for label in labels:
+            lookup = self.lookup(label)
+            pd.DataFrame({'value': lookup.index, 'nodeId': lookup.to_numpy()}).to_parquet(os.path.join(directory, f"nodes_{label}.parquet"), index=False)
+        with open(os.path.join(directory, 'node_table.json'), 'w') as f:
+            json.dump({'starting_index': self.starting_index, 'next_id': self.next_id, 'labels': labels}, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'node_table.json')) as f:
+            meta = json.load(f)
+        table = cls(starting_index=meta['starting_index'])
+        for label in meta['labels']:
+            frame = pd.read_parquet(os.path.join(directory, f"nodes_{label}.parquet"))
+            table._append(label, frame['nodeId'].to_numpy(dtype=np.int64), frame['value'].to_numpy(dtype=object))
+        table.next_id = meta['next_id']
+        return table
@@ -0,0 +1,100 @@
+"""
+post_load.py
+
+Description:
+Writes that follow the export of a full load by neo_arrow_app.py. GDS projections only carry numeric properties, so
+derived properties such as the customers' Coordinate point, the merchant names and the per-account transfer statistics
+are written here once, in the exported database, together with the indexes the queries and incremental loads rely on.
+
+Date: 17-10-2026
+"""
+
+import logging
+import pandas as pd
+
+log = logging.getLogger('post_load')
+
+WRITE_BATCH_SIZE = 10_000
+
+
+def write_batches(gds, cypher, rows: pd.DataFrame, database, **params):
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        batch = rows.iloc[start:start + WRITE_BATCH_SIZE]
+        gds.run_cypher(cypher, params={'rows': batch.to_dict('records'), **params}, database=database)
+
+
+def start_database(gds, database):
+    """
+    gds.graph.export only writes the store files; the database still has to be created before it can be written to.
+    """
+    try:
+        gds.run_cypher(f"CREATE DATABASE `{database}` IF NOT EXISTS WAIT", database='system')
+    except Exception as e:
+        # Without multi-database support the database has to be started through the server configuration instead
+        log.warning(f"Could not create database {database}, assuming it is already online: {e}")
+
+
+def create_indexes(gds, database):
+    # Rows are attached to existing nodes by their numbers, so these lookups must not scan
+    gds.run_cypher("CREATE INDEX account_number IF NOT EXISTS FOR (a:Account) ON (a.AccountNumber)", database=database)
+    gds.run_cypher("CREATE INDEX card_number IF NOT EXISTS FOR (c:Card) ON (c.CardNumber)", database=database)
+    gds.run_cypher("CREATE INDEX customer_cif IF NOT EXISTS FOR (c:Customer) ON (c.CIF)", database=database)
+    gds.run_cypher("CREATE POINT INDEX customer_coordinate IF NOT EXISTS FOR (c:Customer) ON (c.Coordinate)", database=database)
+    gds.run_cypher("CREATE INDEX business_name IF NOT EXISTS FOR (m:Business) ON (m.name)", database=database)
+    gds.run_cypher("CREATE INDEX purchase_id IF NOT EXISTS FOR (p:Purchase) ON (p.purchaseId)", database=database)
+    gds.run_cypher("CREATE INDEX merchant_month IF NOT EXISTS FOR (r:MerchantMonth) ON (r.merchant, r.year, r.month)", database=database)
+
+
+def write_customer_points(gds, database):
+    """
+    Materialize the WGS-84 point of every customer with coordinates, so the geo queries do not build it per row.
+    """
+    written = gds.run_cypher("""
+        MATCH (c:Customer)
+        WHERE c.Latitude IS NOT NULL AND c.Longitude IS NOT NULL
+        CALL {
+            WITH c
+            SET c.Coordinate = point({latitude: toFloat(c.Latitude), longitude: toFloat(c.Longitude)})
+        } IN TRANSACTIONS OF 10000 ROWS
+        RETURN count(c) AS customers
+    """, database=database)['customers'][0]
+    log.info(f"Wrote the Coordinate point of {written} customers")
+
+
+def write_merchant_names(gds, database):
+    """
+    Merchant nodes are labelled by their name. Add the Business label and the name as an indexed property, so that a
+    merchant is found through the index rather than by scanning the labels of every node.
+    """
+    written = gds.run_cypher("""
+        MATCH (m)-[:HAS_TYPE]->(:Merchant)
+        SET m:Business, m.name = [label IN labels(m) WHERE label <> 'Business'][0]
+        RETURN count(m) AS merchants
+    """, database=database)['merchants'][0]
+    log.info(f"Wrote the name of {written} merchants")
+
+
+def write_purchase_ids(gds, database):
+    """
+    Copy the TransactionID of each Purchase node from its PURCHASE relationships, so that an incremental load attaches
+    a late row sharing the TransactionID to the existing node.
+    """
+    written = gds.run_cypher("""
+        MATCH (p:Purchase)
+        CALL {
+            WITH p
+            MATCH (p)<-[r:PURCHASE]-()
+            WITH p, r LIMIT 1
+            SET p.purchaseId = r.purchaseId
+        } IN TRANSACTIONS OF 10000 ROWS
+        RETURN count(p) AS purchases
+    """, database=database)['purchases'][0]
+    log.info(f"Wrote the purchaseId of {written} purchases")
+
+
+def finish_load(gds, database):
+    start_database(gds, database)
+    create_indexes(gds, database)
+    write_customer_points(gds, database)
+    write_merchant_names(gds, database)
+    write_purchase_ids(gds, database)
@@ -0,0 +1,275 @@
+"""
+queries.py
+
+Description:
+The analytics queries of cypher_app.py (Q1-Q9), each with its name, description, Cypher text and typed parameters, so
+that they can be run from the interactive menu or in batch.
+
+Thresholds, merchant and year are Cypher parameters rather than literals, so the query text stays the same whatever
+their values and Neo4j reuses its cached plan. warm_up plans every query with EXPLAIN at startup.
+
+Date: 17-10-2026
+"""
+
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass(frozen=True)
+class Parameter:
+    name: str
+    type: type
+    default: object
+    description: str
+
+    def parse(self, value):
+        try:
+            return self.type(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Parameter {self.name} expects {self.type.__name__}, got {value!r}")
+
+
+@dataclass(frozen=True)
+class Query:
+    number: int
+    name: str
+    description: str
+    cypher: str
+    parameters: Tuple[Parameter, ...] = ()
+
+    def bind(self, overrides=None):
+        """
+        Parameter values of the query: the defaults, replaced by the overrides this query declares, converted to their
+        types. Overrides for parameters of other queries are ignored.
+        """
+        overrides = overrides or {}
+        return {p.name: p.parse(overrides.get(p.name, p.default)) for p in self.parameters}
+
+
+QUERIES = {query.number: query for query in [
+    Query(1, "QUERY-1",
+        description=(
+            "The query calculates the total expenditure of each customer, based on their purchase history."
+            "It offers a quick overview of customer spending patterns."
+        ),
+        cypher="""
+            MATCH (c:Customer)-[:HAS_CARD]->(:Card)-[p:PURCHASE]->(:Purchase)
+            RETURN c.CIF AS CIF, ROUND(SUM(p.purchaseAmount), 2) AS TotalExpenditure
+        """
+    ),
+    Query(2, "QUERY-2",
+        description=(
+            "The query calculates the total expenditure of each customer, based on their purchase history."
+            "It offers a quick overview of customer spending patterns."
+        ),
+        cypher="""
+            MATCH (c:Customer)-[:HAS_CARD]->(card)-[r:PURCHASE]->(purchase)-[:HAS_MERCHANT]->(merchant)
+            WITH c.CIF AS CustomerID, COLLECT(merchant.name) AS MerchantNames, ROUND(SUM(r.purchaseAmount), 2) AS Total_Expenditure
+            WITH CustomerID, apoc.coll.frequencies(MerchantNames) AS MerchantFrequencies, Total_Expenditure
+            UNWIND MerchantFrequencies AS output
+            WITH CustomerID, output.item + ':' + output.count AS MerchantCountConcatenated, Total_Expenditure
+            RETURN CustomerID, COLLECT(MerchantCountConcatenated) AS Merchant_Counts, Total_Expenditure
+            ORDER BY Total_Expenditure DESC
+        """
+    ),
+    Query(3, "QUERY-3",
+        description=(
+            "The query filters purchases made at the specified merchant in the year 2021, then groups them by month."
+            "It provides a monthly count of unique customers who made purchases at this specified merchant providing quick insights into customer engagement over time."
+        ),
+        cypher="""
+            // Monthly rollups are materialized at load time (see merchant_rollups.py), with sketched distinct customers
+            MATCH (r:MerchantMonth)
+            WHERE r.merchant = $merchant AND r.year = $year AND r.month IS NOT NULL
+            RETURN r.month AS Month, r.customerCount AS TotalCount
+            ORDER BY Month
+        """,
+        parameters=(
+            Parameter('merchant', str, 'Facebook', "Merchant name, with spaces replaced by underscores"),
+            Parameter('year', int, 2021, "Year of the purchases")
+        )
+    ),
+    Query(4, "QUERY-4",
+        description=(
+            "The query calculates the stats and assign anomaly flags for transactions conducted by sender accounts at the first level hop in the network."
+            "It provides the view on transaction patterns and identifies sender accounts with potentially unusual transaction behaviour based on mean, median, and standard deviation metrics."
+            "Based on all the flagged anomalies based on mean, median, and standard deviation, it will finally assign the final anomaly flag based on the union of all these values."
+        ),
+        cypher="""
+            // Overall and per-sender stats are precomputed at load time (see transfer_stats.py), one row per sender
+            MATCH (s:TransferStats {name: 'TRANSFER'})
+            MATCH (sender:Account)
+            WHERE sender.transferCount > 0
+
+            WITH sender,
+            s.mean AS OverallMeanTransactionAmount,
+            s.median AS OverallMedianTransactionAmount,
+            s.stdDev AS OverallStandardDeviationTransactionAmount
+
+            WITH sender,
+            OverallMeanTransactionAmount,
+            OverallMedianTransactionAmount,
+            OverallStandardDeviationTransactionAmount,
+            // Calculate anomaly scores
+            CASE
+            WHEN ABS(sender.transferMean - OverallMeanTransactionAmount) > $anomalyThreshold THEN 1
+            ELSE 0
+            END AS MeanAnomalyScore,
+            CASE
+            WHEN ABS(sender.transferMedian - OverallMedianTransactionAmount) > $anomalyThreshold THEN 1
+            ELSE 0
+            END AS MedianAnomalyScore,
+            CASE
+            WHEN ABS(sender.transferStdDev - OverallMeanTransactionAmount) > $anomalyThreshold THEN 1
+            ELSE 0
+            END AS StdDevAnomalyScore
+
+            RETURN sender.AccountNumber AS SenderAccountNumber,
+            sender.transferCount AS TransactionCount,
+            sender.transferMean AS MeanTransactionAmount,
+            sender.transferMedian AS MedianTransactionAmount,
+            sender.transferStdDev AS StandardDeviationTransactionAmount,
+            OverallMeanTransactionAmount, // Include overall statistics in the result
+            OverallMedianTransactionAmount,
+            OverallStandardDeviationTransactionAmount,
+            MeanAnomalyScore,
+            MedianAnomalyScore,
+            StdDevAnomalyScore,
+            // Calculate the combined Anomaly field
+            CASE
+            WHEN MeanAnomalyScore = 1 AND MedianAnomalyScore = 1 AND StdDevAnomalyScore = 1 THEN 1
+            ELSE 0
+            END AS Anomaly
+            ORDER BY Anomaly DESC;
+        """,
+        parameters=(
+            Parameter('anomalyThreshold', float, 1000, "Deviation of an account's mean, median or standard deviation from the overall statistics flagged as an anomaly"),
+        )
+    ),
+    # note: the results produced is better suited for visualization or viewing in NeoDash
+    Query(5, "QUERY-5",
+        description=(
+            "The query selects the top 10 accounts based on their PageRank, finds cycles of up to maximum depth of 10 involving these `influential` accounts through 'TRANSFER' relationships, and returns those cycles in the graph."
+            "It specifically aims to identify closed-loop transaction patterns, where the start and end accounts are the same."
+            "This is crucial in detecting potential money laundering or fraud activities, as closed-loop transactions may indicate attempts to obscure the flow of funds within a network."
+        ),
+        cypher="""
+            MATCH (a:Account)
+            WITH a
+            ORDER BY a.pagerank DESC
+            LIMIT $topAccounts
+            WITH collect(a) AS topAccounts
+            CALL apoc.nodes.cycles(topAccounts, {relTypes: ["TRANSFER"], maxDepth: $maxDepth})
+            YIELD path
+            WITH path, length(path) AS pathLength
+            ORDER BY pathLength DESC
+            RETURN path
+        """,
+        parameters=(
+            Parameter('topAccounts', int, 10, "Number of accounts with the highest PageRank the cycles start from"),
+            Parameter('maxDepth', int, 10, "Maximum number of transfers in a cycle")
+        )
+    ),
+    # note: the results produced is better suited for visualization or viewing in NeoDash
+    Query(6, "QUERY-6",
+        description=(
+            "The query leverages Louvain community detection to uncover potential colluding accounts, surfacing concealed associations within account transfers."
+            "This will be useful in identifying abnormal cluster sizes, flagging potentially fraudulent activities involving numerous accounts for further investigation."
+        ),
+        cypher="""
+            // Community summaries are written with communityId (see communities.py). Members are sorted by their largest
+            // transfer, so the accounts on a transfer of at least $minAmount are the first communitySize members
+            MATCH (c:Community)
+            WHERE c.maxTransferAmount >= $minAmount
+            WITH c, size([amount IN c.memberMaxAmounts[..c.transferMembers] WHERE amount >= $minAmount]) AS communitySize
+            WHERE communitySize > 1
+            RETURN c.communityId AS communityId, c.members[..communitySize] AS accountsInCommunity
+            ORDER BY communitySize DESC
+        """,
+        parameters=(
+            Parameter('minAmount', float, 5000, "Smallest transfer amount linking accounts in a community"),
+        )
+    ),
+    Query(7, "QUERY-7",
+        description=(
+            "This query calculates the average distance between pairs of customer locations based on latitude and longitude."
+            "This is essential for understanding the spatial distribution of customers and can help in identifying clustering patterns based on proximity."
+        ),
+        cypher="""
+            MATCH (c1:Customer), (c2:Customer)
+            WHERE id(c1) < id(c2)  // To avoid duplicate pairs
+            WITH ROUND(toFloat(point.distance(c1.Coordinate, c2.Coordinate)/1000), 2) AS dist
+            RETURN AVG(dist) AS AverageDistanceInKM
+        """
+    ),
+    Query(8, "QUERY-8",
+        description=(
+            "This query calculates the pairwise distances in kilometers between customers' locations based on their associated accounts, aiming to understand the geographic proximity between customers."
+            "This is useful to establish expected patterns of behavior on customers; when customers typically conduct account transfers within a certain geographic region, sudden transfers from distant locations may raise suspicion and signal potential fraudulent activities."
+        ),
+        cypher="""
+            MATCH (c1:Customer)-[:HAS_ACCOUNT]->(a:Account)
+            WITH c1, a, c1.Coordinate AS customerLocationA
+            MATCH (c2:Customer)-[:HAS_ACCOUNT]->(b:Account)
+            WHERE id(c1) < id(c2) // To avoid duplicate pairs
+            WITH c1, a, b, customerLocationA, c2, c2.Coordinate AS customerLocationB
+            WITH c1, a, b, customerLocationA, c2, customerLocationB, ROUND(toFloat(point.distance(customerLocationA, customerLocationB)/1000), 2) AS DistanceInKM
+            RETURN c1.CIF AS C1, a.AccountNumber AS C1_AccountNumber, c2.CIF AS C2, b.AccountNumber AS C2_AccountNumber, DistanceInKM
+            ORDER BY DistanceInKM
+            LIMIT $pairs
+        """,
+        parameters=(
+            Parameter('pairs', int, 100, "Number of closest customer pairs"),
+        )
+    ),
+    Query(9, "QUERY-9",
+        description=(
+            "This query identifies pairs of accounts involved in transfers that exhibit suspicious behavior based on community differences, PageRank, and geographic distance."
+            "Calculate the difference in community IDs, compare PageRank values, and measure the distances between customers and accounts."
+            "Thresholds can be set for community difference, PageRank, and geographic distance to define suspicious account transfers."
+            "Suspicious account transfers can include transfers to accounts with higher PageRank, significant community ID differences, and geographic distances exceeding the specified thresholds."
+            " Only transfers from a customer to a customer with a higher node id are considered, so each customer pair is checked in one direction; the transfer scorer applies the same rule."
+        ),
+        cypher="""
+            MATCH (c1:Customer)-[:HAS_ACCOUNT]->(a:Account)-[:TRANSFER]->(b:Account)<-[:HAS_ACCOUNT]-(c2:Customer)
+            WHERE id(c1) < id(c2)  // To avoid duplicate pairs
+            WITH a, b, c1, c2,
+                abs(a.communityId - b.communityId) AS communityDifference, // Calculate community ID difference
+                a.pagerank AS sourcePageRank, b.pagerank AS targetPageRank // Get PageRank for source and target accounts
+            WITH a, b, c1, c2, communityDifference, sourcePageRank, targetPageRank,
+                c1.Coordinate AS customerLocationC1,
+                c2.Coordinate AS customerLocationC2
+            WITH a, b, c1, c2, communityDifference, sourcePageRank, targetPageRank, customerLocationC1, customerLocationC2,
+                point.distance(customerLocationC1, customerLocationC2)/1000 AS distanceBetweenCustomersInKM
+            WHERE communityDifference > $minCommunityDifference // Define a threshold for community ID difference
+            AND sourcePageRank < targetPageRank // Consider only transfers to higher PageRank accounts
+            AND distanceBetweenCustomersInKM > $minDistanceKm
+            RETURN a.AccountNumber AS C1_AccountNumber, b.AccountNumber AS C2_AccountNumber, c1.CIF AS C1_CIF, c2.CIF AS C2_CIF, communityDifference, sourcePageRank, targetPageRank, distanceBetweenCustomersInKM
+        """,
+        parameters=(
+            Parameter('minCommunityDifference', int, 1, "Community ID difference above which a transfer is suspicious"),
+            Parameter('minDistanceKm', float, 5000, "Distance between the customers above which a transfer is suspicious")
+        )
+    )
+]}
+
+
+def parse_overrides(assignments):
+    """
+    NAME=VALUE strings into a dict; the values are converted to the parameter types by Query.bind.
+    """
+    overrides = {}
+    for assignment in assignments:
+        name, separator, value = assignment.partition('=')
+        if not separator:
+            raise ValueError(f"Expected NAME=VALUE, got {assignment!r}")
+        overrides[name.strip()] = value.strip()
+    return overrides
+
+
+def warm_up(run_cypher, queries=None):
+    """
+    Have Neo4j plan every query without running it, so that the first real execution finds its plan in the cache.
+    """
+    for query in (queries or QUERIES.values()):
+        run_cypher("EXPLAIN " + query.cypher, query.bind())
@@ -0,0 +1,169 @@
+"""
+query_cache.py
+
+Description:
+Result cache for the Cypher queries of cypher_app.py. Results are keyed by the whitespace-normalized query text, its
+parameters and the graph version stamp, and kept in memory with LRU eviction under a byte budget. They can also be
+written to an on-disk Parquet tier, which outlives the process.
+
+The cache holds the results of a single stamp at a time. When the stamp changes after a load or an algorithm rerun,
+the results of the previous stamp are dropped, both in memory and on disk.
+
+Date: 17-10-2026
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pandas as pd
+import re
+import shutil
+import threading
+
+from collections import OrderedDict
+from result_sinks import frame_pages
+
+log = logging.getLogger('query_cache')
+
+# The on-disk tier lives in this subdirectory of disk_dir, one directory per stamp named by STAMP_DIR_PATTERN
+DISK_SUBDIR = 'query_cache'
+STAMP_DIR_PATTERN = re.compile(r'[0-9a-f]{16}')
+
+
+def normalize_cypher(cypher):
+    return ' '.join(cypher.split()).rstrip(';').rstrip()
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+class QueryCache:
+    def __init__(self, max_bytes=256 * 1024 ** 2, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = os.path.join(disk_dir, DISK_SUBDIR) if disk_dir else None
+        self.stamp = None
+        self.bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, cypher, params=None):
+        return _digest(json.dumps([normalize_cypher(cypher), params or {}], sort_keys=True, default=str))
+
+    def _stamp_dir(self):
+        return os.path.join(self.disk_dir, _digest(str(self.stamp))[:16])
+
+    def set_stamp(self, stamp):
+        """
+        Switch to the results of the given graph version, dropping everything cached for another one.
+        """
+        with self._lock:
+            if stamp == self.stamp:
+                return
+            if self._entries:
+                log.info(f"Graph version changed from {self.stamp} to {stamp}, dropping {len(self._entries)} cached results")
+            self._entries.clear()
+            self.bytes = 0
+            self.stamp = stamp
+
+            # Only the stamp directories the cache created are removed, whatever else shares the directory
+            if self.disk_dir and os.path.isdir(self.disk_dir):
+                current = os.path.basename(self._stamp_dir())
+                for entry in os.listdir(self.disk_dir):
+                    if entry != current and STAMP_DIR_PATTERN.fullmatch(entry) and os.path.isdir(os.path.join(self.disk_dir, entry)):
+                        shutil.rmtree(os.path.join(self.disk_dir, entry), ignore_errors=True)
+
+    def get(self, cypher, params=None):
+        key = self.key(cypher, params)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+        path = os.path.join(self._stamp_dir(), key + '.parquet') if self.disk_dir else None
+        if path and os.path.exists(path):
+            results_df = pd.read_parquet(path)
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, results_df)
+            return results_df
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, cypher, params, results_df):
+        key = self.key(cypher, params)
+        self._remember(key, results_df)
+        if self.disk_dir:
+            os.makedirs(self._stamp_dir(), exist_ok=True)
+            try:
+                results_df.to_parquet(os.path.join(self._stamp_dir(), key + '.parquet'), index=False)
+            except (TypeError, ValueError, ImportError) as e:
+                # Results holding paths or nodes have no Parquet representation; they are only kept in memory
+                log.debug(f"Not writing result {key} to disk: {e}")
+
+    def _remember(self, key, results_df):
+        size = int(results_df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (results_df, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_run(self, cypher, params, run):
+        """
+        Cached result of the query, or run(cypher, params) on a miss.
+        """
+        results_df = self.get(cypher, params)
+        if results_df is None:
+            results_df = run(cypher, params)
+            self.put(cypher, params, results_df)
+        return results_df
+
+    def get_or_stream(self, cypher, params, stream, page_size=10_000):
+        """
+        Pages of the cached result, or of stream(cypher, params) on a miss. The streamed pages are only kept, and cached
+        at the end, while they fit in the cache; a result read partially (e.g. up to a row limit) is not cached.
+        """
+        results_df = self.get(cypher, params)
+        if results_df is not None:
+            yield from frame_pages(results_df, page_size)
+            return
+
+        kept, size = [], 0
+        for page in stream(cypher, params):
+            if kept is not None:
+                size += int(page.memory_usage(deep=True).sum())
+                if size <= self.max_bytes:
+                    kept.append(page)
+                else:
+                    kept = None
+            yield page
+        if kept is not None:
+            self.put(cypher, params, pd.concat(kept, ignore_index=True))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'stamp': self.stamp,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
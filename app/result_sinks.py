@@ -0,0 +1,174 @@
+"""
+result_sinks.py
+
+Description:
+Paged result output for cypher_app.py. Query results are pulled from the Bolt driver in pages of page_size records
+and each page is appended to a JSON Lines, CSV, Parquet or Arrow IPC file as it arrives. Only one page is held in
+memory at a time, whatever the size of the result. Results already computed as a DataFrame (local engines, cached
+results) are written through the same sinks page by page.
+
+Date: 17-10-2026
+"""
+
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from abc import ABC, abstractmethod
+
+
+def stream_cypher(driver, database, cypher, params=None, page_size=10_000, timeout=None):
+    """
+    Generator of DataFrame pages of the query result. The driver fetches page_size records per round trip; closing the
+    generator early discards the rest of the result on the server.
+    """
+    # Imported here, as the driver passed in has already loaded neo4j
+    from neo4j import Query
+
+    with driver.session(database=database, fetch_size=page_size) as session:
+        result = session.run(Query(cypher, timeout=timeout), params or {})
+        columns = result.keys()
+        page = []
+        empty = True
+        for record in result:
+            # data() turns nodes, relationships and paths into plain values that the sinks can serialize
+            page.append(list(record.data().values()))
+            if len(page) == page_size:
+                yield pd.DataFrame(page, columns=columns)
+                page, empty = [], False
+        if page or empty:
+            yield pd.DataFrame(page, columns=columns)
+
+
+def frame_pages(results_df, page_size=10_000):
+    if results_df.empty:
+        yield results_df
+    for start in range(0, len(results_df), page_size):
+        yield results_df.iloc[start:start + page_size]
+
+
+def as_pages(result, page_size=10_000):
+    """
+    Pages of a query result, given either as a DataFrame or as an iterable of DataFrame pages.
+    """
+    if isinstance(result, pd.DataFrame):
+        return frame_pages(result, page_size)
+    return result
+
+
+class ResultSink(ABC):
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.pages = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, page: pd.DataFrame):
+        self._write(page)
+        self.rows += len(page)
+        self.pages += 1
+
+    @abstractmethod
+    def _write(self, page):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink(ResultSink):
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = open(path, 'w')
+
+    def _write(self, page):
+        if len(page):
+            self._file.write(page.to_json(orient='records', lines=True, default_handler=str).rstrip('\n') + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class CsvSink(ResultSink):
+    def __init__(self, path):
+        super().__init__(path)
+        self._file = open(path, 'w', newline='')
+
+    def _write(self, page):
+        page.to_csv(self._file, header=self.pages == 0, index=False)
+
+    def close(self):
+        self._file.close()
+
+
+class ArrowSink(ResultSink):
+    """
+    Base of the Arrow-based sinks; the schema is taken from the first page and later pages are converted to it.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._writer = None
+        self._schema = None
+
+    @abstractmethod
+    def _open(self, schema):
+        pass
+
+    def _write(self, page):
+        table = pa.Table.from_pandas(page, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = self._open(table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ParquetSink(ArrowSink):
+    def _open(self, schema):
+        return pq.ParquetWriter(self.path, schema)
+
+
+class ArrowIpcSink(ArrowSink):
+    def _open(self, schema):
+        return pa.ipc.new_file(self.path, schema)
+
+
+SINKS = {'jsonl': JsonLinesSink, 'csv': CsvSink, 'parquet': ParquetSink, 'arrow': ArrowIpcSink}
+
+
+def open_sink(out_dir, name, output_format='jsonl'):
+    os.makedirs(out_dir, exist_ok=True)
+    return SINKS[output_format](os.path.join(out_dir, f"{name}.{output_format}"))
+
+
+def write_pages(pages, sink: ResultSink, limit=None, cancelled=None):
+    """
+    Write pages to the sink until they run out, limit rows have been written or cancelled() returns True.
+    Returns True when the pages were written to the end or up to the limit.
+    """
+    try:
+        for page in pages:
+            if cancelled is not None and cancelled():
+                return False
+            if limit is not None and sink.rows + len(page) > limit:
+                sink.write(page.iloc[:limit - sink.rows])
+                return True
+            sink.write(page)
+            if limit is not None and sink.rows >= limit:
+                return True
+        return True
+    finally:
+        # Stop a generator of pages early, so that the rest of the result is discarded
+        close = getattr(pages, 'close', None)
+        if close is not None:
+            close()
@@ -0,0 +1,231 @@
+"""
+sketches.py
+
+Description:
+Mergeable summaries of a stream of values, used to keep statistics up to date as new rows are loaded without going
+back over the rows loaded before.
+
+RunningStats keeps the count, mean and sum of squared deviations (Welford), and merges batches with Chan's parallel
+update. TDigest is a merging t-digest (Dunning) that approximates quantiles from a bounded number of weighted
+centroids. It is exact while there are fewer values than centroids allowed by the compression. HyperLogLog (Flajolet
+et al.) estimates the number of distinct integers from 2^precision small registers, with a relative standard error of
+1.04 / sqrt(2^precision), and counts exactly while it still holds few values; merging two sketches gives the sketch of
+the union. Its registers only depend on the set of values, so sketches built from the same values in any order or
+split agree exactly.
+
+Date: 17-10-2026
+"""
+
+import math
+import numpy as np
+
+
+class RunningStats:
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_values(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return cls()
+        mean = float(values.mean())
+        return cls(len(values), mean, float(((values - mean) ** 2).sum()))
+
+    def merge(self, other: 'RunningStats'):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        return self
+
+    def update(self, values):
+        return self.merge(RunningStats.from_values(values))
+
+    @property
+    def variance(self):
+        # Sample variance, like Cypher's stDev; a single value has no spread
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std_dev(self):
+        return math.sqrt(self.variance)
+
+
+class TDigest:
+    def __init__(self, compression=100, means=(), weights=(), minimum=math.inf, maximum=-math.inf):
+        self.compression = compression
+        self.means = np.asarray(means, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_values(cls, values, compression=100):
+        return cls(compression).update(values)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _scale(self, q):
+        # k1 scale function: centroids are small near the tails and large around the median
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        merged_means, merged_weights = [means[0]], [weights[0]]
+        cumulative = 0.0
+        k_lower = self._scale(0.0)
+        for mean, weight in zip(means[1:], weights[1:]):
+            proposed = merged_weights[-1] + weight
+            if self._scale((cumulative + proposed) / total) - k_lower <= 1:
+                merged_means[-1] += (mean - merged_means[-1]) * weight / proposed
+                merged_weights[-1] = proposed
+            else:
+                cumulative += merged_weights[-1]
+                k_lower = self._scale(cumulative / total)
+                merged_means.append(mean)
+                merged_weights.append(weight)
+        self.means = np.array(merged_means)
+        self.weights = np.array(merged_weights)
+
+    def _add(self, means, weights, minimum, maximum):
+        if len(means) == 0:
+            return self
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+        self._compress(np.concatenate([self.means, means]), np.concatenate([self.weights, weights]))
+        return self
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return self
+        return self._add(values, np.ones(len(values)), float(values.min()), float(values.max()))
+
+    def merge(self, other: 'TDigest'):
+        return self._add(other.means, other.weights, other.minimum, other.maximum)
+
+    def quantile(self, q):
+        """
+        Value below which a fraction q of the values lie, interpolating between centroid centers; with singleton
+        centroids the median is the same as percentileCont(values, 0.5).
+        """
+        if len(self.means) == 0:
+            return math.nan
+        if len(self.means) == 1:
+            return float(self.means[0])
+
+        # Cumulative weight at the center of each centroid, with the extremes at either end
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * total, np.concatenate([[0.0], centers, [total]]), np.concatenate([[self.minimum], self.means, [self.maximum]])))
+
+
+def hash64(values):
+    """
+    SplitMix64 finalizer of integer values, so that the same value hashes the same way in every process and run.
+    """
+    x = np.asarray(values, dtype=np.int64).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _leading_zeros(x):
+    x = x.copy()
+    zeros = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = (x >> np.uint64(64 - shift)) == 0
+        zeros += np.uint8(shift) * empty
+        x[empty] <<= np.uint64(shift)
+    return zeros + ((x >> np.uint64(63)) == 0)
+
+
+class HyperLogLog:
+    """
+    Starts in a sparse mode that keeps the distinct 64-bit hashes themselves, which counts exactly, and switches to the
+    registers once the hashes would take more space than the registers (HyperLogLog++).
+    """
+
+    def __init__(self, precision=12, registers=None, hashes=None):
+        self.precision = precision
+        self.registers = None if registers is None else np.asarray(registers, dtype=np.uint8)
+        self.hashes = np.empty(0, dtype=np.uint64) if registers is None and hashes is None else hashes
+
+    @classmethod
+    def from_values(cls, values, precision=12):
+        return cls(precision).update(values)
+
+    @property
+    def sparse(self):
+        return self.registers is None
+
+    def _sparse_limit(self):
+        # Number of 8-byte hashes below which the sparse form is smaller than the registers
+        return (1 << self.precision) // 8
+
+    def _insert(self, hashes):
+        if self.sparse:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) < self._sparse_limit():
+                return self
+            hashes, self.hashes = self.hashes, None
+            self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        # The first bits pick the register, the position of the first 1 in the remaining bits is the rank
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rank = np.minimum(_leading_zeros(hashes << np.uint64(self.precision)) + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def update(self, values):
+        hashes = hash64(values)
+        if len(hashes) == 0:
+            return self
+        return self._insert(hashes)
+
+    def merge(self, other: 'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}")
+        if other.sparse:
+            return self._insert(other.hashes) if len(other.hashes) else self
+        if self.sparse:
+            hashes = self.hashes
+            self.hashes, self.registers = None, other.registers.copy()
+            return self._insert(hashes) if len(hashes) else self
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        if self.sparse:
+            return len(self.hashes)
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        empty = int((self.registers == 0).sum())
+        # Linear counting is far more accurate while many registers are still empty
+        if estimate <= 2.5 * m and empty:
+            estimate = m * math.log(m / empty)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        # The sparse form is always shorter than the 2^precision bytes of the registers, which tells them apart
+        return self.hashes.tobytes() if self.sparse else self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, precision=12):
+        data = bytes(data)
+        if len(data) == 1 << precision:
+            return cls(precision, np.frombuffer(data, dtype=np.uint8).copy())
+        return cls(precision, hashes=np.frombuffer(data, dtype=np.uint64).copy())
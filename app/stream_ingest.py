@@ -0,0 +1,240 @@
+"""
+stream_ingest.py
+
+Description:
+Chunked streaming load for neo_arrow_app.py. Purchases and transfers are read in fixed-size chunks through a generator
+pipeline (parse -> normalize card and account numbers -> map to node ids -> node or relationship batches), and each
+batch is uploaded to the GDS Arrow Flight server as soon as it is built, so peak memory is bounded by the chunk size
+rather than by the size of the CSV files.
+
+Date: 17-10-2026
+"""
+
+import json
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.flight as flight
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from ingest import (LABEL_VALUE_PAIRS_CARD_ISSUERS, LABEL_VALUE_PAIRS_CUSTOMER, card_issuer_frames, customer_frames,
+                    merchant_frames, normalize_purchases, normalize_transfers, purchase_frames, transfer_frame)
+from node_table import NodeTable
+
+log = logging.getLogger('stream_ingest')
+
+
+class ArrowUnavailableError(RuntimeError):
+    pass
+
+
+class GraphStream:
+    """
+    Uploads node and relationship batches to a new in-memory GDS graph over Arrow Flight as they are produced.
+
+    This drives the same CREATE_GRAPH / NODE_LOAD_DONE / RELATIONSHIP_LOAD_DONE protocol as gds.graph.construct, which
+    needs every frame up front. At most `concurrency` uploads are in flight at any time.
+
+    The protocol is reached through the Arrow graph constructor of the GDS client, which is not public API; it is
+    checked against the graphdatascience version pinned in requirements.txt. ArrowUnavailableError is raised when the
+    client has no such constructor, e.g. when the server does not run the Arrow Flight endpoint.
+    """
+
+    def __init__(self, gds, graph_name, concurrency=4, batch_size=10_000):
+        self.gds = gds
+        self.graph_name = graph_name
+        self.batch_size = batch_size
+        self._constructor = gds._query_runner.create_graph_constructor(graph_name, concurrency, None)
+        if not all(hasattr(self._constructor, name) for name in ('_client', '_send_action')):
+            raise ArrowUnavailableError(f"The GDS client constructs graphs with {type(self._constructor).__name__}, not over Arrow Flight")
+        self._client = self._constructor._client
+        self._executor = None
+        self._in_flight = deque()
+        self._concurrency = concurrency
+        self._nodes_done = False
+        self.node_count = 0
+        self.relationship_count = 0
+
+    def __enter__(self):
+        # Created here rather than in __init__, so that no threads are left behind when the stream is never entered
+        self._executor = ThreadPoolExecutor(self._concurrency)
+        self._constructor._send_action("CREATE_GRAPH", {"name": self.graph_name, "database_name": self.gds.database()})
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        failed = exc_type is not None
+        try:
+            self._drain()
+            if not failed:
+                self.nodes_done()
+                self._constructor._send_action("RELATIONSHIP_LOAD_DONE", {"name": self.graph_name})
+                log.info(f"Streamed {self.node_count} nodes and {self.relationship_count} relationships into '{self.graph_name}'")
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._executor.shutdown()
+            if failed:
+                self._constructor._send_action("ABORT", {"name": self.graph_name})
+
+    def _put(self, entity_type, table):
+        descriptor = {"name": self.graph_name, "entity_type": entity_type}
+        writer, _ = self._client.do_put(flight.FlightDescriptor.for_command(json.dumps(descriptor).encode("utf-8")), table.schema)
+        with writer:
+            for batch in table.to_batches(self.batch_size):
+                writer.write_batch(batch)
+
+    def _submit(self, entity_type, frame):
+        table = frame if isinstance(frame, pa.Table) else pa.Table.from_pandas(frame, preserve_index=False)
+        if table.num_rows == 0:
+            return
+        # Apply backpressure so that no more than `concurrency` batches are held in memory
+        while len(self._in_flight) >= self._concurrency:
+            self._in_flight.popleft().result()
+        self._in_flight.append(self._executor.submit(self._put, entity_type, table))
+        if entity_type == "node":
+            self.node_count += table.num_rows
+        else:
+            self.relationship_count += table.num_rows
+
+    def _drain(self):
+        while self._in_flight:
+            self._in_flight.popleft().result()
+
+    def put_nodes(self, frame):
+        if self._nodes_done:
+            raise ValueError("Nodes can no longer be added once relationships are being uploaded.")
+        self._submit("node", frame)
+
+    def nodes_done(self):
+        if not self._nodes_done:
+            self._drain()
+            self._constructor._send_action("NODE_LOAD_DONE", {"name": self.graph_name})
+            self._nodes_done = True
+
+    def put_relationships(self, frame):
+        self.nodes_done()
+        self._submit("relationship", frame)
+
+    def graph(self):
+        return self.gds.graph.get(self.graph_name)
+
+
+def upload_graph(gds, graph_name, node_frames, relationship_frames):
+    """
+    Upload complete node and relationship frames, pandas DataFrames or Arrow tables, without the pandas round trip
+    gds.graph.construct makes for every frame. Falls back to gds.graph.construct when Arrow Flight is not available.
+    """
+    try:
+        stream = GraphStream(gds, graph_name)
+    except ArrowUnavailableError as e:
+        log.warning(f"{e}, falling back to gds.graph.construct")
+        def to_pandas(frame):
+            return frame.to_pandas() if isinstance(frame, pa.Table) else frame
+        return gds.graph.construct(graph_name, [to_pandas(frame) for frame in node_frames], [to_pandas(frame) for frame in relationship_frames])
+
+    with stream:
+        for frame in node_frames:
+            stream.put_nodes(frame)
+        for frame in relationship_frames:
+            stream.put_relationships(frame)
+    return stream.graph()
+
+
+def iter_csv_chunks(file_path, chunk_size, normalize=None, usecols=None):
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, usecols=usecols):
+        yield normalize(chunk) if normalize is not None else chunk
+
+
+class PurchaseNodes:
+    """
+    First pass over purchases. Each chunk reserves the node ids of its rows, one Purchase node per row, and merchants
+    get their node id when first seen, so the chunk's Purchase node frame can be built at once. The distinct card
+    issuers and (card, issuer) pairs are collected on the way; like the merchants, their size depends on the number of
+    merchants and cards, not on the number of purchases.
+    """
+
+    def __init__(self, nodes: NodeTable):
+        self.nodes = nodes
+        self.chunk_starts = []
+        self.card_issuers = {}
+        self._card_issuer_pairs = []
+
+    def add(self, chunk):
+        seen = self.nodes.lookup('Merchant').index
+        for merchant in chunk['Merchant'].drop_duplicates():
+            if merchant not in seen:
+                self.nodes.add_node('Merchant', merchant)
+        self.card_issuers.update(dict.fromkeys(chunk['CardIssuer'].drop_duplicates()))
+        self._card_issuer_pairs.append(chunk[['CardNumber', 'CardIssuer']].drop_duplicates())
+
+        first_purchase_id = self.nodes.reserve(len(chunk))
+        self.chunk_starts.append(first_purchase_id)
+        purchase_properties, _, _ = purchase_frames(chunk, self.nodes, np.arange(first_purchase_id, first_purchase_id + len(chunk), dtype=np.int64))
+        return purchase_properties
+
+    def card_issuer_to_card(self):
+        if not self._card_issuer_pairs:
+            return pd.DataFrame(columns=['CardNumber', 'CardIssuer'])
+        return pd.concat(self._card_issuer_pairs, ignore_index=True).drop_duplicates()
+
+
+def stream_graph(gds, graph_name, customer_df, transfers_path, purchases_path, chunk_size, transfer_mark=None, purchase_mark=None,
+                 on_transfers=None, on_purchases=None):
+    """
+    Load the graph in chunks of chunk_size rows. Purchases are read twice (nodes, then relationships) and transfers
+    once. Only customers and the distinct merchants, card issuers and card/issuer pairs are held in memory.
+
+    Unlike the full load, every purchase row gets its own Purchase node, even when it shares its TransactionID with
+    another row, and the purchase node ids are not kept in the returned NodeTable, which would take memory in
+    proportion to the purchases. An incremental load therefore cannot run on top of a streamed load.
+
+    The optional high-water marks observe every transfer and purchase batch, and on_transfers/on_purchases receive
+    every normalized chunk. Returns the graph and its NodeTable.
+    """
+    # gds.graph.construct needs every frame at once, so there is no bounded-memory fallback without Arrow Flight
+    try:
+        stream = GraphStream(gds, graph_name)
+    except ArrowUnavailableError as e:
+        raise ArrowUnavailableError(f"{e}; --chunk-size needs Arrow Flight, load without it instead") from e
+
+    nodes = NodeTable(starting_index=1)
+    nodes.add_nodes(customer_df, LABEL_VALUE_PAIRS_CUSTOMER)
+    customer_node_frames, R1, R3 = customer_frames(customer_df, nodes)
+    purchase_nodes = PurchaseNodes(nodes)
+
+    with stream:
+        for frame in customer_node_frames:
+            stream.put_nodes(frame)
+        for chunk in iter_csv_chunks(purchases_path, chunk_size, normalize_purchases):
+            stream.put_nodes(purchase_nodes.add(chunk))
+
+        distinct_merchants = nodes.lookup('Merchant').index.to_numpy()
+        distinct_card_issuers = np.array(list(purchase_nodes.card_issuers), dtype=object)
+        nodes.add_nodes(pd.DataFrame({'CardIssuer': distinct_card_issuers}), LABEL_VALUE_PAIRS_CARD_ISSUERS)
+        placeholder_merchant_node_id = nodes.add_node('Merchant', 'Merchant')
+        merchant_properties, R4 = merchant_frames(distinct_merchants, nodes, placeholder_merchant_node_id)
+        card_issuer_properties, R7 = card_issuer_frames(distinct_card_issuers, purchase_nodes.card_issuer_to_card(), nodes)
+        stream.put_nodes(merchant_properties)
+        stream.put_nodes(card_issuer_properties)
+
+        for frame in [R1, R3, R4, R7]:
+            stream.put_relationships(frame)
+        for chunk in iter_csv_chunks(transfers_path, chunk_size, normalize_transfers):
+            stream.put_relationships(transfer_frame(chunk, nodes))
+            if transfer_mark is not None:
+                transfer_mark.observe(chunk['TransferEpoch'], chunk['TransactionID'])
+            if on_transfers is not None:
+                on_transfers(chunk)
+        for chunk, first_purchase_id in zip(iter_csv_chunks(purchases_path, chunk_size, normalize_purchases), purchase_nodes.chunk_starts):
+            _, R5, R6 = purchase_frames(chunk, nodes, np.arange(first_purchase_id, first_purchase_id + len(chunk), dtype=np.int64))
+            stream.put_relationships(R5)
+            stream.put_relationships(R6)
+            if purchase_mark is not None:
+                purchase_mark.observe(chunk['PurchaseEpoch'], chunk['TransactionID'])
+            if on_purchases is not None:
+                on_purchases(chunk)
+
+    return stream.graph(), nodes
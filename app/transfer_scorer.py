@@ -0,0 +1,222 @@
+"""
+transfer_scorer.py
+
+Description:
+Scores transfers as they arrive with the rules of Q9, instead of joining Customer-Account-TRANSFER-Account-Customer
+across the whole graph at query time. The account features the rules need (communityId, pagerank and the owner's CIF
+and coordinates) are held in an in-memory feature store, as NumPy columns sorted by account number. The store is loaded
+from the graph or from the load pipeline's frames.
+
+Transfers are read from an iterator or a queue and scored in micro-batches. A batch is closed once it holds batch_size
+records, or max_delay seconds after its first record arrived, whichever comes first. Scoring a batch is a handful of
+vectorized lookups and a haversine, so the per-record latency is bounded by max_delay plus the scoring time of one batch.
+
+Like Q9, which keeps each customer pair once with id(c1) < id(c2), a transfer is only flagged when the node id of the
+sender's customer is below that of the receiver's, so transfers in the other direction are never flagged. The store
+holds the customer node ids read from the graph, or the row order of the loader's customers, in which the load assigns
+them.
+
+Date: 17-10-2026
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+import queue
+import threading
+import time
+
+from geo_engine import haversine_km
+from sketches import TDigest
+
+log = logging.getLogger('transfer_scorer')
+
+# Transfer columns carried over into the scored rows when present
+PASSTHROUGH_COLUMNS = ['TransactionID', 'Amount', 'TransferEpoch']
+
+
+def account_numbers(values):
+    """
+    Account numbers as int64, accepting both the hyphenated strings of the CSV files and integers.
+    """
+    values = pd.Series(values)
+    if values.dtype == object:
+        values = values.astype(str).str.replace('-', '')
+    return values.astype(np.int64).to_numpy()
+
+
+class AccountFeatureStore:
+    """
+    Per-account features looked up by account number. Accounts without an owner, pagerank or community hold NaN, which
+    fails every rule, as a null does in Cypher.
+    """
+
+    def __init__(self, features: pd.DataFrame):
+        features = features.drop_duplicates(subset='AccountNumber', keep='last').sort_values('AccountNumber')
+        self.account_numbers = features['AccountNumber'].to_numpy(dtype=np.int64)
+        self.community_ids = features['communityId'].to_numpy(dtype=np.float64)
+        self.pageranks = features['pagerank'].to_numpy(dtype=np.float64)
+        self.cifs = features['CIF'].to_numpy(dtype=np.float64)
+        self.customer_ids = features['customerId'].to_numpy(dtype=np.float64)
+        self.latitudes = np.radians(features['Latitude'].to_numpy(dtype=np.float64))
+        self.longitudes = np.radians(features['Longitude'].to_numpy(dtype=np.float64))
+
+    @classmethod
+    def from_graph(cls, gds, database=None):
+        return cls(gds.run_cypher("""
+            MATCH (a:Account)
+            OPTIONAL MATCH (c:Customer)-[:HAS_ACCOUNT]->(a)
+            RETURN a.AccountNumber AS AccountNumber, a.communityId AS communityId, a.pagerank AS pagerank,
+                id(c) AS customerId, c.CIF AS CIF, c.Latitude AS Latitude, c.Longitude AS Longitude
+        """, database=database))
+
+    @classmethod
+    def from_frames(cls, customer_df: pd.DataFrame, account_features: pd.DataFrame):
+        """
+        Store over the load pipeline's customers (CIF, AccountNumber, Latitude, Longitude) and the AccountNumber,
+        pagerank and communityId of the accounts. Customer node ids follow the row order of customer_df, as in the load.
+        """
+        owners = customer_df[['AccountNumber', 'CIF', 'Latitude', 'Longitude']].assign(customerId=np.arange(len(customer_df)))
+        return cls(account_features[['AccountNumber', 'pagerank', 'communityId']].merge(owners, on='AccountNumber', how='outer'))
+
+    def __len__(self):
+        return len(self.account_numbers)
+
+    def positions(self, accounts):
+        """
+        Position of each account in the store, and whether it is there at all.
+        """
+        positions = np.searchsorted(self.account_numbers, accounts)
+        positions[positions == len(self.account_numbers)] = 0
+        found = self.account_numbers[positions] == accounts if len(self.account_numbers) else np.zeros(len(accounts), dtype=bool)
+        return positions, found
+
+
+class TransferScorer:
+    def __init__(self, store: AccountFeatureStore, min_community_difference=1, min_distance_km=5000):
+        self.store = store
+        self.min_community_difference = min_community_difference
+        self.min_distance_km = min_distance_km
+        self.records = 0
+        self.flagged = 0
+        # Per-record latency in seconds, from the arrival of a record to the end of the scoring of its batch
+        self.latency = TDigest()
+        self._lock = threading.Lock()
+
+    def reload(self, store: AccountFeatureStore):
+        # Batches in flight keep scoring against the store they started with
+        self.store = store
+        log.info(f"Feature store reloaded with {len(store)} accounts")
+
+    def score(self, transfers: pd.DataFrame):
+        """
+        Q9 features and rule of every transfer; the Suspicious column holds the outcome of the rule.
+        """
+        store = self.store
+        senders = account_numbers(transfers['SenderAccountNumber'])
+        receivers = account_numbers(transfers['ReceiverAccountNumber'])
+        sender_positions, sender_found = store.positions(senders)
+        receiver_positions, receiver_found = store.positions(receivers)
+
+        def column(name, positions, found):
+            return np.where(found, getattr(store, name)[positions], np.nan)
+
+        sender_customer = column('customer_ids', sender_positions, sender_found)
+        receiver_customer = column('customer_ids', receiver_positions, receiver_found)
+        sender_cif = column('cifs', sender_positions, sender_found)
+        receiver_cif = column('cifs', receiver_positions, receiver_found)
+        source_pagerank = column('pageranks', sender_positions, sender_found)
+        target_pagerank = column('pageranks', receiver_positions, receiver_found)
+        community_difference = np.abs(column('community_ids', sender_positions, sender_found) - column('community_ids', receiver_positions, receiver_found))
+        distance = haversine_km(column('latitudes', sender_positions, sender_found), column('longitudes', sender_positions, sender_found),
+                                column('latitudes', receiver_positions, receiver_found), column('longitudes', receiver_positions, receiver_found))
+
+        # Q9 keeps the pairs with id(c1) < id(c2), so a transfer between accounts of the same customer, or towards a
+        # customer with a lower node id, is never suspicious
+        suspicious = (sender_customer < receiver_customer) & (community_difference > self.min_community_difference) \
+            & (source_pagerank < target_pagerank) & (distance > self.min_distance_km)
+
+        scored = transfers[[c for c in PASSTHROUGH_COLUMNS if c in transfers.columns]].reset_index(drop=True)
+        scored = scored.assign(
+            C1_AccountNumber=senders, C2_AccountNumber=receivers, C1_CIF=pd.array(sender_cif, dtype='Int64'), C2_CIF=pd.array(receiver_cif, dtype='Int64'),
+            communityDifference=community_difference, sourcePageRank=source_pagerank, targetPageRank=target_pagerank,
+            distanceBetweenCustomersInKM=distance, Suspicious=suspicious
+        )
+        with self._lock:
+            self.records += len(scored)
+            self.flagged += int(suspicious.sum())
+        return scored
+
+    def suspicious(self, transfers: pd.DataFrame):
+        scored = self.score(transfers)
+        return scored[scored['Suspicious']].drop(columns='Suspicious').reset_index(drop=True)
+
+    def stream(self, source, batch_size=1000, max_delay=0.05, flagged_only=True):
+        """
+        Score the transfers of an iterator or a queue.Queue in micro-batches, yielding one frame per batch. Records are
+        dicts or DataFrames of transfers; a queue is read until it yields None.
+        """
+        batches = queue_batches(source, batch_size, max_delay) if isinstance(source, queue.Queue) else iter_batches(source, batch_size)
+        for arrivals, records in batches:
+            transfers = pd.concat(records, ignore_index=True) if isinstance(records[0], pd.DataFrame) else pd.DataFrame.from_records(records)
+            result = self.suspicious(transfers) if flagged_only else self.score(transfers)
+            done = time.monotonic()
+            with self._lock:
+                self.latency.update(done - np.asarray(arrivals))
+            yield result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'accounts': len(self.store),
+                'records': self.records,
+                'flagged': self.flagged,
+                'latencyMedian': self.latency.quantile(0.5),
+                'latencyP99': self.latency.quantile(0.99),
+                'latencyMaximum': self.latency.maximum if self.records else None
+            }
+
+
+def _arrival(record):
+    # A DataFrame record stands for all of its rows, which arrived together
+    return [time.monotonic()] * (len(record) if isinstance(record, pd.DataFrame) else 1)
+
+
+def iter_batches(records, batch_size):
+    """
+    (arrival times, records) batches of an iterator. The iterator blocks for its next record, so a batch is closed as
+    soon as it is full.
+    """
+    arrivals, batch, rows = [], [], 0
+    for record in records:
+        arrivals += _arrival(record)
+        batch.append(record)
+        rows += len(record) if isinstance(record, pd.DataFrame) else 1
+        if rows >= batch_size:
+            yield arrivals, batch
+            arrivals, batch, rows = [], [], 0
+    if batch:
+        yield arrivals, batch
+
+
+def queue_batches(records: queue.Queue, batch_size, max_delay):
+    """
+    (arrival times, records) batches of a queue, closed when full or max_delay seconds after their first record.
+    """
+    while True:
+        record = records.get()
+        if record is None:
+            return
+        arrivals, batch = _arrival(record), [record]
+        deadline = time.monotonic() + max_delay
+        while len(arrivals) < batch_size:
+            try:
+                record = records.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if record is None:
+                yield arrivals, batch
+                return
+            arrivals += _arrival(record)
+            batch.append(record)
+        yield arrivals, batch
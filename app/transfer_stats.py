@@ -0,0 +1,133 @@
+"""
+transfer_stats.py
+
+Description:
+Per-account transfer statistics for the Q4 anomaly query. For every sender account the loader keeps the number, mean
+and sample variance of its transfer amounts, plus a t-digest for the median, and the same summary over all transfers.
+They are stored as Account properties and on a TransferStats node.
+
+Both summaries are mergeable, so an incremental load reads the summaries of the senders it touches, merges in the new
+transfers and writes them back, without rescanning the TRANSFER relationships.
+
+Date: 17-10-2026
+"""
+
+import logging
+import pandas as pd
+
+from post_load import write_batches
+from sketches import RunningStats, TDigest
+
+log = logging.getLogger('transfer_stats')
+
+# The overall median is read by every Q4 row, so its digest keeps more centroids than the per-account ones
+OVERALL_COMPRESSION = 1000
+
+
+class AmountStats:
+    def __init__(self, running: RunningStats = None, digest: TDigest = None):
+        self.running = running or RunningStats()
+        self.digest = digest or TDigest()
+
+    @classmethod
+    def from_values(cls, values, compression=100):
+        return cls(RunningStats.from_values(values), TDigest.from_values(values, compression))
+
+    def merge(self, other: 'AmountStats'):
+        self.running.merge(other.running)
+        self.digest.merge(other.digest)
+        return self
+
+    def to_properties(self):
+        return {
+            'count': self.running.count,
+            'mean': self.running.mean,
+            'variance': self.running.variance,
+            'stdDev': self.running.std_dev,
+            'median': self.digest.quantile(0.5),
+            'digestMeans': self.digest.means.tolist(),
+            'digestWeights': self.digest.weights.tolist(),
+            'minimum': self.digest.minimum,
+            'maximum': self.digest.maximum
+        }
+
+    @classmethod
+    def from_properties(cls, properties, compression=100):
+        count = int(properties['count'])
+        running = RunningStats(count, properties['mean'], properties['variance'] * (count - 1))
+        digest = TDigest(compression, means=properties['digestMeans'], weights=properties['digestWeights'], minimum=properties['minimum'], maximum=properties['maximum'])
+        return cls(running, digest)
+
+
+class TransferStatsBuilder:
+    """
+    Accumulates the sender and overall statistics over one or more frames of normalized transfers.
+    """
+
+    def __init__(self, senders=None, overall=None):
+        self.senders = senders or {}
+        self.overall = overall or AmountStats(digest=TDigest(OVERALL_COMPRESSION))
+
+    def add(self, transfers: pd.DataFrame):
+        for sender, amounts in transfers.groupby('SenderAccountNumber', sort=False)['Amount']:
+            stats = AmountStats.from_values(amounts.to_numpy())
+            if sender in self.senders:
+                self.senders[sender].merge(stats)
+            else:
+                self.senders[sender] = stats
+        self.overall.merge(AmountStats.from_values(transfers['Amount'].to_numpy(), OVERALL_COMPRESSION))
+        return self
+
+
+def write_transfer_stats(gds, database, builder: TransferStatsBuilder):
+    rows = pd.DataFrame([{'account': int(account), **stats.to_properties()} for account, stats in builder.senders.items()])
+    if not rows.empty:
+        write_batches(gds, """
+            UNWIND $rows AS row
+            MATCH (a:Account {AccountNumber: row.account})
+            SET a.transferCount = row.count, a.transferMean = row.mean, a.transferVariance = row.variance,
+                a.transferStdDev = row.stdDev, a.transferMedian = row.median, a.transferDigestMeans = row.digestMeans,
+                a.transferDigestWeights = row.digestWeights, a.transferMinimum = row.minimum, a.transferMaximum = row.maximum
+        """, rows, database)
+    gds.run_cypher("""
+        MERGE (s:TransferStats {name: 'TRANSFER'})
+        SET s += $properties
+    """, params={'properties': builder.overall.to_properties()}, database=database)
+    log.info(f"Wrote the transfer statistics of {len(rows)} sender accounts")
+
+
+def read_transfer_stats(gds, database, accounts):
+    """
+    Statistics already stored for the given sender accounts and over all transfers.
+    """
+    senders = gds.run_cypher("""
+        MATCH (a:Account)
+        WHERE a.AccountNumber IN $accounts AND a.transferCount IS NOT NULL
+        RETURN a.AccountNumber AS account, a.transferCount AS count, a.transferMean AS mean, a.transferVariance AS variance,
+            a.transferDigestMeans AS digestMeans, a.transferDigestWeights AS digestWeights,
+            a.transferMinimum AS minimum, a.transferMaximum AS maximum
+    """, params={'accounts': [int(a) for a in accounts]}, database=database)
+    overall = gds.run_cypher("""
+        MATCH (s:TransferStats {name: 'TRANSFER'})
+        RETURN s.count AS count, s.mean AS mean, s.variance AS variance, s.digestMeans AS digestMeans,
+            s.digestWeights AS digestWeights, s.minimum AS minimum, s.maximum AS maximum
+    """, database=database)
+
+    builder = TransferStatsBuilder({row['account']: AmountStats.from_properties(row) for row in senders.to_dict('records')})
+    if not overall.empty:
+        builder.overall = AmountStats.from_properties(overall.iloc[0].to_dict(), OVERALL_COMPRESSION)
+    return builder
+
+
+def update_transfer_stats(gds, database, new_transfers: pd.DataFrame):
+    """
+    Merge newly loaded transfers into the stored statistics of their senders and of all transfers.
+    """
+    if new_transfers.empty:
+        return
+    builder = read_transfer_stats(gds, database, new_transfers['SenderAccountNumber'].unique())
+    builder.add(new_transfers)
+    # Only the senders of the new transfers have changed
+    senders = set(new_transfers['SenderAccountNumber'])
+    builder.senders = {account: stats for account, stats in builder.senders.items() if account in senders}
+    write_transfer_stats(gds, database, builder)
@@ -0,0 +1,48 @@
+"""
+Shared fixtures of the tests: the sample CSV files in data/, normalized the way neo_arrow_app.py normalizes them. The
+modules of app/ import each other by their bare names, so app/ is put on the import path.
+"""
+
+import os
+import pandas as pd
+import pytest
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+DATA_DIR = os.path.join(os.path.dirname(APP_DIR), 'data')
+sys.path.insert(0, APP_DIR)
+
+from ingest import CategoryEncoder, normalize_purchases, normalize_transfers  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def data_dir():
+    return DATA_DIR
+
+
+@pytest.fixture(scope='session')
+def customers():
+    customer_df = pd.read_csv(os.path.join(DATA_DIR, 'customers.csv'))
+    customer_df['AccountNumber'] = customer_df['AccountNumber'].astype(str).str.replace('-', '').astype(int)
+    customer_df['CardNumber'] = customer_df['CardNumber'].astype(str).str.replace('-', '').astype(int)
+    customer_df['Gender_Encoded'] = CategoryEncoder(start=1).fit_transform(customer_df['Gender'])
+    return customer_df
+
+
+@pytest.fixture(scope='session')
+def transfers():
+    return normalize_transfers(pd.read_csv(os.path.join(DATA_DIR, 'transfers.csv')))
+
+
+@pytest.fixture(scope='session')
+def purchases():
+    return normalize_purchases(pd.read_csv(os.path.join(DATA_DIR, 'purchases.csv')))
+
+
+@pytest.fixture(scope='session')
+def graph(customers, transfers, purchases):
+    """
+    The (NodeTable, node frames, relationship frames R1-R7) of the full load, the baseline the other paths follow.
+    """
+    from ingest import build_graph_frames
+    return build_graph_frames(customers.copy(), transfers.copy(), purchases.copy())
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from cycle_engine import CycleConstraints, TransferGraph, find_cycles
+
+
+def reference_cycles(transfers, seeds, max_depth):
+    """
+    Q5 by plain depth-first search over the transfers, with no pruning: the transfer loops of at most max_depth
+    transfers from each seed back to it, through distinct accounts and none of the earlier seeds. Loops are given as
+    (accounts, transaction ids), as TransactionIDs repeat in the sample.
+    """
+    outgoing = {}
+    for row in transfers.itertuples(index=False):
+        outgoing.setdefault(row.SenderAccountNumber, []).append((row.ReceiverAccountNumber, row.TransactionID))
+
+    cycles = set()
+    for k, seed in enumerate(seeds):
+        excluded = set(seeds[:k])
+
+        def extend(account, visited, accounts, path):
+            for receiver, transaction_id in outgoing.get(account, []):
+                if receiver == seed:
+                    cycles.add((tuple(accounts + [receiver]), tuple(path + [transaction_id])))
+                elif receiver not in visited and receiver not in excluded and len(path) + 1 < max_depth:
+                    extend(receiver, visited | {receiver}, accounts + [receiver], path + [transaction_id])
+
+        extend(seed, {seed}, [seed], [])
+    return cycles
+
+
+@pytest.fixture(scope='module')
+def seeds(transfers):
+    # The busiest accounts stand in for the accounts of highest PageRank
+    activity = transfers['SenderAccountNumber'].value_counts().add(transfers['ReceiverAccountNumber'].value_counts(), fill_value=0)
+    return activity.sort_values(ascending=False, kind='stable').index[:10].tolist()
+
+
+@pytest.mark.parametrize('max_depth', [3, 5])
+def test_cycles_match_q5(transfers, seeds, max_depth):
+    constraints = CycleConstraints(max_depth=max_depth, max_cycles_per_seed=10**9)
+    cycles = find_cycles(TransferGraph.from_frame(transfers), seeds, constraints, workers=1)
+
+    expected = reference_cycles(transfers, seeds, max_depth)
+    assert len(expected) > 0
+    assert len(cycles) == len(expected)
+    assert {(tuple(cycle), tuple(ids)) for cycle, ids in zip(cycles['Cycle'], cycles['TransactionIds'])} == expected
+    assert cycles['CycleLength'].is_monotonic_decreasing
+    for cycle, length in zip(cycles['Cycle'], cycles['CycleLength']):
+        assert cycle[0] == cycle[-1] and len(cycle) == length + 1 and len(set(cycle[:-1])) == length
+
+
+def test_worker_processes_find_the_same_cycles(transfers, seeds):
+    graph = TransferGraph.from_frame(transfers)
+    constraints = CycleConstraints(max_depth=5)
+    single = find_cycles(graph, seeds, constraints, workers=1)
+    pooled = find_cycles(graph, seeds, constraints, workers=2)
+    assert sorted(map(tuple, single['Cycle'] + single['TransactionIds'])) == sorted(map(tuple, pooled['Cycle'] + pooled['TransactionIds']))
+
+
+def test_constraints_filter_the_loops(transfers, seeds):
+    graph = TransferGraph.from_frame(transfers)
+    cycles = find_cycles(graph, seeds, CycleConstraints(max_depth=6, chronological=True, min_amount=1000), workers=1)
+    assert len(cycles) > 0
+    edges = transfers.set_index(['SenderAccountNumber', 'ReceiverAccountNumber', 'TransactionID'])
+    for cycle, ids in zip(cycles['Cycle'], cycles['TransactionIds']):
+        loop = edges.loc[list(zip(cycle[:-1], cycle[1:], ids))]
+        assert (loop['Amount'].to_numpy() >= 1000).all()
+        assert np.all(np.diff(loop['TransferEpoch'].to_numpy()) >= 0)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from geo_engine import CustomerSpatialIndex, haversine_km, mean_pairwise_distance, round_half_up
+
+
+@pytest.fixture(scope='module')
+def all_pairs(customers):
+    """
+    Every pair i < j of customer rows with its distance, as Q7 and Q8 enumerate them.
+    """
+    lat, lon = np.radians(customers['Latitude'].to_numpy()), np.radians(customers['Longitude'].to_numpy())
+    i, j = np.triu_indices(len(customers), k=1)
+    return i, j, haversine_km(lat[i], lon[i], lat[j], lon[j])
+
+
+def test_mean_pairwise_distance_matches_q7(customers, all_pairs):
+    _, _, distances = all_pairs
+    expected = round_half_up(distances, 2).mean()
+    assert mean_pairwise_distance(customers['Latitude'], customers['Longitude'], block_size=300, workers=3) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('k', [10, 500, 3000])
+def test_closest_pairs_match_q8(customers, all_pairs, k):
+    i, j, distances = all_pairs
+    cifs = customers['CIF'].to_numpy()
+    other = cifs[i] != cifs[j]
+    i, j, distances = i[other], j[other], distances[other]
+    order = np.lexsort((j, i, distances))[:k]
+
+    result = CustomerSpatialIndex(customers).closest_pairs(k, block_size=256)
+    assert result['C1'].tolist() == cifs[i[order]].tolist()
+    assert result['C2'].tolist() == cifs[j[order]].tolist()
+    assert result['DistanceInKM'].tolist() == round_half_up(distances[order], 2).tolist()
+
+
+def test_within_finds_every_customer_in_the_radius(customers):
+    index = CustomerSpatialIndex(customers)
+    origin = customers.iloc[0]
+    lat, lon = np.radians(customers['Latitude'].to_numpy()), np.radians(customers['Longitude'].to_numpy())
+    distances = haversine_km(lat[0], lon[0], lat, lon)
+    expected = customers.loc[(distances <= 2000) & (customers['CIF'] != origin['CIF']).to_numpy(), 'CIF']
+
+    result = index.within(origin['CIF'], 2000)
+    assert sorted(result['CIF']) == sorted(expected)
+    assert result['DistanceInKM'].is_monotonic_increasing
@@ -0,0 +1,85 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from incremental import HighWaterMark, LoadState, load_new_purchases, load_new_transfers
+from ingest import build_graph_frames
+
+
+class RecordingGds:
+    """
+    Stands in for the GDS client, keeping the Cypher statements and their rows.
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def run_cypher(self, cypher, params=None, database=None):
+        self.statements.append((cypher, params or {}))
+
+    def rows(self, fragment):
+        return [row for cypher, params in self.statements if fragment in cypher for row in params.get('rows', [])]
+
+
+def test_high_water_mark_picks_rows_past_the_mark():
+    mark = HighWaterMark()
+    mark.observe([10, 20, 20], [1, 2, 3])
+    assert mark.epoch == 20 and mark.ids_at_epoch == {2, 3}
+    assert mark.is_new([19, 20, 20, 21], [4, 3, 5, 6]).tolist() == [False, False, True, True]
+    assert HighWaterMark.from_dict(mark.to_dict()).is_new([20], [2]).tolist() == [False]
+
+
+def initial_state(tmp_path, customers, transfers, purchases):
+    nodes, _, _ = build_graph_frames(customers.copy(), transfers.copy(), purchases.copy())
+    transfer_mark, purchase_mark = HighWaterMark(), HighWaterMark()
+    transfer_mark.observe(transfers['TransferEpoch'], transfers['TransactionID'])
+    purchase_mark.observe(purchases['PurchaseEpoch'], purchases['TransactionID'])
+    return LoadState(str(tmp_path), nodes, transfer_mark, purchase_mark)
+
+
+def test_new_purchases_share_nodes_and_skip_unknown_cards(tmp_path, caplog, customers, transfers, purchases):
+    cutoff = purchases['PurchaseEpoch'].median()
+    state = initial_state(tmp_path, customers, transfers, purchases[purchases['PurchaseEpoch'] <= cutoff])
+    loaded_ids = state.nodes.lookup('Purchase').index
+
+    unknown = purchases.iloc[:2].assign(CardNumber=1, TransactionID=purchases['TransactionID'].max() + np.arange(1, 3), PurchaseEpoch=purchases['PurchaseEpoch'].max())
+    later = purchases[purchases['PurchaseEpoch'] > cutoff]
+    gds = RecordingGds()
+    with caplog.at_level(logging.WARNING, logger='incremental'):
+        new_purchases = load_new_purchases(gds, state, pd.concat([purchases, unknown], ignore_index=True), 'db')
+
+    assert len(new_purchases) == len(later)
+    assert 'Skipped 2 new purchases with an unknown CardNumber' in caplog.text
+    # The mark still moves past the skipped rows
+    assert state.purchases.epoch == unknown['PurchaseEpoch'].max()
+    # A TransactionID gets one node, also when it was loaded before
+    assert len(state.nodes.lookup('Purchase')) == len(loaded_ids.union(later['TransactionID'].unique()))
+
+    rows = gds.rows('MERGE (p:Purchase {purchaseId: row.purchaseId})')
+    assert len(rows) == len(later)
+    assert all('purchaseNodeId' not in row for row in rows)
+    assert sorted(row['purchaseId'] for row in rows) == sorted(later['TransactionID'])
+
+
+def test_transfers_merge_on_their_transaction_id(tmp_path, customers, transfers, purchases):
+    cutoff = transfers['TransferEpoch'].median()
+    state = initial_state(tmp_path, customers, transfers[transfers['TransferEpoch'] <= cutoff], purchases)
+    gds = RecordingGds()
+    new_transfers = load_new_transfers(gds, state, transfers, 'db')
+
+    assert len(new_transfers) == (transfers['TransferEpoch'] > cutoff).sum()
+    (cypher, _), *_ = gds.statements
+    assert 'MERGE (a)-[t:TRANSFER {transactionId: row.transactionId}]->(b)' in cypher
+    assert len(gds.rows('TRANSFER')) == len(new_transfers)
+
+
+def test_load_state_round_trip(tmp_path, customers, transfers, purchases):
+    state = initial_state(tmp_path, customers, transfers, purchases)
+    state.streamed = True
+    state.save()
+
+    loaded = LoadState.load(str(tmp_path))
+    assert loaded.streamed
+    assert loaded.transfers.to_dict() == state.transfers.to_dict() and loaded.purchases.to_dict() == state.purchases.to_dict()
+    for label in ('Customer', 'Account', 'Card', 'Purchase', 'Merchant', 'CardIssuer'):
+        pd.testing.assert_series_equal(loaded.nodes.lookup(label), state.nodes.lookup(label), check_dtype=False, check_index_type=False)
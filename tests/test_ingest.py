@@ -0,0 +1,96 @@
+import os
+import pandas as pd
+import pytest
+
+import stream_ingest
+from arrow_ingest import build_graph_tables, read_purchases, read_transfers
+
+
+def labelled(nodes, node_ids):
+    # 'Label:value' of each node id, so that graphs with different node ids can be compared
+    frame = nodes.to_frame()
+    names = pd.Series((frame['label'] + ':' + frame['value'].astype(str)).to_numpy(), index=frame['nodeId'].to_numpy())
+    return pd.Series(node_ids).map(names).to_numpy()
+
+
+def test_arrow_tables_match_pandas_frames(customers, graph, data_dir):
+    nodes, node_frames, relationship_frames = graph
+    arrow_nodes, node_tables, relationship_tables = build_graph_tables(customers.copy(), read_transfers(os.path.join(data_dir, 'transfers.csv')),
+                                                                       read_purchases(os.path.join(data_dir, 'purchases.csv')))
+
+    pd.testing.assert_frame_equal(arrow_nodes.to_frame(), nodes.to_frame())
+    assert len(node_tables) == len(node_frames) and len(relationship_tables) == len(relationship_frames)
+    for table, frame in zip(node_tables + relationship_tables, node_frames + relationship_frames):
+        table = table if isinstance(table, pd.DataFrame) else table.to_pandas()
+        pd.testing.assert_frame_equal(table.reset_index(drop=True), frame.reset_index(drop=True), check_dtype=False)
+
+
+def test_duplicate_transaction_ids_share_a_purchase_node(purchases, graph):
+    nodes, _, relationship_frames = graph
+    R5, R6 = relationship_frames[4], relationship_frames[5]
+    duplicated = purchases['TransactionID'].duplicated(keep=False).to_numpy()
+    assert duplicated.sum() > 0
+
+    # Every PURCHASE relationship of a TransactionID targets the same node, which has a HAS_MERCHANT to each row's merchant
+    assert R5['targetNodeId'].groupby(R5['purchaseId']).nunique().max() == 1
+    assert R5['targetNodeId'].nunique() == purchases['TransactionID'].nunique()
+    merchants = pd.DataFrame({'node': R6['sourceNodeId'].to_numpy(), 'merchant': labelled(nodes, R6['targetNodeId'])})
+    expected = 'Merchant:' + purchases['Merchant']
+    assert (merchants['merchant'].to_numpy() == expected.to_numpy()).all()
+
+
+class RecordingStream:
+    """
+    Stands in for GraphStream, keeping the uploaded frames and checking that nodes come before relationships.
+    """
+
+    def __init__(self, gds, graph_name):
+        self.nodes, self.relationships = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def put_nodes(self, frame):
+        assert not self.relationships
+        self.nodes.append(frame)
+
+    def put_relationships(self, frame):
+        self.relationships.append(frame)
+
+    def graph(self):
+        return self
+
+
+@pytest.mark.parametrize('chunk_size', [700, 100_000])
+def test_streamed_relationships_match_full_load(monkeypatch, customers, transfers, purchases, graph, data_dir, chunk_size):
+    monkeypatch.setattr(stream_ingest, 'GraphStream', RecordingStream)
+    chunks = {'transfers': 0, 'purchases': 0}
+    stream, stream_nodes = stream_ingest.stream_graph(
+        None, 'graph', customers.copy(), os.path.join(data_dir, 'transfers.csv'), os.path.join(data_dir, 'purchases.csv'), chunk_size,
+        on_transfers=lambda chunk: chunks.update(transfers=chunks['transfers'] + len(chunk)),
+        on_purchases=lambda chunk: chunks.update(purchases=chunks['purchases'] + len(chunk)))
+    nodes, _, relationship_frames = graph
+    assert chunks == {'transfers': len(transfers), 'purchases': len(purchases)}
+
+    streamed = {}
+    for frame in stream.relationships:
+        streamed.setdefault(frame['relationshipType'].iloc[0], []).append(frame)
+    for frame in relationship_frames:
+        kind = frame['relationshipType'].iloc[0]
+        other = pd.concat(streamed[kind], ignore_index=True)
+        assert len(other) == len(frame)
+        if kind in ('PURCHASE', 'HAS_MERCHANT'):
+            # Purchase nodes differ, every streamed purchase row has its own
+            continue
+        expected = sorted(zip(labelled(nodes, frame['sourceNodeId']), labelled(nodes, frame['targetNodeId'])))
+        assert sorted(zip(labelled(stream_nodes, other['sourceNodeId']), labelled(stream_nodes, other['targetNodeId']))) == expected
+
+    purchase_rows = pd.concat(streamed['PURCHASE'], ignore_index=True)
+    assert purchase_rows['targetNodeId'].is_unique
+    assert (labelled(stream_nodes, purchase_rows['sourceNodeId']) == ('Card:' + purchases['CardNumber'].astype(str)).to_numpy()).all()
+    assert (purchase_rows['purchaseId'].to_numpy() == purchases['TransactionID'].to_numpy()).all()
+    merchant_rows = pd.concat(streamed['HAS_MERCHANT'], ignore_index=True)
+    assert (labelled(stream_nodes, merchant_rows['targetNodeId']) == ('Merchant:' + purchases['Merchant']).to_numpy()).all()
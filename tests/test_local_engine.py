@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from local_engine import LocalEngine, round_half_up
+
+
+def graph_paths(graph):
+    """
+    The Customer-HAS_CARD->Card-PURCHASE->Purchase-HAS_MERCHANT->Merchant paths of the full load, one row per path.
+    """
+    nodes, node_frames, relationship_frames = graph
+    customer_properties = node_frames[0]
+    R3, R5, R6 = relationship_frames[2], relationship_frames[4], relationship_frames[5]
+    cifs = customer_properties.drop_duplicates('nodeId').set_index('nodeId')['CIF']
+    merchant_names = nodes.to_frame('Merchant').set_index('nodeId')['value']
+
+    has_card = pd.DataFrame({'CIF': R3['sourceNodeId'].map(cifs).to_numpy(), 'card': R3['targetNodeId'].to_numpy()}).drop_duplicates()
+    purchase = pd.DataFrame({'card': R5['sourceNodeId'].to_numpy(), 'purchase': R5['targetNodeId'].to_numpy(),
+                             'amount': R5['purchaseAmount'].to_numpy(), 'epoch': R5['purchaseEpoch'].to_numpy()})
+    has_merchant = pd.DataFrame({'purchase': R6['sourceNodeId'].to_numpy(), 'merchant': R6['targetNodeId'].map(merchant_names).to_numpy()}).drop_duplicates()
+    return has_card, purchase, has_merchant
+
+
+def cypher_q3(graph, merchant, year):
+    """
+    The original Q3 pattern, evaluated on the relationship frames:
+    MATCH (n)<-[:HAS_MERCHANT]-(p:Purchase)-[r:PURCHASE]-(x) WHERE merchant IN labels(n) AND year of r = year
+    WITH p, month of r MATCH (p)-[:PURCHASE]-(:Card)-[:HAS_CARD]-(c:Customer) RETURN month, COUNT(DISTINCT c)
+    """
+    has_card, purchase, has_merchant = graph_paths(graph)
+    datetimes = pd.to_datetime(purchase['epoch'], unit='s', utc=True)
+    at_merchant = purchase.assign(year=datetimes.dt.year, Month=datetimes.dt.month).merge(has_merchant[has_merchant['merchant'] == merchant], on='purchase')
+    months = at_merchant.loc[at_merchant['year'] == year, ['purchase', 'Month']].drop_duplicates()
+    customers = months.merge(purchase[['purchase', 'card']], on='purchase').merge(has_card, on='card')
+    counts = customers.groupby('Month', sort=True)['CIF'].nunique()
+    return pd.DataFrame({'Month': counts.index.to_numpy(), 'TotalCount': counts.to_numpy()})
+
+
+@pytest.fixture(scope='module')
+def engine(data_dir):
+    return LocalEngine.from_csv(data_dir)
+
+
+def test_q1_matches_the_graph(engine, graph):
+    has_card, purchase, _ = graph_paths(graph)
+    totals = has_card.merge(purchase, on='card').groupby('CIF', sort=True)['amount'].sum()
+
+    result = engine.total_expenditure()
+    assert result['CIF'].tolist() == totals.index.tolist()
+    assert result['TotalExpenditure'].tolist() == round_half_up(totals.to_numpy())
+
+
+def test_q2_matches_the_graph(engine, graph):
+    has_card, purchase, has_merchant = graph_paths(graph)
+    # A purchase sharing its TransactionID with a row of another merchant is on a path through each merchant
+    paths = has_card.merge(purchase, on='card').merge(has_merchant, on='purchase')
+    totals = paths.groupby('CIF')['amount'].sum()
+    frequencies = paths.groupby(['CIF', 'merchant']).size()
+
+    result = engine.merchant_expenditure()
+    assert sorted(result['CustomerID']) == sorted(totals.index)
+    assert result['Total_Expenditure'].tolist() == sorted(result['Total_Expenditure'], reverse=True)
+    for cif, counts, total in result.itertuples(index=False):
+        assert total == round_half_up([totals[cif]])[0]
+        assert sorted(counts) == sorted(f"{merchant}:{count}" for merchant, count in frequencies[cif].items())
+
+
+def test_q3_matches_the_original_cypher(engine, graph, purchases):
+    for merchant in purchases['Merchant'].unique():
+        pd.testing.assert_frame_equal(engine.monthly_merchant_customers(merchant, 2021), cypher_q3(graph, merchant, 2021), check_dtype=False)
+
+
+def test_q3_counts_every_card_of_a_shared_purchase(engine, graph):
+    # Counting only the owner of each purchase row's own card gives 32
+    counts = engine.monthly_merchant_customers('Facebook', 2021).set_index('Month')['TotalCount']
+    assert counts[4] == cypher_q3(graph, 'Facebook', 2021).set_index('Month')['TotalCount'][4] == 35
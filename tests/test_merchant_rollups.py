@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from local_engine import LocalEngine
+from merchant_rollups import MerchantMonth, MerchantRollupBuilder
+
+
+def rollup_counts(builder, merchant, year):
+    months = sorted(month for (m, y, month) in builder.rollups if m == merchant and y == year)
+    return pd.DataFrame({'Month': months, 'TotalCount': [builder.rollups[(merchant, year, month)].customers.count() for month in months]})
+
+
+def test_rollups_match_the_local_engine(customers, purchases, data_dir):
+    engine = LocalEngine.from_csv(data_dir)
+    builder = MerchantRollupBuilder(customers).add(purchases)
+    for merchant in purchases['Merchant'].unique():
+        pd.testing.assert_frame_equal(rollup_counts(builder, merchant, 2021), engine.monthly_merchant_customers(merchant, 2021), check_dtype=False)
+
+
+def test_rollup_totals_count_every_merchant_of_a_shared_purchase(customers, purchases):
+    builder = MerchantRollupBuilder(customers).add(purchases)
+    # Each PURCHASE relationship counts once per merchant of its Purchase node
+    merchants_per_id = purchases.groupby('TransactionID')['Merchant'].nunique()
+    expected = (merchants_per_id.reindex(purchases['TransactionID']).to_numpy() * purchases['Amount'].to_numpy()).sum()
+    assert sum(rollup.purchase_count for rollup in builder.rollups.values()) == merchants_per_id.reindex(purchases['TransactionID']).sum()
+    assert np.isclose(sum(rollup.total_amount for rollup in builder.rollups.values()), expected)
+
+
+def test_rows_without_shared_ids_are_their_own_purchases(customers, purchases):
+    builder = MerchantRollupBuilder(customers).add(purchases, shared_ids=False)
+    assert sum(rollup.purchase_count for rollup in builder.rollups.values()) == len(purchases)
+    assert np.isclose(sum(rollup.total_amount for rollup in builder.rollups.values()), purchases['Amount'].sum())
+
+
+def test_chunks_merge_into_the_same_rollups(customers, purchases):
+    whole = MerchantRollupBuilder(customers).add(purchases, shared_ids=False)
+    chunked = MerchantRollupBuilder(customers)
+    for start in range(0, len(purchases), 1500):
+        chunked.add(purchases.iloc[start:start + 1500], shared_ids=False)
+
+    assert whole.rollups.keys() == chunked.rollups.keys()
+    for key, rollup in whole.rollups.items():
+        other = chunked.rollups[key]
+        assert other.purchase_count == rollup.purchase_count
+        assert np.isclose(other.total_amount, rollup.total_amount)
+        assert other.customers.count() == rollup.customers.count()
+
+
+def test_a_shared_card_counts_for_every_holder(customers, purchases):
+    card = purchases['CardNumber'].iloc[0]
+    holder = customers[customers['CardNumber'] == card].iloc[[0]].assign(CIF=-1)
+    builder = MerchantRollupBuilder(pd.concat([customers, holder], ignore_index=True)).add(purchases.iloc[[0]])
+    (rollup,) = builder.rollups.values()
+    assert rollup.customers.count() == 2
+
+
+def test_properties_round_trip(customers, purchases):
+    builder = MerchantRollupBuilder(customers).add(purchases)
+    for rollup in builder.rollups.values():
+        properties = rollup.to_properties()
+        restored = MerchantMonth.from_properties(properties)
+        assert restored.to_properties() == properties
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import HyperLogLog, RunningStats, TDigest
+from transfer_stats import AmountStats, TransferStatsBuilder
+
+
+def split(values, parts, seed=0):
+    cuts = np.sort(np.random.default_rng(seed).choice(np.arange(1, len(values)), parts - 1, replace=False))
+    return np.split(values, cuts)
+
+
+def test_running_stats_merge_matches_numpy(transfers):
+    amounts = transfers['Amount'].to_numpy()
+    merged = RunningStats()
+    for part in split(amounts, 7):
+        merged.merge(RunningStats.from_values(part))
+
+    assert merged.count == len(amounts)
+    assert np.isclose(merged.mean, amounts.mean())
+    assert np.isclose(merged.variance, amounts.var(ddof=1))
+    assert RunningStats.from_values([5.0]).variance == 0.0
+
+
+def test_t_digest_median_is_exact_with_few_values(transfers):
+    amounts = transfers['Amount'].to_numpy()[:40]
+    merged = TDigest()
+    for part in split(amounts, 4):
+        merged.merge(TDigest.from_values(part))
+    # With singleton centroids the median is percentileCont(amounts, 0.5)
+    assert merged.quantile(0.5) == pytest.approx(np.median(amounts))
+
+
+def test_t_digest_merge_stays_close_to_the_quantiles():
+    values = np.random.default_rng(1).lognormal(8, 1.5, 200_000)
+    merged = TDigest(compression=1000)
+    for part in split(values, 20):
+        merged.merge(TDigest.from_values(part, 1000))
+
+    assert merged.count == len(values)
+    for q in (0.01, 0.5, 0.99):
+        assert merged.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.01)
+    assert merged.minimum == values.min() and merged.maximum == values.max()
+
+
+def test_transfer_stats_match_q4(transfers):
+    # Q4 computed avg, percentileCont(0.5) and stDev per sender and over all transfers
+    whole = TransferStatsBuilder().add(transfers)
+    chunked = TransferStatsBuilder()
+    for start in range(0, len(transfers), 300):
+        chunked.add(transfers.iloc[start:start + 300])
+
+    per_sender = transfers.groupby('SenderAccountNumber')['Amount']
+    for builder in (whole, chunked):
+        assert builder.senders.keys() == set(per_sender.groups)
+        means = pd.Series({sender: stats.running.mean for sender, stats in builder.senders.items()})
+        medians = pd.Series({sender: stats.digest.quantile(0.5) for sender, stats in builder.senders.items()})
+        std_devs = pd.Series({sender: stats.running.std_dev for sender, stats in builder.senders.items()})
+        pd.testing.assert_series_equal(means.sort_index(), per_sender.mean(), check_names=False)
+        pd.testing.assert_series_equal(medians.sort_index(), per_sender.median(), check_names=False)
+        pd.testing.assert_series_equal(std_devs.sort_index(), per_sender.std().fillna(0.0), check_names=False)
+        assert builder.overall.running.mean == pytest.approx(transfers['Amount'].mean())
+        assert builder.overall.running.std_dev == pytest.approx(transfers['Amount'].std())
+        # The overall digest already merges centroids around the median at 1000 transfers
+        assert builder.overall.digest.quantile(0.5) == pytest.approx(transfers['Amount'].median(), rel=0.01)
+
+
+def test_amount_stats_properties_round_trip(transfers):
+    stats = AmountStats.from_values(transfers['Amount'].to_numpy())
+    properties = stats.to_properties()
+    assert AmountStats.from_properties(properties).to_properties() == pytest.approx(properties)
+
+
+def test_hyperloglog_is_exact_below_the_sparse_limit():
+    values = np.random.default_rng(2).integers(0, 10**12, 2000)
+    sketch = HyperLogLog.from_values(values, 14)
+    assert sketch.sparse and sketch.count() == len(np.unique(values))
+
+
+def test_hyperloglog_merges_agree_whatever_the_split():
+    values = np.random.default_rng(3).integers(0, 10**6, 100_000)
+    whole = HyperLogLog.from_values(values, 14)
+    merged = HyperLogLog(14)
+    for part in split(values[::-1], 13):
+        merged.merge(HyperLogLog.from_values(part, 14))
+
+    assert not whole.sparse
+    assert np.array_equal(merged.registers, whole.registers)
+    # Relative standard error 1.04 / sqrt(2^14), about 0.8%
+    assert merged.count() == pytest.approx(len(np.unique(values)), rel=0.03)
+
+
+def test_hyperloglog_bytes_round_trip():
+    for count in (0, 100, 50_000):
+        sketch = HyperLogLog.from_values(np.arange(count), 14)
+        restored = HyperLogLog.from_bytes(sketch.to_bytes(), 14)
+        assert restored.sparse == sketch.sparse and restored.count() == sketch.count()
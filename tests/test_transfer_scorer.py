@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from geo_engine import haversine_km
+from transfer_scorer import AccountFeatureStore, TransferScorer
+
+
+@pytest.fixture(scope='module')
+def account_features(customers, transfers):
+    # Random pagerank and communityId for every account, standing in for the graph algorithms
+    accounts = pd.unique(pd.concat([customers['AccountNumber'], transfers['SenderAccountNumber'], transfers['ReceiverAccountNumber']]))
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'AccountNumber': accounts, 'pagerank': rng.random(len(accounts)), 'communityId': rng.integers(0, 5, len(accounts))})
+
+
+def q9(customers, transfers, features, min_community_difference, min_distance_km):
+    """
+    Q9 as joins over the frames: customer node ids follow the customer rows, and the pair keeps id(c1) < id(c2).
+    """
+    owners = customers[['AccountNumber', 'Latitude', 'Longitude']].assign(customerId=np.arange(len(customers))).merge(features, on='AccountNumber')
+    pairs = transfers.merge(owners.add_prefix('c1_'), left_on='SenderAccountNumber', right_on='c1_AccountNumber') \
+        .merge(owners.add_prefix('c2_'), left_on='ReceiverAccountNumber', right_on='c2_AccountNumber')
+    distance = haversine_km(*[np.radians(pairs[column].to_numpy()) for column in ['c1_Latitude', 'c1_Longitude', 'c2_Latitude', 'c2_Longitude']])
+    return pairs[(pairs['c1_customerId'] < pairs['c2_customerId']).to_numpy()
+                 & ((pairs['c1_communityId'] - pairs['c2_communityId']).abs() > min_community_difference).to_numpy()
+                 & (pairs['c1_pagerank'] < pairs['c2_pagerank']).to_numpy()
+                 & (distance > min_distance_km)]
+
+
+@pytest.mark.parametrize('min_distance_km', [0, 1000, 5000])
+def test_scorer_flags_the_transfers_of_q9(customers, transfers, account_features, min_distance_km):
+    scorer = TransferScorer(AccountFeatureStore.from_frames(customers, account_features), 1, min_distance_km)
+    flagged = scorer.suspicious(transfers)
+
+    expected = q9(customers, transfers, account_features, 1, min_distance_km)
+    assert sorted(zip(flagged['TransactionID'], flagged['C1_AccountNumber'])) == sorted(zip(expected['TransactionID'], expected['SenderAccountNumber']))
+    assert scorer.records == len(transfers) and scorer.flagged == len(flagged)
+
+
+def test_reversed_transfers_are_not_flagged(customers, transfers, account_features):
+    scorer = TransferScorer(AccountFeatureStore.from_frames(customers, account_features), 1, 0)
+    flagged = scorer.suspicious(transfers)
+    reversed_transfers = flagged.rename(columns={'C1_AccountNumber': 'ReceiverAccountNumber', 'C2_AccountNumber': 'SenderAccountNumber'})
+    assert len(flagged) > 0
+    assert not scorer.score(reversed_transfers)['Suspicious'].any()
+
+
+def test_streamed_batches_score_every_transfer(customers, transfers, account_features):
+    scorer = TransferScorer(AccountFeatureStore.from_frames(customers, account_features), 1, 1000)
+    batches = list(scorer.stream(transfers.to_dict('records'), batch_size=128, flagged_only=False))
+    assert sum(len(batch) for batch in batches) == len(transfers)
+    assert pd.concat(batches)['Suspicious'].sum() == scorer.suspicious(transfers).shape[0]